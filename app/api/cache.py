@@ -0,0 +1,329 @@
+"""
+Response cache for ICD-11 API lookups
+Bounded in-process LRU in front of a shared tier, with per-kind TTLs. The
+shared tier is a SQLite WAL file (shared by every worker on the host) or a
+Redis-protocol server (see redis_cache.py).
+Entries stored with upstream validators (ETag/Last-Modified) outlive their TTL
+as stale copies so they can be revalidated with a conditional GET.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .entity_model import PackedDocument
+
+# Sentinel TTL meaning "never expires" (release-pinned, immutable content)
+FOREVER: Optional[float] = None
+
+# Upstream validators kept with an entry, e.g. {"etag": ..., "last_modified": ...}
+Validators = Dict[str, str]
+
+
+def make_key(url: str, language: str = "en", params: Optional[Dict] = None) -> str:
+    """Build a stable cache key from endpoint URL, language and query params"""
+    if params:
+        query = "&".join(f"{k}={params[k]}" for k in sorted(params))
+        return f"{language}|{url}?{query}"
+    return f"{language}|{url}"
+
+
+def ttl_for(url: str) -> Optional[float]:
+    """TTL policy: release-pinned resources never expire, unversioned ones do"""
+    if "/release/11/" in url:
+        return FOREVER
+    if "/entity/search" in url:
+        return float(os.getenv("ICD11_CACHE_SEARCH_TTL", "3600"))
+    return float(os.getenv("ICD11_CACHE_ENTITY_TTL", "86400"))
+
+
+class CacheStats:
+    """Hit/miss/eviction counters for a cache tier"""
+
+    __slots__ = ("hits", "misses", "evictions", "expirations", "sets")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.sets = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "sets": self.sets,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class LRUCache:
+    """Bounded in-memory LRU with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[Any, Optional[float], Optional[Validators]]]" = OrderedDict()
+        self.stats = CacheStats()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        value, expires_at, validators = entry
+        if expires_at is not None and expires_at <= time.time():
+            # Entries with validators stay behind as stale copies for revalidation
+            if validators is None:
+                del self._data[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def get_stale(self, key: str) -> Optional[Tuple[Any, Validators]]:
+        """Return (value, validators) for a revalidatable entry, fresh or not"""
+        entry = self._data.get(key)
+        if entry is None or entry[2] is None:
+            return None
+        return entry[0], entry[2]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = FOREVER, expires_at: Optional[float] = None, validators: Optional[Validators] = None) -> None:
+        if expires_at is None and ttl is not None:
+            expires_at = time.time() + ttl
+        self._data[key] = (value, expires_at, validators)
+        self._data.move_to_end(key)
+        self.stats.sets += 1
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class DiskCache:
+    """Persistent SQLite-backed cache tier (opened lazily on first use)
+
+    WAL mode lets every worker process on the host read and write the same
+    file, so an entry fetched by one worker is a hit for the others.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, validators TEXT)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+            if "validators" not in columns:
+                # Caches written before validators were stored
+                conn.execute("ALTER TABLE responses ADD COLUMN validators TEXT")
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Tuple[Any, Optional[float], Optional[Validators]]]:
+        """Return (value, expires_at, validators) or None"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value, expires_at, validators FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            value, expires_at, validators = row
+            if expires_at is not None and expires_at <= time.time():
+                if validators is None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+        self.stats.hits += 1
+        return json.loads(value), expires_at, json.loads(validators) if validators else None
+
+    def get_stale(self, key: str) -> Optional[Tuple[Any, Validators]]:
+        """Return (value, validators) for a revalidatable entry, fresh or not"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value, validators FROM responses WHERE key = ? AND validators IS NOT NULL", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), json.loads(row[1])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = FOREVER, validators: Optional[Validators] = None) -> None:
+        expires_at = time.time() + ttl if ttl is not None else None
+        payload = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+        stored_validators = json.dumps(validators) if validators else None
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, validators) VALUES (?, ?, ?, ?)",
+                (key, payload, expires_at, stored_validators),
+            )
+        self.stats.sets += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        """Remove expired rows; returns the number deleted"""
+        with self._lock:
+            cursor = self._connect().execute(
+                "DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (time.time(),),
+            )
+        self.stats.evictions += cursor.rowcount
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class TieredCache:
+    """Memory LRU in front of an optional shared tier (DiskCache or RedisCache)
+
+    With `packed` set, the memory tier holds encoded documents (a fraction of
+    the size of the decoded dicts) and every hit decodes a private copy.
+    The `aget`/`aget_stale`/`aset` variants are for code on the event loop:
+    a shared tier marked `remote` (a network round trip) runs in a worker
+    thread there, so a slow or unreachable server never stalls other requests.
+    """
+
+    def __init__(self, memory: LRUCache, disk: Optional[Any] = None, packed: bool = False):
+        self.memory = memory
+        self.disk = disk
+        self.packed = packed
+
+    @classmethod
+    def from_env(cls) -> Optional["TieredCache"]:
+        """Build the cache from ICD11_CACHE_* settings (None when disabled)"""
+        if os.getenv("ICD11_CACHE_ENABLED", "true").lower() != "true":
+            return None
+        memory = LRUCache(int(os.getenv("ICD11_CACHE_MEMORY_ENTRIES", "4096")))
+        backend = os.getenv("ICD11_CACHE_BACKEND", "sqlite").lower()
+        if backend == "redis":
+            from .redis_cache import RedisCache
+
+            disk = RedisCache(
+                os.getenv("ICD11_CACHE_REDIS_URL", "redis://localhost:6379/0"),
+                prefix=os.getenv("ICD11_CACHE_REDIS_PREFIX", "icd11:"),
+            )
+        elif backend == "sqlite":
+            path = os.getenv("ICD11_CACHE_PATH", ".cache/icd11/responses.sqlite")
+            disk = DiskCache(path) if path else None
+        else:
+            raise ValueError(f"Unknown ICD11_CACHE_BACKEND {backend!r} (expected sqlite or redis)")
+        packed = os.getenv("ICD11_CACHE_MEMORY_PACKED", "true").lower() == "true"
+        return cls(memory, disk, packed)
+
+    def _pack(self, value: Any) -> Any:
+        return PackedDocument.pack(value) if self.packed else value
+
+    @staticmethod
+    def _unpack(value: Any) -> Any:
+        return value.unpack() if isinstance(value, PackedDocument) else value
+
+    def _promote(self, key: str, entry: Optional[Tuple[Any, Optional[float], Optional[Validators]]]) -> Optional[Any]:
+        if entry is None:
+            return None
+        value, expires_at, validators = entry
+        # Promote to the memory tier, keeping the original expiry
+        self.memory.set(key, self._pack(value), expires_at=expires_at, validators=validators)
+        return value
+
+    async def _shared(self, method, *args: Any) -> Any:
+        if getattr(self.disk, "remote", False):
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            return self._unpack(value)
+        if self.disk is None:
+            return None
+        return self._promote(key, self.disk.get(key))
+
+    async def aget(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            return self._unpack(value)
+        if self.disk is None:
+            return None
+        return self._promote(key, await self._shared(self.disk.get, key))
+
+    def get_stale(self, key: str) -> Optional[Tuple[Any, Validators]]:
+        """Expired-but-revalidatable copy of an entry, with its upstream validators"""
+        stale = self.memory.get_stale(key)
+        if stale is not None:
+            return self._unpack(stale[0]), stale[1]
+        if self.disk is not None:
+            return self.disk.get_stale(key)
+        return None
+
+    async def aget_stale(self, key: str) -> Optional[Tuple[Any, Validators]]:
+        stale = self.memory.get_stale(key)
+        if stale is not None:
+            return self._unpack(stale[0]), stale[1]
+        if self.disk is not None:
+            return await self._shared(self.disk.get_stale, key)
+        return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = FOREVER, validators: Optional[Validators] = None) -> None:
+        self.memory.set(key, self._pack(value), ttl, validators=validators)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl, validators)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = FOREVER, validators: Optional[Validators] = None) -> None:
+        self.memory.set(key, self._pack(value), ttl, validators=validators)
+        if self.disk is not None:
+            await self._shared(self.disk.set, key, value, ttl, validators)
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory": {**self.memory.stats.as_dict(), "entries": len(self.memory)},
+            "disk": {**self.disk.stats.as_dict(), "backend": self.disk.backend} if self.disk is not None else None,
+        }
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
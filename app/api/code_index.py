@@ -0,0 +1,80 @@
+"""
+Exact ICD-11 code index
+Sorted code array per release with a hash lookup for exact codes and
+binary-search range scans for code prefixes (e.g. `5A1` -> 5A10, 5A11, ...)
+"""
+
+import re
+from bisect import bisect_left
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+from .entity_model import EntityTable, intern
+
+# MMS codes: chapter (0-9 or A-Z), letter, digit, then a digit or letter (residual
+# categories end in Y/Z), e.g. 5A10, BA00, 6A0Z, CA23.0; partial stems like 5A1 also match
+MMS_CODE_PATTERN = re.compile(r'^[0-9A-Z][A-Z][0-9]([0-9A-Z](\.[0-9A-Z]{1,3})?)?$')
+# Foundation/linearization stem ids (long numbers such as 1697306310)
+STEM_ID_PATTERN = re.compile(r'^[0-9]{7,}$')
+URI_PREFIX = "http://id.who.int/icd/"
+# Leading character of an MMS code -> its chapter: 1-9 are chapters 01-09, then A (10),
+# B (11) ... S (26) skipping I and O; the supplementary chapters are V and X
+CHAPTER_BY_PREFIX = {prefix: f"{number:02d}" for number, prefix in enumerate("123456789ABCDEFGHJKLMNPQRS", start=1)}
+CHAPTER_BY_PREFIX.update({"V": "V", "X": "X"})
+
+
+def normalize_code(code: str) -> str:
+    """Canonical form used for code lookups"""
+    return code.strip().upper()
+
+
+def code_kind(value: str) -> Optional[str]:
+    """"uri", "mms" or "stem" for an ICD-11 reference, None for anything else"""
+    if value.startswith(URI_PREFIX):
+        return "uri"
+    if MMS_CODE_PATTERN.match(value):
+        return "mms"
+    if STEM_ID_PATTERN.match(value):
+        return "stem"
+    return None
+
+
+class CodeIndex:
+    """theCode -> entity mapping for one release/language"""
+
+    def __init__(self):
+        # Sorted codes; position i describes table row _rows[i]
+        self._codes: List[str] = []
+        self._rows = array("i")
+        self._positions: Dict[str, int] = {}
+        self.table = EntityTable()
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    @classmethod
+    def build(cls, entities: Iterable[Dict[str, Any]]) -> "CodeIndex":
+        """Build from dicts with id, code, title and chapter (entities without a code are skipped)"""
+        index = cls()
+        rows = sorted(
+            (normalize_code(e["code"]), e) for e in entities if e.get("code")
+        )
+        for code, entity in rows:
+            if code in index._positions:
+                continue
+            index._positions[code] = len(index._codes)
+            index._codes.append(intern(code))
+            index._rows.append(index.table.add(entity["id"], entity["code"], entity.get("title"), entity.get("chapter")))
+        return index
+
+    def get(self, code: str) -> Optional[Dict[str, Any]]:
+        """Exact code lookup in O(1)"""
+        position = self._positions.get(normalize_code(code))
+        return self.table.record(self._rows[position]) if position is not None else None
+
+    def prefix(self, prefix: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Codes starting with `prefix`, in code order"""
+        prefix = normalize_code(prefix)
+        start = bisect_left(self._codes, prefix)
+        end = bisect_left(self._codes, prefix + "\U0010ffff", start)
+        return [self.table.record(row) for row in self._rows[start:min(end, start + limit)]]
@@ -0,0 +1,209 @@
+"""
+Bulk ICD-11 code handling for pandas
+Importing this module registers a `.icd11` Series accessor that normalizes,
+classifies, validates and annotates whole columns of codes:
+
+    import app.api.dataframe  # registers the accessor
+
+    df["code"].icd11.normalize()                 # " 5a10 " -> "5A10"
+    df["code"].icd11.kind()                      # "mms", "stem", "uri" or None
+    df["code"].icd11.validate()                  # well-formed?
+    df["code"].icd11.validate(release="2025-01") # ... and present in the release?
+    df.join(df["code"].icd11.lookup(release="2025-01"))
+    df["code"].icd11.chapter()
+
+Each column is factorized first, so the string work runs once per distinct
+value rather than once per row. Lookups hash-join the distinct values
+against the code table of an ingested release. When the release is not
+ingested, each distinct value is fetched once, with bounded concurrency.
+"""
+
+import asyncio
+import importlib.util
+from typing import Any, Dict, Optional, Tuple
+
+from .code_index import CHAPTER_BY_PREFIX, MMS_CODE_PATTERN, STEM_ID_PATTERN, URI_PREFIX
+from .local_store import mms_entity_id
+
+PANDAS_AVAILABLE = importlib.util.find_spec("pandas") is not None
+
+if PANDAS_AVAILABLE:
+    import numpy as np
+    import pandas as pd
+
+LOOKUP_COLUMNS = ["kind", "found", "id", "code", "title", "chapter"]
+
+# (store path, release, language) -> code table of an ingested release
+_code_tables: Dict[Tuple[str, str, str], Any] = {}
+_default_client = None
+
+
+def default_client():
+    """ICD11Client configured from the environment, created on first use"""
+    global _default_client
+    if _default_client is None:
+        from .icd11_client import ICD11Client
+
+        _default_client = ICD11Client()
+    return _default_client
+
+
+def code_table(client, release: str = "2025-01", language: str = "en") -> Optional["pd.DataFrame"]:
+    """id/code/title/chapter of every entity in an ingested release, plus the join keys
+
+    None when the release is not in the client's local store.
+    """
+    store = client.local_store
+    if store is None or not store.is_complete(release, language):
+        return None
+    key = (store.path, release, language)
+    table = _code_tables.get(key)
+    if table is None:
+        table = pd.DataFrame(list(store.iter_entities(release, language)), columns=["id", "code", "title", "chapter"])
+        table["entity_id"] = table["id"].map(mms_entity_id)
+        table["key"] = table["code"].str.strip().str.upper()
+        _code_tables[key] = table
+    return table
+
+
+def _factorize(series: "pd.Series") -> Tuple["np.ndarray", "pd.Series"]:
+    """Row -> distinct-value position (-1 for missing), and the distinct values as strings"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    return codes, pd.Series(uniques, dtype=object).astype(str)
+
+
+def _expand(codes: "np.ndarray", values: "pd.DataFrame", index: "pd.Index") -> "pd.DataFrame":
+    """Per-distinct-value results back to one row per input (missing inputs get NA)"""
+    padded = pd.concat([values, pd.DataFrame([{}], columns=values.columns)], ignore_index=True)
+    rows = np.where(codes < 0, len(values), codes)
+    return padded.take(rows).set_axis(index)
+
+
+def _normalize(values: "pd.Series") -> "pd.Series":
+    stripped = values.str.strip()
+    return stripped.where(stripped.str.startswith(URI_PREFIX), stripped.str.upper())
+
+
+def _kinds(normalized: "pd.Series") -> "pd.Series":
+    kinds = np.select(
+        [
+            normalized.str.startswith(URI_PREFIX),
+            normalized.str.match(MMS_CODE_PATTERN.pattern),
+            normalized.str.match(STEM_ID_PATTERN.pattern),
+        ],
+        ["uri", "mms", "stem"],
+        default=None,
+    )
+    return pd.Series(kinds, index=normalized.index, dtype=object)
+
+
+def _chapters(codes: "pd.Series") -> "pd.Series":
+    """Chapter from the leading character of a well-formed MMS code ("5A10" -> "05", "BA00" -> "11")"""
+    return codes.str.slice(0, 1).map(CHAPTER_BY_PREFIX).where(codes.str.match(MMS_CODE_PATTERN.pattern))
+
+
+class ICD11Accessor:
+    """`Series.icd11`: vectorized validation and annotation of ICD-11 codes"""
+
+    def __init__(self, series: "pd.Series"):
+        self._series = series
+
+    def _distinct(self) -> Tuple["np.ndarray", "pd.DataFrame"]:
+        codes, uniques = _factorize(self._series)
+        normalized = _normalize(uniques)
+        kinds = _kinds(normalized)
+        return codes, pd.DataFrame({"input": uniques, "normalized": normalized, "kind": kinds})
+
+    def normalize(self) -> "pd.Series":
+        """Stripped, upper-cased codes (URIs are only stripped)"""
+        codes, distinct = self._distinct()
+        return _expand(codes, distinct[["normalized"]], self._series.index)["normalized"].rename(self._series.name)
+
+    def kind(self) -> "pd.Series":
+        """"mms", "stem" or "uri" per value (None for anything else)"""
+        codes, distinct = self._distinct()
+        return _expand(codes, distinct[["kind"]], self._series.index)["kind"].rename(self._series.name)
+
+    def validate(self, release: Optional[str] = None, language: str = "en", client=None) -> "pd.Series":
+        """True for well-formed references; with `release`, only for those found in it"""
+        if release is not None:
+            return self.lookup(release, language, client)["found"]
+        return self.kind().notna().rename(self._series.name)
+
+    def chapter(self, release: Optional[str] = None, language: str = "en", client=None) -> "pd.Series":
+        """Chapter code per value; from the release's code table when `release` is given"""
+        if release is not None:
+            return self.lookup(release, language, client)["chapter"]
+        codes, distinct = self._distinct()
+        distinct["chapter"] = _chapters(distinct["normalized"])
+        return _expand(codes, distinct[["chapter"]], self._series.index)["chapter"].rename(self._series.name)
+
+    def lookup(self, release: str = "2025-01", language: str = "en", client=None, concurrency: Optional[int] = None) -> "pd.DataFrame":
+        """kind/found/id/code/title/chapter per value, aligned with the Series index
+
+        Runs on an event loop of its own. Without `client`, a client is created
+        and closed on that loop, since HTTP connections cannot outlive it.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._lookup_on_own_loop(release, language, client, concurrency))
+        raise RuntimeError("An event loop is running; use `await series.icd11.alookup(...)` instead")
+
+    async def _lookup_on_own_loop(self, release: str, language: str, client, concurrency: Optional[int]) -> "pd.DataFrame":
+        if client is not None:
+            return await self.alookup(release, language, client, concurrency)
+        from .icd11_client import ICD11Client
+
+        client = ICD11Client()
+        try:
+            return await self.alookup(release, language, client, concurrency)
+        finally:
+            await client.close()
+
+    async def alookup(self, release: str = "2025-01", language: str = "en", client=None, concurrency: Optional[int] = None) -> "pd.DataFrame":
+        """`lookup` for callers already inside an event loop (the default client lives on the first loop it is used on)"""
+        client = client or default_client()
+        codes, distinct = self._distinct()
+        table = code_table(client, release, language)
+        if table is not None:
+            resolved = self._join(distinct, table)
+        else:
+            resolved = await self._fetch(distinct, client, release, language, concurrency)
+        result = _expand(codes, resolved[LOOKUP_COLUMNS], self._series.index)
+        # Missing inputs come back from the padding row as NA
+        result["found"] = result["found"].fillna(False).astype(bool)
+        return result
+
+    @staticmethod
+    def _join(distinct: "pd.DataFrame", table: "pd.DataFrame") -> "pd.DataFrame":
+        """Hash join of the distinct values on code (MMS codes) or entity id (URIs and stems)"""
+        kinds = distinct["kind"]
+        keys = distinct["normalized"].where(kinds != "uri", distinct["normalized"].map(mms_entity_id))
+        by_code = table.drop_duplicates("key").set_index("key")
+        by_id = table.drop_duplicates("entity_id").set_index("entity_id")
+        columns = ["id", "code", "title", "chapter"]
+        matched = by_code.reindex(keys.where(kinds == "mms"))[columns].set_axis(distinct.index)
+        by_entity = by_id.reindex(keys.where(kinds.isin(["uri", "stem"])))[columns].set_axis(distinct.index)
+        resolved = matched.combine_first(by_entity)[columns]
+        resolved["kind"] = kinds
+        resolved["found"] = resolved["id"].notna()
+        return resolved
+
+    @staticmethod
+    async def _fetch(distinct: "pd.DataFrame", client, release: str, language: str, concurrency: Optional[int]) -> "pd.DataFrame":
+        """One upstream lookup per distinct well-formed value, `concurrency` at a time"""
+        resolved = pd.DataFrame(index=distinct.index, columns=LOOKUP_COLUMNS, dtype=object)
+        resolved["kind"] = distinct["kind"]
+        resolved["found"] = False
+        valid = distinct.index[distinct["kind"].notna()]
+        results = await client.get_many(distinct.loc[valid, "normalized"].tolist(), release, language, concurrency)
+        for position, result in zip(valid, results):
+            if result.get("found"):
+                resolved.loc[position, ["found", "id", "code", "title"]] = [True, result["id"], result["code"], result["title"]]
+        resolved["chapter"] = _chapters(resolved["code"].fillna("").astype(str))
+        return resolved
+
+
+if PANDAS_AVAILABLE:
+    pd.api.extensions.register_series_accessor("icd11")(ICD11Accessor)
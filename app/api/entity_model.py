@@ -0,0 +1,126 @@
+"""
+Memory-compact entity storage
+Struct-of-arrays tables for the per-release indexes (integer ids instead of
+URIs, interned strings) and a packed, compressed encoding for cached WHO
+documents that are only decoded when read.
+"""
+
+import importlib.util
+import json
+import sys
+import zlib
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+if importlib.util.find_spec("orjson") is not None:
+    import orjson
+else:
+    orjson = None
+
+
+def intern(value: Optional[str]) -> Optional[str]:
+    """Share one string object between every index holding the same text"""
+    return sys.intern(value) if value else value
+
+
+def split_uri(uri: str) -> Tuple[Optional[str], int, Optional[str]]:
+    """`http://id.who.int/icd/release/11/2025-01/mms/123/other` -> (base, 123, "other")
+
+    Returns (None, 0, None) if the URI does not end in a numeric entity id.
+    """
+    base, _, rest = uri.rpartition("/")
+    suffix = None
+    if not rest.isdigit():
+        # Residual categories append a suffix to the parent id
+        suffix = rest
+        base, _, rest = base.rpartition("/")
+    if not rest.isdigit():
+        return None, 0, None
+    return base, int(rest), suffix
+
+
+class EntityTable:
+    """Columnar id/code/title/chapter storage; rows are addressed by position"""
+
+    __slots__ = ("_bases", "_base_index", "_base_of", "_numbers", "_suffixes", "codes", "titles", "chapters")
+
+    def __init__(self):
+        # URI prefixes (one per release/linearization in practice)
+        self._bases: List[str] = []
+        self._base_index: Dict[str, int] = {}
+        self._base_of = array("H")
+        self._numbers = array("q")
+        # Rows whose URI is not `<base>/<number>`: residual suffixes or opaque URIs
+        self._suffixes: Dict[int, str] = {}
+        self.codes: List[Optional[str]] = []
+        self.titles: List[Optional[str]] = []
+        self.chapters: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return len(self._numbers)
+
+    def add(self, uri: str, code: Optional[str], title: Optional[str], chapter: Optional[str] = None) -> int:
+        """Append a row and return its position"""
+        row = len(self._numbers)
+        base, number, suffix = split_uri(uri)
+        if base is None:
+            base, suffix = "", uri
+        base_id = self._base_index.get(base)
+        if base_id is None:
+            base_id = self._base_index[base] = len(self._bases)
+            self._bases.append(base)
+        self._base_of.append(base_id)
+        self._numbers.append(number)
+        if suffix is not None:
+            self._suffixes[row] = suffix
+        self.codes.append(intern(code))
+        self.titles.append(intern(title))
+        self.chapters.append(intern(chapter))
+        return row
+
+    def uri(self, row: int) -> str:
+        base = self._bases[self._base_of[row]]
+        suffix = self._suffixes.get(row)
+        if not base:
+            return suffix
+        uri = f"{base}/{self._numbers[row]}"
+        return f"{uri}/{suffix}" if suffix else uri
+
+    def record(self, row: int) -> Dict[str, Any]:
+        """A fresh dict in the WHO `destinationEntities` entry shape"""
+        return {
+            "id": self.uri(row),
+            "title": self.titles[row],
+            "theCode": self.codes[row],
+            "chapter": self.chapters[row],
+        }
+
+
+class PackedDocument:
+    """A cached JSON document held as (compressed) bytes and decoded only when read"""
+
+    __slots__ = ("data", "compressed")
+
+    # Bodies at least this large are zlib-compressed; WHO documents shrink ~2.5x
+    COMPRESS_MIN_BYTES = 512
+
+    def __init__(self, data: bytes, compressed: bool = False):
+        self.data = data
+        self.compressed = compressed
+
+    @classmethod
+    def pack(cls, value: Any) -> "PackedDocument":
+        if orjson is not None:
+            data = orjson.dumps(value)
+        else:
+            data = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        if len(data) >= cls.COMPRESS_MIN_BYTES:
+            return cls(zlib.compress(data), compressed=True)
+        return cls(data)
+
+    def unpack(self) -> Any:
+        """Decode to a new object; callers never share (or mutate) the cached copy"""
+        data = zlib.decompress(self.data) if self.compressed else self.data
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
@@ -0,0 +1,220 @@
+"""
+Streaming export of a full MMS linearization
+Depth-first walk of a release that yields one flat row per entity as it is
+fetched, with bounded concurrency and memory proportional to tree depth.
+Every row carries a `cursor` (its child-index path from the root) that a
+later export can resume after.
+"""
+
+import asyncio
+import csv
+import importlib.util
+import io
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+
+from .local_store import mms_entity_id
+
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+COLUMNS = ["cursor", "id", "code", "title", "class_kind", "parent_code", "depth", "chapter", "leaf"]
+
+Row = Dict[str, Any]
+Fetch = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[List[int]]:
+    """`"3.0.12"` -> [3, 0, 12]; None or empty starts from the beginning"""
+    if not cursor:
+        return None
+    return [int(part) for part in cursor.split(".")]
+
+
+def _title(document: Dict[str, Any]) -> Optional[str]:
+    title = document.get("title")
+    return title.get("@value") if isinstance(title, dict) else title
+
+
+async def fetch_root(client, release: str = "2025-01", language: str = "en") -> Dict[str, Any]:
+    """The release root document, in exactly `language` (rows are labelled with it)"""
+    return await client.get_mms_entities(release, language, fallback=False)
+
+
+async def walk_release(
+    client,
+    release: str = "2025-01",
+    language: str = "en",
+    concurrency: int = 8,
+    cursor: Optional[str] = None,
+    root: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[Row]:
+    """Yield every entity below the release root in depth-first pre-order
+
+    `cursor` is the cursor of the last row already received; the walk resumes
+    right after it. If an upstream fetch fails the iterator raises, and the
+    caller can resume from the last cursor it saw. Rows are labelled with
+    `language`, so no other language is requested. `root` is the root
+    document when the caller has already fetched it.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(entity_id: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await client.get_mms_entity(entity_id, release, language, fallback=False)
+
+    if root is None:
+        root = await fetch_root(client, release, language)
+    async for row in _walk(fetch, root.get("child") or [], [], 1, None, None, parse_cursor(cursor), max(1, concurrency)):
+        yield row
+
+
+async def _walk(
+    fetch: Fetch,
+    child_uris: List[str],
+    path: List[int],
+    depth: int,
+    chapter: Optional[str],
+    parent_code: Optional[str],
+    resume: Optional[List[int]],
+    lookahead: int,
+) -> AsyncIterator[Row]:
+    """Walk one child list in order, prefetching up to `lookahead` siblings"""
+    start = resume[0] if resume else 0
+    ids = [mms_entity_id(uri) for uri in child_uris[start:]]
+    window: Deque[asyncio.Future] = deque()
+    scheduled = 0
+    try:
+        for offset in range(len(ids)):
+            while len(window) < lookahead and scheduled < len(ids):
+                window.append(asyncio.ensure_future(fetch(ids[scheduled])))
+                scheduled += 1
+            document = await window.popleft()
+
+            index = start + offset
+            node_path = path + [index]
+            # The node named by the cursor and its ancestors were already exported
+            on_resume_path = resume is not None and offset == 0
+            code = document.get("code") or None
+            node_chapter = code if depth == 1 else chapter
+            children = document.get("child") or []
+
+            if not on_resume_path:
+                yield {
+                    "cursor": ".".join(map(str, node_path)),
+                    "id": ids[offset],
+                    "code": code,
+                    "title": _title(document),
+                    "class_kind": document.get("classKind"),
+                    "parent_code": parent_code,
+                    "depth": depth,
+                    "chapter": node_chapter,
+                    "leaf": not children,
+                }
+
+            child_resume = (resume[1:] or None) if on_resume_path else None
+            # Blocks have no code; their children report the nearest coded ancestor
+            async for row in _walk(fetch, children, node_path, depth + 1, node_chapter, code or parent_code, child_resume, lookahead):
+                yield row
+    finally:
+        # Consumer went away mid-walk: drop prefetches that are still running
+        for future in window:
+            future.cancel()
+
+
+async def batched(rows: AsyncIterator[Row], size: int = 256) -> AsyncIterator[List[Row]]:
+    """Group rows so each streamed chunk carries many of them
+
+    If the rows fail, the rows received so far are still yielded before the
+    error propagates, so the last cursor sent is the last row walked.
+    """
+    batch: List[Row] = []
+    try:
+        async for row in rows:
+            batch.append(row)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+    except Exception:
+        if batch:
+            yield batch
+        raise
+    if batch:
+        yield batch
+
+
+async def track(rows: AsyncIterator[Row], progress: Dict[str, Optional[str]]) -> AsyncIterator[Row]:
+    """Pass rows through, keeping the cursor of the latest one in `progress["cursor"]`"""
+    async for row in rows:
+        progress["cursor"] = row["cursor"]
+        yield row
+
+
+async def csv_chunks(rows: AsyncIterator[Row], size: int = 256) -> AsyncIterator[bytes]:
+    """CSV with a header row, one chunk per batch of rows"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    async for batch in batched(rows, size):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """Write-only file for ParquetWriter that hands written bytes back as chunks"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # Parquet footers store absolute offsets, so this must not reset on drain
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        chunk = b"".join(self._chunks)
+        self._chunks.clear()
+        return chunk
+
+
+async def parquet_chunks(rows: AsyncIterator[Row], row_group_size: int = 4096) -> AsyncIterator[bytes]:
+    """Parquet file streamed one row group at a time (requires pyarrow)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("cursor", pa.string()),
+        ("id", pa.string()),
+        ("code", pa.string()),
+        ("title", pa.string()),
+        ("class_kind", pa.string()),
+        ("parent_code", pa.string()),
+        ("depth", pa.int16()),
+        ("chapter", pa.string()),
+        ("leaf", pa.bool_()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for batch in batched(rows, row_group_size):
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
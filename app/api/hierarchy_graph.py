@@ -0,0 +1,199 @@
+"""
+In-memory hierarchy graph for a release
+Entities are numbered with integers and stored in flat arrays: a CSR parent
+list, and a pre-order interval numbering of the primary-parent spanning tree,
+where every node owns the interval [position, end) covering its subtree.
+Descendant checks are O(1) comparisons and a subtree listing is a slice.
+
+Nodes with several parents are placed once, under the first parent the walk
+reaches; their other parent edges are kept in a separate adjacency list that
+queries follow on top of the intervals. Memory stays linear in the number of
+nodes and edges however many paths lead to a node. The MMS releases the
+graph is built from are trees, so in practice every query is a slice.
+"""
+
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .entity_model import intern
+
+
+class UnknownEntity(LookupError):
+    """Raised when an entity id is not part of the release graph"""
+
+
+class HierarchyGraph:
+    """Compact ancestor/descendant index over integer entity ids"""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.codes: List[Optional[str]] = []
+        self.titles: List[Optional[str]] = []
+        self._index: Dict[str, int] = {}
+        # CSR parent lists: parents of node n are _parents[_parent_start[n]:_parent_start[n + 1]]
+        self._parent_start = array("i")
+        self._parents = array("i")
+        # Pre-order over the primary-parent spanning tree; node n sits at _position[n]
+        self._order = array("i")
+        self._end = array("i")
+        self._position = array("i")
+        # Secondary parent edges (parent -> children placed under another parent)
+        self._secondary: Dict[int, List[int]] = {}
+        self.roots: List[int] = []
+
+    @classmethod
+    def build(cls, nodes: Iterable[Tuple[str, Optional[str], Optional[str], Sequence[str]]]) -> "HierarchyGraph":
+        """Build from (id, code, title, child ids) tuples; children keep their order"""
+        graph = cls()
+        children: List[List[str]] = []
+        for entity_id, code, title, child_ids in nodes:
+            graph._index[entity_id] = len(graph.ids)
+            graph.ids.append(entity_id)
+            graph.codes.append(intern(code))
+            graph.titles.append(intern(title))
+            children.append(list(child_ids))
+
+        size = len(graph.ids)
+        child_lists = [
+            [graph._index[c] for c in child_ids if c in graph._index] for child_ids in children
+        ]
+        parent_lists: List[List[int]] = [[] for _ in range(size)]
+        for node, kids in enumerate(child_lists):
+            for kid in kids:
+                parent_lists[kid].append(node)
+
+        graph._parent_start.append(0)
+        for parents in parent_lists:
+            graph._parents.extend(parents)
+            graph._parent_start.append(len(graph._parents))
+
+        graph.roots = [node for node in range(size) if not parent_lists[node]]
+        graph._number(child_lists)
+        return graph
+
+    def _number(self, child_lists: List[List[int]]) -> None:
+        """Iterative pre-order walk placing every node once and assigning [position, end)
+
+        A child that is already placed (a second parent, or a cycle) becomes a
+        secondary edge. Nodes only reachable through a cycle are walked from
+        the first of them, so every node has a position.
+        """
+        size = len(self.ids)
+        self._position = array("i", [-1]) * size
+        self._end = array("i", [0]) * size
+        for start in self.roots + list(range(size)):
+            if self._position[start] >= 0:
+                continue
+            # Stack of (node, next child index)
+            stack = [(start, 0)]
+            self._place(start)
+            while stack:
+                node, next_child = stack[-1]
+                kids = child_lists[node]
+                if next_child < len(kids):
+                    stack[-1] = (node, next_child + 1)
+                    kid = kids[next_child]
+                    if self._position[kid] >= 0:
+                        self._secondary.setdefault(node, []).append(kid)
+                        continue
+                    self._place(kid)
+                    stack.append((kid, 0))
+                else:
+                    stack.pop()
+                    self._end[self._position[node]] = len(self._order)
+
+    def _place(self, node: int) -> None:
+        self._position[node] = len(self._order)
+        self._order.append(node)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, entity_id: str) -> bool:
+        return entity_id in self._index
+
+    def node(self, entity_id: str) -> int:
+        """Integer id of an entity"""
+        node = self._index.get(entity_id)
+        if node is None:
+            raise UnknownEntity(f"Entity {entity_id} is not in this release")
+        return node
+
+    def describe(self, node: int) -> Dict[str, Optional[str]]:
+        return {"id": self.ids[node], "code": self.codes[node], "title": self.titles[node]}
+
+    def parents(self, node: int) -> Sequence[int]:
+        return self._parents[self._parent_start[node]:self._parent_start[node + 1]]
+
+    def _in_subtree(self, node: int, ancestor: int) -> bool:
+        start = self._position[ancestor]
+        return start < self._position[node] < self._end[start]
+
+    def is_descendant(self, node: int, ancestor: int) -> bool:
+        """True if `node` lies strictly below `ancestor`"""
+        if self._in_subtree(node, ancestor):
+            return True
+        if not self._secondary:
+            return False
+        # Some path may enter the subtree through a secondary edge: check every ancestor of `node`
+        return any(n == ancestor or self._in_subtree(n, ancestor) for n in self.ancestors(node))
+
+    def descendants(self, node: int) -> Sequence[int]:
+        """All nodes strictly below `node`, in pre-order (a slice for trees)"""
+        start = self._position[node]
+        subtree = self._order[start + 1:self._end[start]]
+        if not self._secondary:
+            return subtree
+        # Follow secondary edges out of the subtree, adding each spanning subtree they reach once
+        result: List[int] = []
+        seen: Set[int] = {node}
+        pending = [node]
+        while pending:
+            top = pending.pop()
+            if top in seen and top != node:
+                # Already listed inside a subtree walked earlier, with everything below it
+                continue
+            position = self._position[top]
+            for n in [top, *self._order[position + 1:self._end[position]]]:
+                if n not in seen:
+                    seen.add(n)
+                    result.append(n)
+                for kid in self._secondary.get(n, ()):
+                    if kid not in seen:
+                        pending.append(kid)
+        return result
+
+    def descendant_count(self, node: int) -> int:
+        if not self._secondary:
+            start = self._position[node]
+            return self._end[start] - start - 1
+        return len(self.descendants(node))
+
+    def ancestors(self, node: int) -> List[int]:
+        """All nodes above `node`, nearest first (breadth-first over parents)"""
+        result: List[int] = []
+        seen: Set[int] = {node}
+        frontier = [node]
+        while frontier:
+            upper = []
+            for current in frontier:
+                for parent in self.parents(current):
+                    if parent not in seen:
+                        seen.add(parent)
+                        result.append(parent)
+                        upper.append(parent)
+            frontier = upper
+        return result
+
+    def lca(self, a: int, b: int) -> List[int]:
+        """Lowest common ancestors of two nodes (one for a tree; possibly several in a polyhierarchy)
+
+        A node counts as its own ancestor, so the LCA of X and a descendant of X is X.
+        """
+        if a == b or self.is_descendant(b, a):
+            return [a]
+        if self.is_descendant(a, b):
+            return [b]
+        common = [n for n in self.ancestors(a) if self.is_descendant(b, n)]
+        # Keep only those with no other common ancestor below them
+        return [n for n in common if not any(other != n and self.is_descendant(other, n) for other in common)]
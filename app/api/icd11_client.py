@@ -3,61 +3,131 @@ ICD-11 API Client
 Handles authentication and API calls to the ICD-11 service
 """
 
+import asyncio
 import httpx
 import os
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple, Iterable, AsyncIterator
 from dotenv import load_dotenv
 
+from .cache import FOREVER, TieredCache, make_key
+from .code_index import MMS_CODE_PATTERN, CodeIndex, code_kind, normalize_code
+from .hierarchy_graph import HierarchyGraph
+from .language_fallback import LANGUAGE_SEGMENT, LanguageFallback, endpoint_scope
+from .local_store import ROOT_ID, LocalReleaseUnavailable, LocalStore, mms_entity_id
+from .metrics import UpstreamMetrics
+from .pipeline import (
+    AuthStage, CacheStage, CoalesceStage, DecodeStage, Pipeline,
+    RateLimitStage, RetryStage, StageTimings, TransportStage, UpstreamRequest,
+)
+from .ratelimit import Governor
+from .release_diff import diff_releases
+from .search_index import SearchIndex
+from .singleflight import SingleFlight
+from .suggest import SuggestIndex, strip_markup
+from .token_manager import TokenManager
+from .transport import RetryPolicy, build_http_client
+from .warmup import AccessLog, Prefetcher
+
 load_dotenv()
 
 
 class ICD11Client:
     """Client for ICD-11 API interactions"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        http_client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[TieredCache] = None,
+        local_store: Optional[LocalStore] = None,
+    ):
         self.base_url = os.getenv("ICD11_API_URL", "https://id.who.int/icd")
         self.client_id = os.getenv("ICD11_CLIENT_ID")
         self.client_secret = os.getenv("ICD11_CLIENT_SECRET")
         self.token_url = os.getenv("ICD11_TOKEN_URL", "https://icdaccessmanagement.who.int/connect/token")
-        self.access_token: Optional[str] = None
-        self.client = httpx.AsyncClient()
+        self.client = http_client or build_http_client()
+        self.retry = RetryPolicy.from_env()
+        # Separate upstream budgets for search and entity fetches
+        self.governors = {
+            "search": Governor.from_env("search", default_rate=10.0),
+            "entity": Governor.from_env("entity", default_rate=20.0),
+        }
+        self.tokens = TokenManager(
+            self.client,
+            self.token_url,
+            self.client_id,
+            self.client_secret,
+            refresh_margin=float(os.getenv("ICD11_TOKEN_REFRESH_MARGIN", "300")),
+            retry=self.retry,
+        )
+        self.cache = cache if cache is not None else TieredCache.from_env()
+        self.inflight = SingleFlight()
+        # Per-language fallback chains (e.g. nb -> no -> en), requested concurrently
+        self.language_fallback = LanguageFallback.from_env()
+        # Offline MMS store populated by `python -m app.ingest` (None if not ingested)
+        self.local_store = local_store if local_store is not None else LocalStore.from_env()
+        # In-process full-text indexes over the local store, keyed by (release, language)
+        self._search_indexes: Dict[Tuple[str, str], SearchIndex] = {}
+        self._index_lock = asyncio.Lock()
+        self._code_indexes: Dict[Tuple[str, str], CodeIndex] = {}
+        self._graphs: Dict[Tuple[str, str], HierarchyGraph] = {}
+        self._suggest_indexes: Dict[Tuple[str, str], SuggestIndex] = {}
+        self._store_generation: Optional[Tuple[int, int]] = None
+        # Max concurrent upstream fetches when resolving parents/children
+        self.fanout_limit = int(os.getenv("ICD11_FANOUT_LIMIT", "8"))
+        # Max concurrent lookups per batch request
+        self.batch_concurrency = int(os.getenv("ICD11_BATCH_CONCURRENCY", "16"))
+        # View counts feeding the startup warmup, and speculative neighbour fetches
+        self.access_log = AccessLog.from_env()
+        self.prefetcher = Prefetcher.from_env(self)
+        self.pipeline = self._build_pipeline()
+        self.stage_timings = StageTimings()
+        self.pipeline.add_hook(self.stage_timings)
+        self.upstream_metrics = UpstreamMetrics(self.base_url)
+        self.pipeline.add_hook(self.upstream_metrics)
+    
+    @property
+    def access_token(self) -> Optional[str]:
+        """Currently held, unexpired access token (if any)"""
+        return self.tokens.token
     
     async def get_access_token(self) -> str:
         """Obtain access token for ICD-11 API"""
-        if not self.client_id or not self.client_secret:
-            raise ValueError("ICD11 client credentials not configured")
-        
-        data = {
-            "client_id": self.client_id,
-            "client_secret": self.client_secret,
-            "scope": "icdapi_access",
-            "grant_type": "client_credentials"
-        }
-        
-        response = await self.client.post(self.token_url, data=data)
-        response.raise_for_status()
-        
-        token_data = response.json()
-        self.access_token = token_data["access_token"]
-        return self.access_token
-    
-    async def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Dict[Any, Any]:
-        """Make authenticated request to ICD-11 API"""
-        if not self.access_token:
-            await self.get_access_token()
+        return await self.tokens.get_token()
+    
+    def _build_pipeline(self) -> Pipeline:
+        """Assemble the upstream request pipeline every API call goes through"""
+        return Pipeline([
+            ("cache", CacheStage(self.cache)),
+            ("coalesce", CoalesceStage(self.inflight)),
+            ("decode", DecodeStage()),
+            ("auth", AuthStage(self.tokens)),
+            ("retry", RetryStage(self.retry)),
+            ("ratelimit", RateLimitStage(self.governors)),
+            ("transport", TransportStage(self.client)),
+        ])
+    
+    async def _make_request(self, endpoint: str, params: Optional[Dict] = None, language: str = "en", use_cache: bool = True, fallback: bool = True) -> Dict[Any, Any]:
+        """Make authenticated request to ICD-11 API
         
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Accept": "application/json",
-            "API-Version": "v2",
-            "Accept-Language": "en"
-        }
+        Returned payloads may be shared with the cache and must not be mutated.
+        """
+        payload, _ = await self._request_with_language(endpoint, params, language, use_cache, fallback)
+        return payload
+    
+    async def _request_with_language(self, endpoint: str, params: Optional[Dict] = None, language: str = "en", use_cache: bool = True, fallback: bool = True) -> Tuple[Dict[Any, Any], str]:
+        """Request in `language`, hedged against its fallback languages
         
-        url = f"{self.base_url}/{endpoint}"
-        response = await self.client.get(url, headers=headers, params=params)
-        response.raise_for_status()
+        A `{language}` segment in `endpoint` is filled in per attempted
+        language. Returns the payload and the language that served it.
+        With `fallback=False` only `language` itself is requested.
+        """
+        async def call(attempt: str) -> Dict[Any, Any]:
+            url = f"{self.base_url}/{endpoint.replace(LANGUAGE_SEGMENT, attempt)}"
+            return await self.pipeline(UpstreamRequest(url, attempt, params, use_cache))
         
-        return response.json()
+        if not fallback:
+            return await call(language), language
+        return await self.language_fallback.run(endpoint_scope(endpoint), language, call)
     
     async def search_entities(self, query: str, use_flexisearch: bool = True, language: str = "en") -> Dict[Any, Any]:
         """Search for ICD-11 entities with language support"""
@@ -68,48 +138,21 @@ class ICD11Client:
             "useFlexisearch": str(use_flexisearch).lower()
         }
         
-        # Update headers for specific language
-        headers = {
-            "Authorization": f"Bearer {self.access_token or await self.get_access_token()}",
-            "Accept": "application/json",
-            "API-Version": "v2",
-            "Accept-Language": language
-        }
-        
-        url = f"{self.base_url}/{endpoint}"
-        response = await self.client.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        
-        return response.json()
+        return await self._make_request(endpoint, params, language)
 
     async def get_entity_details(self, entity_id: str, language: str = "en", include_children: bool = False) -> Dict[Any, Any]:
         """Get detailed information about a specific ICD-11 entity"""
         endpoint = f"entity/{entity_id}"
         
-        headers = {
-            "Authorization": f"Bearer {self.access_token or await self.get_access_token()}",
-            "Accept": "application/json",
-            "API-Version": "v2",
-            "Accept-Language": language
-        }
-        
-        url = f"{self.base_url}/{endpoint}"
-        response = await self.client.get(url, headers=headers)
-        response.raise_for_status()
-        
-        entity_data = response.json()
+        # Copy so the cached document is not mutated below
+        entity_data = dict(await self._make_request(endpoint, language=language))
         
         # If requested, get children entities
         if include_children and 'child' in entity_data:
-            children_data = []
-            for child_url in entity_data.get('child', []):
-                child_id = child_url.split('/')[-1]
-                try:
-                    child_data = await self.get_entity(child_id)
-                    children_data.append(child_data)
-                except:
-                    continue
-            entity_data['children_details'] = children_data
+            children, errors = await self._fetch_linked(entity_data.get('child', []), language)
+            entity_data['children_details'] = children
+            if errors:
+                entity_data['children_errors'] = errors
         
         return entity_data
 
@@ -117,34 +160,51 @@ class ICD11Client:
         """Get hierarchy information for an entity (parents and children)"""
         entity = await self.get_entity_details(entity_id, language)
         
+        # Parents and children are fetched concurrently under a shared fan-out limit
+        semaphore = asyncio.Semaphore(self.fanout_limit)
+        (parents, parent_errors), (children, child_errors) = await asyncio.gather(
+            self._fetch_linked(entity.get('parent', []), language, semaphore),
+            self._fetch_linked(entity.get('child', []), language, semaphore),
+        )
+        errors = parent_errors + child_errors
+        
         hierarchy = {
             "current": entity,
-            "parents": [],
-            "children": [],
+            "parents": parents,
+            "children": children,
             "siblings": []
         }
+        if errors:
+            hierarchy["errors"] = errors
+        
+        return hierarchy
+    
+    async def _fetch_linked(self, entity_urls: List[str], language: str = "en", semaphore: Optional[asyncio.Semaphore] = None) -> Tuple[List[Dict[Any, Any]], List[Dict[str, Any]]]:
+        """Fetch linked entities concurrently, bounded by the fan-out limit
         
-        # Get parent information
-        if 'parent' in entity:
-            for parent_url in entity.get('parent', []):
-                parent_id = parent_url.split('/')[-1]
-                try:
-                    parent_data = await self.get_entity(parent_id)
-                    hierarchy['parents'].append(parent_data)
-                except:
-                    continue
+        Returns the successfully fetched entities in their original order and
+        a list of per-entity errors for those that failed.
+        """
+        semaphore = semaphore or asyncio.Semaphore(self.fanout_limit)
         
-        # Get children information
-        if 'child' in entity:
-            for child_url in entity.get('child', []):
-                child_id = child_url.split('/')[-1]
-                try:
-                    child_data = await self.get_entity(child_id)
-                    hierarchy['children'].append(child_data)
-                except:
-                    continue
+        async def fetch_one(entity_url: str) -> Dict[Any, Any]:
+            async with semaphore:
+                return await self.get_entity_details(entity_url.split('/')[-1], language)
         
-        return hierarchy
+        outcomes = await asyncio.gather(*(fetch_one(url) for url in entity_urls), return_exceptions=True)
+        
+        results = []
+        errors = []
+        for entity_url, outcome in zip(entity_urls, outcomes):
+            if isinstance(outcome, Exception):
+                errors.append({
+                    "id": entity_url,
+                    "error": type(outcome).__name__,
+                    "detail": str(outcome)
+                })
+            else:
+                results.append(outcome)
+        return results, errors
     
     async def get_entity(self, entity_id: str) -> Dict[Any, Any]:
         """Get specific ICD-11 entity by ID (legacy method)"""
@@ -169,20 +229,18 @@ class ICD11Client:
         }
 
     async def search_with_fallback(self, query: str, preferred_language: str = "no", use_flexisearch: bool = True) -> Dict[Any, Any]:
-        """Search with language fallback for Norwegian support"""
-        try:
-            # Try preferred language first
-            results = await self.search_entities(query, use_flexisearch, preferred_language)
+        """Search in the preferred language, hedged against its fallbacks (e.g. Norwegian -> English)"""
+        params = {
+            "q": query,
+            "flatResults": "false",
+            "useFlexisearch": str(use_flexisearch).lower()
+        }
+        results, language_used = await self._request_with_language("entity/search", params, preferred_language)
+        if language_used == preferred_language:
             return {"results": results, "language_used": preferred_language, "fallback_used": False}
-        except Exception as e:
-            # Fallback to English if Norwegian not available
-            if preferred_language in ["no", "nb", "nn"]:
-                results = await self.search_entities(query, use_flexisearch, "en")
-                return {"results": results, "language_used": "en", "fallback_used": True, "fallback_reason": "Norwegian not yet available"}
-            else:
-                raise e
+        return {"results": results, "language_used": language_used, "fallback_used": True, "fallback_reason": f"'{preferred_language}' not available"}
     
-    async def enhanced_search(self, query: str, search_type: str = "mms", release: str = "2025-01", language: str = "en", use_flexisearch: bool = True) -> Dict[Any, Any]:
+    async def enhanced_search(self, query: str, search_type: str = "mms", release: str = "2025-01", language: str = "en", use_flexisearch: bool = True, engine: str = "auto") -> Dict[Any, Any]:
         """Enhanced search that detects if query is a code and searches appropriately"""
         # Detect if query looks like an ICD-11 code
         is_code_query = self._is_icd_code(query)
@@ -198,8 +256,8 @@ class ICD11Client:
             }
         else:
             # Regular text search
-            if search_type == "mms":
-                result = await self.search_mms(query, release, language, use_flexisearch)
+            if search_type == "mms" or engine == "local":
+                result = await self.search_mms(query, release, language, use_flexisearch, engine)
             else:
                 result = await self.search_entities(query, use_flexisearch, language)
             return {
@@ -210,42 +268,41 @@ class ICD11Client:
             }
     
     def _is_icd_code(self, query: str) -> bool:
-        """Detect if query looks like an ICD-11 code"""
-        import re
-        # ICD-11 patterns:
-        # MMS codes: 5A10, 5A13.4, 1A00.0, etc.
-        # Foundation IDs: longer alphanumeric strings
-        # URI format: http://id.who.int/icd/entity/...
-        
-        query = query.strip()
-        
-        # Check for URI format
-        if query.startswith("http://id.who.int/icd/"):
-            return True
-            
-        # Check for MMS code patterns (e.g., 5A10, 1A00.0, 5A13.4)
-        mms_pattern = r'^[0-9][A-Z][0-9]{1,2}(\.[0-9A-Z]{1,3})?$'
-        if re.match(mms_pattern, query):
-            return True
-            
-        # Check for Foundation stem IDs (typically longer numbers)
-        if query.isdigit() and len(query) > 6:
-            return True
-            
-        return False
+        """Detect if query looks like an ICD-11 code, entity URI or Foundation stem ID"""
+        return code_kind(query.strip()) is not None
     
-    async def get_foundation_entities(self, language: str = "en") -> Dict[Any, Any]:
-        """Get foundation entities from ICD-11"""
-        endpoint = f"release/11/2023-01/mms/en"
-        return await self._make_request(endpoint)
+    async def get_foundation_entities(self, release: str = "2025-01", language: str = "en") -> Dict[Any, Any]:
+        """Get the Foundation root entity (top-level children) of a release"""
+        return await self._make_request("entity", {"releaseId": release}, language)
     
-    async def get_mms_entities(self, release: str = "2025-01", language: str = "en") -> Dict[Any, Any]:
+    async def get_mms_entities(self, release: str = "2025-01", language: str = "en", fallback: bool = True, use_cache: bool = True) -> Dict[Any, Any]:
         """Get MMS (Mortality and Morbidity Statistics) linearization entities"""
-        endpoint = f"release/11/{release}/mms/{language}"
-        return await self._make_request(endpoint)
+        document, _ = await self.get_mms_entities_with_language(release, language, fallback, use_cache)
+        return document
+    
+    async def get_mms_entities_with_language(self, release: str = "2025-01", language: str = "en", fallback: bool = True, use_cache: bool = True) -> Tuple[Dict[Any, Any], str]:
+        """`get_mms_entities` plus the language that served it (a fallback when `language` is missing)"""
+        if self.local_store is not None:
+            document = self.local_store.get_document(release, language, ROOT_ID)
+            if document is not None:
+                return document, language
+        endpoint = f"release/11/{release}/mms/{LANGUAGE_SEGMENT}"
+        return await self._request_with_language(endpoint, language=language, use_cache=use_cache, fallback=fallback)
     
-    async def search_mms(self, query: str, release: str = "2025-01", language: str = "en", use_flexisearch: bool = True) -> Dict[Any, Any]:
-        """Search within MMS linearization for official medical codes"""
+    async def search_mms(self, query: str, release: str = "2025-01", language: str = "en", use_flexisearch: bool = True, engine: str = "auto") -> Dict[Any, Any]:
+        """Search within MMS linearization for official medical codes
+        
+        engine: 'remote' always queries the WHO API, 'local' uses the in-process
+        index over the ingested release, 'auto' uses local when it is available.
+        """
+        results, _ = await self.search_mms_with_language(query, release, language, use_flexisearch, engine)
+        return results
+    
+    async def search_mms_with_language(self, query: str, release: str = "2025-01", language: str = "en", use_flexisearch: bool = True, engine: str = "auto") -> Tuple[Dict[Any, Any], str]:
+        """`search_mms` plus the language that served the results"""
+        if engine == "local" or (engine == "auto" and self._has_local_release(release, language)):
+            return await self.local_search(query, release, language), language
+        
         endpoint = f"release/11/{release}/mms/search"
         params = {
             "q": query,
@@ -253,21 +310,21 @@ class ICD11Client:
             "useFlexisearch": str(use_flexisearch).lower()
         }
         
-        headers = {
-            "Authorization": f"Bearer {self.access_token or await self.get_access_token()}",
-            "Accept": "application/json",
-            "API-Version": "v2",
-            "Accept-Language": language
-        }
-        
-        url = f"{self.base_url}/{endpoint}"
-        response = await self.client.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        
-        return response.json()
+        return await self._request_with_language(endpoint, params, language)
     
-    async def search_by_code(self, code: str, release: str = "2025-01", language: str = "en", search_type: str = "mms") -> Dict[Any, Any]:
+    async def search_by_code(self, code: str, release: str = "2025-01", language: str = "en", search_type: str = "mms", fallback: bool = True) -> Dict[Any, Any]:
         """Search for ICD-11 entities by specific code (e.g., '6A05', '5A13.4')"""
+        if search_type == "mms" and self._has_local_release(release, language):
+            # O(1) exact code hit, then a prefix range scan (e.g. '5A1'), then text search
+            code_index = self._get_code_index(release, language)
+            exact = code_index.get(code)
+            if exact is not None:
+                return self._local_result([{**exact, "score": 1.0}])
+            matches = code_index.prefix(code)
+            if matches:
+                return self._local_result([{**m, "score": 1.0} for m in matches])
+            return await self.local_search(code, release, language)
+        
         if search_type == "mms":
             # For MMS, try exact search first, then flexible search
             endpoint = f"release/11/{release}/mms/search"
@@ -280,22 +337,20 @@ class ICD11Client:
                 "includeKeywordResult": "true"
             }
             
-            headers = {
-                "Authorization": f"Bearer {self.access_token or await self.get_access_token()}",
-                "Accept": "application/json",
-                "API-Version": "v2",
-                "Accept-Language": language
-            }
+            # Try exact search first
+            exact_results = await self._make_request(endpoint, exact_params, language, fallback=fallback)
             
-            url = f"{self.base_url}/{endpoint}"
+            # If exact search finds the code itself, return it
+            exact_entities = exact_results.get('destinationEntities') or []
+            if any(normalize_code(e.get('theCode') or '') == normalize_code(code) for e in exact_entities):
+                return exact_results
             
-            # Try exact search first
-            exact_response = await self.client.get(url, headers=headers, params=exact_params)
-            exact_response.raise_for_status()
-            exact_results = exact_response.json()
+            # Otherwise resolve the code directly through codeinfo
+            resolved = await self._resolve_code(code, release, language, fallback)
+            if resolved is not None:
+                return {**exact_results, 'destinationEntities': [resolved] + exact_entities}
             
-            # If exact search finds results, return them
-            if exact_results.get('destinationEntities') and len(exact_results['destinationEntities']) > 0:
+            if exact_entities:
                 return exact_results
             
             # Otherwise, try flexible search
@@ -306,9 +361,7 @@ class ICD11Client:
                 "includeKeywordResult": "true"
             }
             
-            flex_response = await self.client.get(url, headers=headers, params=flex_params)
-            flex_response.raise_for_status()
-            return flex_response.json()
+            return await self._make_request(endpoint, flex_params, language, fallback=fallback)
             
         else:
             # Search in Foundation by stemId or code
@@ -320,24 +373,340 @@ class ICD11Client:
                 "fieldFilter": "theCode,stemId"
             }
             
-            headers = {
-                "Authorization": f"Bearer {self.access_token or await self.get_access_token()}",
-                "Accept": "application/json",
-                "API-Version": "v2",
-                "Accept-Language": language
+            return await self._make_request(endpoint, params, language, fallback=fallback)
+    
+    async def _resolve_code(self, code: str, release: str, language: str, fallback: bool = True) -> Optional[Dict[str, Any]]:
+        """Resolve an exact MMS code via the WHO codeinfo endpoint (None if unknown)"""
+        endpoint = f"release/11/{release}/mms/codeinfo/{normalize_code(code)}"
+        try:
+            info = await self._make_request(endpoint, language=language, fallback=fallback)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code in (400, 404):
+                return None
+            raise
+        stem_id = info.get('stemId')
+        if not stem_id:
+            return None
+        entity = await self.get_mms_entity(mms_entity_id(stem_id), release, language, fallback)
+        title = entity.get('title')
+        return {
+            "id": stem_id,
+            "title": title.get('@value') if isinstance(title, dict) else title,
+            "theCode": entity.get('code') or normalize_code(code),
+            "score": 1.0
+        }
+    
+    async def get_mms_entity(self, entity_id: str, release: str = "2025-01", language: str = "en", fallback: bool = True, use_cache: bool = True) -> Dict[Any, Any]:
+        """Get specific entity from MMS linearization
+        
+        `use_cache=False` bypasses the response cache (bulk ingest writes to the local store instead).
+        """
+        document, _ = await self.get_mms_entity_with_language(entity_id, release, language, fallback, use_cache)
+        return document
+    
+    async def get_mms_entity_with_language(self, entity_id: str, release: str = "2025-01", language: str = "en", fallback: bool = True, use_cache: bool = True) -> Tuple[Dict[Any, Any], str]:
+        """`get_mms_entity` plus the language that served it (a fallback when `language` is missing)"""
+        if self.local_store is not None:
+            document = self.local_store.get_document(release, language, entity_id)
+            if document is not None:
+                return document, language
+        endpoint = f"release/11/{release}/mms/{LANGUAGE_SEGMENT}/{entity_id}"
+        return await self._request_with_language(endpoint, language=language, use_cache=use_cache, fallback=fallback)
+    
+    async def lookup(self, item: str, release: str = "2025-01", language: str = "en") -> Dict[str, Any]:
+        """Resolve one MMS code or entity ID/URI to its id, code and title
+
+        Batch and bulk callers label results with `language`, so only that
+        language is requested; a missing translation is not found.
+        """
+        value = item.strip()
+        if value.startswith("http://id.who.int/icd/"):
+            kind, key = "id", mms_entity_id(value)
+        elif MMS_CODE_PATTERN.match(value.upper()):
+            kind, key = "code", normalize_code(value)
+        elif value.isdigit():
+            kind, key = "id", value
+        else:
+            raise ValueError(f"Not an MMS code or entity ID: {item!r}")
+        
+        if kind == "code":
+            if self._has_local_release(release, language):
+                entry = self._get_code_index(release, language).get(key)
+            else:
+                results = await self.search_by_code(key, release, language, fallback=False)
+                entry = next(
+                    (e for e in results.get('destinationEntities') or [] if normalize_code(e.get('theCode') or '') == key),
+                    None
+                )
+            if entry is None:
+                return {"input": item, "kind": kind, "found": False}
+            return {"input": item, "kind": kind, "found": True, "id": entry["id"], "code": entry["theCode"], "title": entry["title"]}
+        
+        try:
+            document = await self.get_mms_entity(key, release, language, fallback=False)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return {"input": item, "kind": kind, "found": False}
+            raise
+        title = document.get('title')
+        return {
+            "input": item,
+            "kind": kind,
+            "found": True,
+            "id": document.get('@id'),
+            "code": document.get('code'),
+            "title": title.get('@value') if isinstance(title, dict) else title
+        }
+    
+    async def iter_many(self, items: Iterable[str], release: str = "2025-01", language: str = "en", concurrency: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Resolve many codes/IDs, yielding results as they complete
+        
+        Inputs are deduplicated (case-insensitively for codes); each yielded
+        result lists the `positions` of every input it answers. At most
+        `concurrency` lookups are in flight, so memory stays flat.
+        """
+        limit = max(1, concurrency or self.batch_concurrency)
+        positions: Dict[str, List[int]] = {}
+        originals: Dict[str, str] = {}
+        for position, item in enumerate(items):
+            key = item.strip().upper()
+            if key not in positions:
+                positions[key] = []
+                originals[key] = item
+            positions[key].append(position)
+        
+        async def resolve(key: str) -> Dict[str, Any]:
+            try:
+                result = await self.lookup(originals[key], release, language)
+            except Exception as e:
+                result = {"input": originals[key], "found": False, "error": type(e).__name__, "detail": str(e)}
+            result["positions"] = positions[key]
+            return result
+        
+        pending = set()
+        try:
+            for key in positions:
+                if len(pending) >= limit:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+                pending.add(asyncio.ensure_future(resolve(key)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            # Consumer went away (e.g. client disconnected mid-stream)
+            for task in pending:
+                task.cancel()
+    
+    async def get_many(self, items: List[str], release: str = "2025-01", language: str = "en", concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Resolve many codes/IDs; returns one result per input, in input order"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        async for result in self.iter_many(items, release, language, concurrency):
+            result_positions = result.pop("positions")
+            for position in result_positions:
+                results[position] = {**result, "input": items[position]}
+        return results
+    
+    def _get_code_index(self, release: str, language: str) -> CodeIndex:
+        """Return the code index for an ingested release, building it on first use"""
+        key = (release, language)
+        index = self._code_indexes.get(key)
+        if index is None:
+            index = CodeIndex.build(self.local_store.iter_entities(release, language))
+            self._code_indexes[key] = index
+        return index
+    
+    async def local_search(self, query: str, release: str = "2025-01", language: str = "en", limit: int = 20) -> Dict[Any, Any]:
+        """Ranked full-text search over the ingested release, without upstream calls"""
+        index = await self._get_search_index(release, language)
+        return self._local_result(index.search(query, limit))
+    
+    async def _get_search_index(self, release: str, language: str) -> SearchIndex:
+        """Return the search index for a release, building it on first use"""
+        key = (release, language)
+        index = self._search_indexes.get(key)
+        if index is not None:
+            return index
+        if not self._has_local_release(release, language):
+            raise LocalReleaseUnavailable(
+                f"Release {release}/{language} is not available locally; run `python -m app.ingest`"
+            )
+        async with self._index_lock:
+            index = self._search_indexes.get(key)
+            if index is None:
+                entities = list(self.local_store.iter_entities(release, language))
+                index = await asyncio.to_thread(SearchIndex.build, entities)
+                self._search_indexes[key] = index
+        return index
+    
+    async def suggest(self, query: str, release: str = "2025-01", language: str = "en", limit: int = 10, debounce: float = 0.0) -> List[Dict[str, Any]]:
+        """Typeahead completions from the local prefix index, or an upstream search if not ingested
+        
+        `debounce` seconds pass before an upstream search, so a caller that
+        supersedes the query (and cancels this call) costs no upstream quota.
+        """
+        if self._has_local_release(release, language):
+            index = await self._get_suggest_index(release, language)
+            return index.suggest(query, limit)
+        if debounce > 0:
+            await asyncio.sleep(debounce)
+        results = await self.search_mms(query, release, language, engine="remote")
+        return [
+            {
+                "id": entry.get('id'),
+                "title": strip_markup(entry.get('title') or ''),
+                "theCode": entry.get('theCode'),
+                "chapter": entry.get('chapter'),
+                "match": "search"
             }
-            
-            url = f"{self.base_url}/{endpoint}"
-            response = await self.client.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            
-            return response.json()
+            for entry in (results.get('destinationEntities') or [])[:limit]
+        ]
+    
+    async def _get_suggest_index(self, release: str, language: str) -> SuggestIndex:
+        """Return the typeahead index for an ingested release, building it on first use"""
+        key = (release, language)
+        index = self._suggest_indexes.get(key)
+        if index is not None:
+            return index
+        async with self._index_lock:
+            index = self._suggest_indexes.get(key)
+            if index is None:
+                entities = list(self.local_store.iter_entities(release, language))
+                index = await asyncio.to_thread(SuggestIndex.build, entities)
+                self._suggest_indexes[key] = index
+        return index
+    
+    async def get_ancestors(self, entity_id: str, release: str = "2025-01", language: str = "en") -> List[Dict[str, Any]]:
+        """All ancestors of an entity, nearest first (root excluded)"""
+        graph = await self._get_graph(release, language)
+        return [graph.describe(n) for n in graph.ancestors(graph.node(entity_id)) if graph.ids[n] != ROOT_ID]
+    
+    async def get_descendants(self, entity_id: str, release: str = "2025-01", language: str = "en", offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Every entity below an entity in pre-order, paged by offset/limit"""
+        graph = await self._get_graph(release, language)
+        descendants = graph.descendants(graph.node(entity_id))
+        page = descendants[offset:offset + limit if limit is not None else None]
+        return {"total": len(descendants), "descendants": [graph.describe(n) for n in page]}
+    
+    async def get_lca(self, entity_id: str, other_id: str, release: str = "2025-01", language: str = "en") -> List[Dict[str, Any]]:
+        """Lowest common ancestor(s) of two entities"""
+        graph = await self._get_graph(release, language)
+        return [graph.describe(n) for n in graph.lca(graph.node(entity_id), graph.node(other_id))]
+    
+    async def _get_graph(self, release: str, language: str) -> HierarchyGraph:
+        """Return the hierarchy graph for an ingested release, building it on first use"""
+        key = (release, language)
+        graph = self._graphs.get(key)
+        if graph is not None:
+            return graph
+        if not self._has_local_release(release, language):
+            raise LocalReleaseUnavailable(
+                f"Release {release}/{language} is not available locally; run `python -m app.ingest`"
+            )
+        async with self._index_lock:
+            graph = self._graphs.get(key)
+            if graph is None:
+                nodes = list(self.local_store.iter_graph_nodes(release, language))
+                graph = await asyncio.to_thread(HierarchyGraph.build, nodes)
+                self._graphs[key] = graph
+        return graph
+    
+    async def diff_releases(self, from_release: str, to_release: str, language: str = "en") -> Dict[str, Any]:
+        """Added/removed/recoded/renamed/moved/redefined entities between two ingested releases
+        
+        Both releases are immutable, so the diff is computed once and kept in
+        the response cache (shared with other workers) for good.
+        """
+        for release in (from_release, to_release):
+            if not self._has_local_release(release, language):
+                raise LocalReleaseUnavailable(
+                    f"Release {release}/{language} is not available locally; run `python -m app.ingest`"
+                )
+        key = make_key(f"release-diff/{from_release}/{to_release}", language)
+        cached = await self.cache.aget(key) if self.cache is not None else None
+        if cached is not None:
+            return cached
+        
+        async def compute() -> Dict[str, Any]:
+            diff = await asyncio.to_thread(diff_releases, self.local_store, from_release, to_release, language)
+            if self.cache is not None:
+                await self.cache.aset(key, diff, FOREVER)
+            return diff
+        
+        return await self.inflight.do(key, compute)
+    
+    def content_generation(self) -> Tuple[Optional[Tuple[int, int]], int]:
+        """Token that changes when content behind a release-pinned URL may have changed
+
+        That is when the local store is written (e.g. a re-ingest by another
+        process), or a cache revalidation brings new content. Indexes and
+        graphs built from the store are dropped when it changes.
+        """
+        store = self.local_store.generation() if self.local_store is not None else None
+        if store != self._store_generation:
+            if self._store_generation is not None:
+                self._search_indexes.clear()
+                self._code_indexes.clear()
+                self._graphs.clear()
+                self._suggest_indexes.clear()
+            self._store_generation = store
+        return store, self.pipeline["cache"].changed if self.cache is not None else 0
+    
+    def _has_local_release(self, release: str, language: str) -> bool:
+        """True when the release has been fully ingested into the local store"""
+        return self.local_store is not None and self.local_store.is_complete(release, language)
+    
+    @staticmethod
+    def _local_result(entities: List[Dict[str, Any]]) -> Dict[Any, Any]:
+        """Wrap local matches in the WHO search response shape"""
+        return {
+            "destinationEntities": entities,
+            "error": False,
+            "errorMessage": None,
+            "resultChopped": False,
+            "source": "local"
+        }
+    
+    def upstream_stats(self) -> Dict[str, Any]:
+        """Rate-limit budgets, queue depth, wait times and retry counts"""
+        return {
+            "budgets": {name: governor.stats() for name, governor in self.governors.items()},
+            "retries": self.retry.retries,
+            "token_fetches": self.tokens.fetch_count,
+            "prefetch": self.prefetcher.stats() if self.prefetcher is not None else None,
+            "language_fallback": self.language_fallback.stats(),
+            "pipeline": self.stage_timings.stats()
+        }
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters for the response cache and request coalescing"""
+        if self.cache is None:
+            return {"enabled": False, "coalescing": self.inflight.stats()}
+        return {
+            "enabled": True,
+            **self.cache.stats(),
+            "revalidation": self.pipeline["cache"].stats(),
+            "coalescing": self.inflight.stats()
+        }
     
-    async def get_mms_entity(self, entity_id: str, release: str = "2025-01", language: str = "en") -> Dict[Any, Any]:
-        """Get specific entity from MMS linearization"""
-        endpoint = f"release/11/{release}/mms/{language}/{entity_id}"
-        return await self._make_request(endpoint)
+    def entity_viewed(self, kind: str, entity_id: str, document: Dict[str, Any], release: str = "", language: str = "en") -> None:
+        """Record a user-facing entity view and prefetch its neighbours"""
+        if self.access_log is not None:
+            self.access_log.record(kind, entity_id, release, language)
+        if self.prefetcher is not None:
+            self.prefetcher.schedule_neighbours(kind, document, release, language)
     
     async def close(self):
         """Close the HTTP client"""
-        await self.client.aclose()
\ No newline at end of file
+        if self.prefetcher is not None:
+            await self.prefetcher.close()
+        if self.access_log is not None:
+            self.access_log.close()
+        await self.tokens.close()
+        await self.client.aclose()
+        if self.cache is not None:
+            self.cache.close()
+        if self.local_store is not None:
+            self.local_store.close()
\ No newline at end of file
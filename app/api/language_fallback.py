@@ -0,0 +1,207 @@
+"""
+Hedged multilingual fallback
+A request in a language with a fallback chain (e.g. nb -> no -> en) is sent
+in the preferred language first; the next language of the chain is started
+when the ones before it have failed, or have not answered within the hedge
+delay. The first successful answer in preference order wins. Languages that
+fail while a fallback succeeds are remembered per (release, endpoint), so
+later requests go straight to the language that works.
+
+Routes that must label what they serve wrap their work in
+`record_languages()`, which collects every language that answered inside it.
+"""
+
+import asyncio
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import httpx
+
+from .cache import LRUCache
+
+# Endpoint path segment replaced by each attempted language (MMS entity URLs carry the language)
+LANGUAGE_SEGMENT = "{language}"
+
+DEFAULT_FALLBACKS = "nb:no,nn:no,no:en"
+
+Scope = Tuple[str, str]
+
+# Languages that served content in the current context (see `record_languages`)
+_served: ContextVar[Optional[Set[str]]] = ContextVar("languages_served", default=None)
+
+
+@contextmanager
+def record_languages() -> Iterator[Set[str]]:
+    """Collect the languages that serve content inside the block, including tasks it starts"""
+    served: Set[str] = set()
+    token = _served.set(served)
+    try:
+        yield served
+    finally:
+        _served.reset(token)
+
+
+def served_language(requested: str, served: Set[str]) -> str:
+    """`Content-Language` value: the served languages, or `requested` when nothing came from upstream"""
+    return ", ".join(sorted(served)) if served else requested
+
+
+def _note_served(language: str) -> None:
+    served = _served.get()
+    if served is not None:
+        served.add(language)
+
+
+def parse_fallbacks(spec: str) -> Dict[str, str]:
+    """`"nb:no,no:en"` -> {"nb": "no", "no": "en"}"""
+    fallbacks = {}
+    for pair in spec.split(","):
+        language, _, fallback = pair.partition(":")
+        if language.strip() and fallback.strip():
+            fallbacks[language.strip()] = fallback.strip()
+    return fallbacks
+
+
+def endpoint_scope(endpoint: str) -> Scope:
+    """(release, endpoint kind) that language availability is tracked for
+
+    `release/11/2025-01/mms/{language}/123` -> ("2025-01", "mms"),
+    `entity/search` -> ("foundation", "entity/search").
+    """
+    parts = endpoint.split("/")
+    release = "foundation"
+    if parts[0] == "release" and len(parts) > 2:
+        release, parts = parts[2], parts[3:]
+    kind = [part for part in parts if part != LANGUAGE_SEGMENT and not part.isdigit()]
+    return release, "/".join(kind[:2])
+
+
+def is_unavailable(error: BaseException) -> bool:
+    """Client errors mean there is no content in that language; 5xx and network errors do not"""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return 400 <= status < 500 and status not in (401, 408, 429)
+    return False
+
+
+class LanguageFallback:
+    """Fallback chains, hedged requests and a negative cache of unavailable languages"""
+
+    def __init__(self, fallbacks: Optional[Dict[str, str]] = None, unavailable_ttl: float = 86400, max_entries: int = 1024, hedge_delay: float = 0.3):
+        self.fallbacks = parse_fallbacks(DEFAULT_FALLBACKS) if fallbacks is None else fallbacks
+        self.unavailable_ttl = unavailable_ttl
+        # Seconds to wait for a language before also starting the next one
+        self.hedge_delay = hedge_delay
+        self._unavailable = LRUCache(max_entries=max_entries)
+
+        self.hedged = 0
+        self.served_by_fallback = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_env(cls) -> "LanguageFallback":
+        return cls(
+            parse_fallbacks(os.getenv("ICD11_LANGUAGE_FALLBACKS", DEFAULT_FALLBACKS)),
+            unavailable_ttl=float(os.getenv("ICD11_LANGUAGE_UNAVAILABLE_TTL", "86400")),
+            hedge_delay=float(os.getenv("ICD11_LANGUAGE_HEDGE_DELAY", "0.3")),
+        )
+
+    def chain(self, language: str) -> List[str]:
+        """`language` followed by its fallbacks, most preferred first"""
+        chain = [language]
+        while chain[-1] in self.fallbacks and self.fallbacks[chain[-1]] not in chain:
+            chain.append(self.fallbacks[chain[-1]])
+        return chain
+
+    @staticmethod
+    def _key(scope: Scope, language: str) -> str:
+        return f"{scope[0]}|{scope[1]}|{language}"
+
+    def candidates(self, scope: Scope, language: str) -> List[str]:
+        """The chain minus languages known to be unavailable; the last resort is always kept"""
+        chain = self.chain(language)
+        available = [lang for lang in chain[:-1] if self._unavailable.get(self._key(scope, lang)) is None]
+        self.skipped += len(chain) - 1 - len(available)
+        return available + chain[-1:]
+
+    def mark_unavailable(self, scope: Scope, language: str) -> None:
+        self._unavailable.set(self._key(scope, language), True, ttl=self.unavailable_ttl)
+
+    async def run(self, scope: Scope, language: str, call: Callable[[str], Awaitable[Any]]) -> Tuple[Any, str]:
+        """Call in the candidate languages in preference order; return (result, language used)
+
+        The next candidate starts once every started one has failed, or when
+        none has answered within `hedge_delay` seconds. Results are taken in
+        preference order, so a fallback answer is only used once every more
+        preferred language has failed. If all fail, the last resort's error is
+        raised.
+        """
+        candidates = self.candidates(scope, language)
+        if len(candidates) == 1:
+            result = await call(candidates[0])
+            _note_served(candidates[0])
+            return result, candidates[0]
+
+        loop = asyncio.get_running_loop()
+        tasks: List[asyncio.Future] = []
+        hedged = False
+
+        def launch() -> float:
+            tasks.append(asyncio.ensure_future(call(candidates[len(tasks)])))
+            return loop.time()
+
+        launched_at = launch()
+        try:
+            while True:
+                for lang, task in zip(candidates, tasks):
+                    if not task.done():
+                        break
+                    if task.exception() is None:
+                        return self._won(scope, language, lang, candidates, tasks), lang
+                else:
+                    # Every language started so far has failed
+                    if len(tasks) == len(candidates):
+                        raise tasks[-1].exception()
+                    launched_at = launch()
+                    continue
+
+                pending = [task for task in tasks if not task.done()]
+                if len(tasks) == len(candidates):
+                    await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                timeout = max(0.0, launched_at + self.hedge_delay - loop.time())
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if not hedged:
+                        hedged = True
+                        self.hedged += 1
+                    launched_at = launch()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # Retrieve unawaited outcomes so they are not reported as lost
+                    task.exception()
+
+    def _won(self, scope: Scope, language: str, lang: str, candidates: List[str], tasks: List[asyncio.Future]) -> Any:
+        # Only remember a language as missing when a fallback proved the resource exists
+        for earlier, task in zip(candidates, tasks):
+            if earlier == lang:
+                break
+            if is_unavailable(task.exception()):
+                self.mark_unavailable(scope, earlier)
+        if lang != language:
+            self.served_by_fallback += 1
+        _note_served(lang)
+        return tasks[candidates.index(lang)].result()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hedged": self.hedged,
+            "served_by_fallback": self.served_by_fallback,
+            "skipped_unavailable": self.skipped,
+            "unavailable": len(self._unavailable),
+        }
@@ -0,0 +1,309 @@
+"""
+Offline local MMS store
+SQLite-backed copy of an ICD-11 MMS linearization, populated by `python -m app.ingest`
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Stored id of the linearization root (`release/11/{release}/mms/{language}`)
+ROOT_ID = "root"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    release TEXT NOT NULL,
+    language TEXT NOT NULL,
+    id TEXT NOT NULL,
+    code TEXT,
+    title TEXT,
+    class_kind TEXT,
+    chapter TEXT,
+    depth INTEGER NOT NULL DEFAULT 0,
+    parents TEXT NOT NULL DEFAULT '[]',
+    children TEXT NOT NULL DEFAULT '[]',
+    synonyms TEXT NOT NULL DEFAULT '[]',
+    definition TEXT,
+    document TEXT,
+    fetched INTEGER NOT NULL DEFAULT 0,
+    hash TEXT,
+    PRIMARY KEY (release, language, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_entities_code ON entities (release, language, code);
+CREATE INDEX IF NOT EXISTS idx_entities_pending ON entities (release, language, fetched);
+CREATE TABLE IF NOT EXISTS releases (
+    release TEXT NOT NULL,
+    language TEXT NOT NULL,
+    complete INTEGER NOT NULL DEFAULT 0,
+    entity_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (release, language)
+);
+"""
+
+
+class LocalReleaseUnavailable(LookupError):
+    """Raised when a local lookup is requested for a release that is not ingested"""
+
+
+def mms_entity_id(uri: str) -> str:
+    """Extract the linearization-relative id from an MMS URI
+
+    Residual categories carry a suffix (e.g. `.../mms/1234567/other`), so the
+    id is everything after `/mms/` rather than the last path segment.
+    """
+    marker = "/mms/"
+    if marker in uri:
+        return uri.split(marker, 1)[1]
+    return uri.rstrip("/").split("/")[-1]
+
+
+def content_hash(code: Optional[str], title: Optional[str], parents: List[str], definition: Optional[str]) -> str:
+    """Hash of the fields a release diff compares (parent order does not matter)"""
+    fields = json.dumps([code, title, sorted(parents), definition], separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(fields.encode(), digest_size=12).hexdigest()
+
+
+def _label(value: Any) -> Optional[str]:
+    """Unwrap a JSON-LD `{"@language", "@value"}` label"""
+    if isinstance(value, dict):
+        return value.get("@value")
+    return value
+
+
+def _synonyms(document: Dict[str, Any]) -> List[str]:
+    labels = []
+    for term in document.get("synonym", []) or []:
+        label = _label(term.get("label")) if isinstance(term, dict) else _label(term)
+        if label:
+            labels.append(label)
+    return labels
+
+
+class LocalStore:
+    """Compact on-disk store of MMS entities keyed by (release, language, id)
+
+    Reads go through a memory map, so worker processes serving the same store
+    share one copy of its pages in the OS page cache. A release becomes
+    visible to lookups only when `mark_complete` commits, in one transaction.
+    """
+
+    def __init__(self, path: str, mmap_size: Optional[int] = None):
+        self.path = path
+        if mmap_size is None:
+            mmap_size = int(os.getenv("ICD11_LOCAL_STORE_MMAP_MB", "256")) * 1024 * 1024
+        self.mmap_size = mmap_size
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["LocalStore"]:
+        """Open the store at ICD11_LOCAL_STORE if it has been ingested"""
+        path = os.getenv("ICD11_LOCAL_STORE", ".cache/icd11/mms.sqlite")
+        if not path or not os.path.exists(path):
+            return None
+        return cls(path)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(entities)")}
+            if "hash" not in columns:
+                # Stores ingested before content hashes were kept
+                conn.execute("ALTER TABLE entities ADD COLUMN hash TEXT")
+                rows = conn.execute(
+                    "SELECT release, language, id, code, title, parents, definition FROM entities WHERE fetched = 1"
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE entities SET hash = ? WHERE release = ? AND language = ? AND id = ?",
+                    [(content_hash(code, title, json.loads(parents), definition), release, language, entity_id)
+                     for release, language, entity_id, code, title, parents, definition in rows],
+                )
+            self._conn = conn
+        return self._conn
+
+    def _query(self, sql: str, args: Iterable[Any] = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._connect().execute(sql, tuple(args)).fetchall()
+
+    # Ingest-side API
+
+    def add_pending(self, release: str, language: str, entity_id: str, depth: int = 0, chapter: Optional[str] = None) -> None:
+        """Record an entity that still has to be fetched (no-op if already known)"""
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR IGNORE INTO entities (release, language, id, depth, chapter) VALUES (?, ?, ?, ?, ?)",
+                (release, language, entity_id, depth, chapter),
+            )
+
+    def pending(self, release: str, language: str) -> List[Dict[str, Any]]:
+        """Entities discovered but not yet fetched"""
+        rows = self._query(
+            "SELECT id, depth, chapter FROM entities WHERE release = ? AND language = ? AND fetched = 0",
+            (release, language),
+        )
+        return [{"id": r[0], "depth": r[1], "chapter": r[2]} for r in rows]
+
+    def is_fetched(self, release: str, language: str, entity_id: str) -> bool:
+        rows = self._query(
+            "SELECT fetched FROM entities WHERE release = ? AND language = ? AND id = ?",
+            (release, language, entity_id),
+        )
+        return bool(rows and rows[0][0])
+
+    def put_entity(self, release: str, language: str, entity_id: str, document: Dict[str, Any], depth: int, chapter: Optional[str]) -> List[str]:
+        """Store a fetched entity and queue its children; returns newly discovered child ids"""
+        code = document.get("code") or document.get("codeRange") or None
+        title = _label(document.get("title"))
+        synonyms = _synonyms(document)
+        parents = [mms_entity_id(uri) for uri in document.get("parent", []) or []]
+        children = [mms_entity_id(uri) for uri in document.get("child", []) or []]
+        definition = _label(document.get("definition"))
+        # Chapters are the direct children of the root; descendants inherit
+        if depth == 1:
+            chapter = code
+
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entities (release, language, id, code, title, class_kind, chapter, depth, "
+                    "parents, children, synonyms, definition, document, fetched, hash) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)",
+                    (
+                        release, language, entity_id, code, title, document.get("classKind"), chapter, depth,
+                        json.dumps(parents), json.dumps(children), json.dumps(synonyms, ensure_ascii=False),
+                        definition,
+                        json.dumps(document, separators=(",", ":"), ensure_ascii=False),
+                        content_hash(code, title, parents, definition),
+                    ),
+                )
+                discovered = []
+                for child in children:
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO entities (release, language, id, depth, chapter) VALUES (?, ?, ?, ?, ?)",
+                        (release, language, child, depth + 1, chapter),
+                    )
+                    if cursor.rowcount:
+                        discovered.append(child)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return discovered
+
+    def mark_complete(self, release: str, language: str) -> int:
+        """Flag a release as fully ingested; returns the entity count"""
+        count = self._query(
+            "SELECT COUNT(*) FROM entities WHERE release = ? AND language = ? AND fetched = 1",
+            (release, language),
+        )[0][0]
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO releases (release, language, complete, entity_count) VALUES (?, ?, 1, ?)",
+                (release, language, count),
+            )
+        return count
+
+    # Lookup-side API
+
+    def generation(self) -> Tuple[int, int]:
+        """Token that changes whenever the store is written, by this or any other process"""
+        with self._lock:
+            conn = self._connect()
+            # data_version moves on commits by other connections, total_changes on our own
+            return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+    def is_complete(self, release: str, language: str) -> bool:
+        rows = self._query(
+            "SELECT complete FROM releases WHERE release = ? AND language = ?", (release, language)
+        )
+        return bool(rows and rows[0][0])
+
+    def get_document(self, release: str, language: str, entity_id: str) -> Optional[Dict[str, Any]]:
+        """Raw MMS document as returned by the WHO API, or None"""
+        rows = self._query(
+            "SELECT document FROM entities WHERE release = ? AND language = ? AND id = ? AND fetched = 1",
+            (release, language, entity_id),
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def iter_entities(self, release: str, language: str) -> Iterable[Dict[str, Any]]:
+        """All fetched entities (except the root) with their searchable fields"""
+        rows = self._query(
+            "SELECT id, code, title, chapter, synonyms FROM entities "
+            "WHERE release = ? AND language = ? AND fetched = 1 AND id != ?",
+            (release, language, ROOT_ID),
+        )
+        for entity_id, code, title, chapter, synonyms in rows:
+            yield {
+                "id": f"http://id.who.int/icd/release/11/{release}/mms/{entity_id}",
+                "code": code,
+                "title": title,
+                "chapter": chapter,
+                "synonyms": json.loads(synonyms),
+            }
+
+    def iter_graph_nodes(self, release: str, language: str) -> Iterable[Tuple[str, Optional[str], Optional[str], List[str]]]:
+        """(id, code, title, child ids) for every fetched entity, root included"""
+        rows = self._query(
+            "SELECT id, code, title, children FROM entities WHERE release = ? AND language = ? AND fetched = 1",
+            (release, language),
+        )
+        for entity_id, code, title, children in rows:
+            yield entity_id, code, title, json.loads(children)
+
+    def release_delta(self, release: str, other: str, language: str) -> Dict[str, Any]:
+        """Entities that differ between two releases, compared by content hash
+
+        Only changed, added and removed rows are read in full; unchanged
+        entities are only counted.
+        """
+        fields = "id, code, title, parents, definition"
+
+        def entity(row: Tuple) -> Dict[str, Any]:
+            return {"id": row[0], "code": row[1], "title": row[2], "parents": json.loads(row[3]), "definition": row[4]}
+
+        def only_in(mine: str, theirs: str) -> List[Dict[str, Any]]:
+            rows = self._query(
+                f"SELECT {fields} FROM entities e WHERE release = ? AND language = ? AND fetched = 1 AND id != ? "
+                "AND NOT EXISTS (SELECT 1 FROM entities o WHERE o.release = ? AND o.language = e.language "
+                "AND o.id = e.id AND o.fetched = 1)",
+                (mine, language, ROOT_ID, theirs),
+            )
+            return [entity(row) for row in rows]
+
+        pairs = self._query(
+            "SELECT a.id, a.code, a.title, a.parents, a.definition, b.id, b.code, b.title, b.parents, b.definition "
+            "FROM entities a JOIN entities b ON b.release = ? AND b.language = a.language AND b.id = a.id "
+            "WHERE a.release = ? AND a.language = ? AND a.fetched = 1 AND b.fetched = 1 AND a.id != ? "
+            "AND a.hash IS NOT b.hash",
+            (other, release, language, ROOT_ID),
+        )
+        unchanged = self._query(
+            "SELECT COUNT(*) FROM entities a JOIN entities b ON b.release = ? AND b.language = a.language AND b.id = a.id "
+            "WHERE a.release = ? AND a.language = ? AND a.fetched = 1 AND b.fetched = 1 AND a.id != ? AND a.hash IS b.hash",
+            (other, release, language, ROOT_ID),
+        )[0][0]
+        return {
+            "changed": [(entity(row[:5]), entity(row[5:])) for row in pairs],
+            "added": only_in(other, release),
+            "removed": only_in(release, other),
+            "unchanged": unchanged,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
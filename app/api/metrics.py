@@ -0,0 +1,218 @@
+"""
+Prometheus-style metrics
+Counters, gauges and histograms rendered in the Prometheus text exposition
+format without a client library, the upstream pipeline hook that feeds them,
+and the request-scoped phase timings behind the `Server-Timing` header.
+"""
+
+import asyncio
+import contextvars
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from .language_fallback import LANGUAGE_SEGMENT, endpoint_scope
+from .ratelimit import UpstreamOverloaded
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Pipeline stage -> Server-Timing phase
+STAGE_PHASES = {
+    "cache": "cache",
+    "coalesce": "cache",
+    "decode": "upstream",
+    "auth": "auth",
+    "retry": "upstream",
+    "ratelimit": "queue",
+    "transport": "upstream",
+}
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Metric:
+    """A named metric family with fixed label names"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing value per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def set(self, *labels: str, value: float) -> None:
+        """Mirror a count kept elsewhere (read at scrape time)"""
+        self.values[labels] = value
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_labels(self.labels, labels)} {_format(value)}" for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    """Point-in-time value per label set"""
+
+    kind = "gauge"
+
+
+class Histogram(Metric):
+    """Bucketed observations per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (non-cumulative, last is +Inf), sum]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series is not None else 0
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        names = self.labels + ("le",)
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (_format(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {_format(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+def render(metrics: Sequence[Metric]) -> str:
+    """Prometheus text exposition (format 0.0.4)"""
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Phase -> seconds for the HTTP request being served (set by the metrics middleware)
+_phases: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("server_timing_phases", default=None)
+
+
+def start_phases() -> Tuple[Dict[str, float], contextvars.Token]:
+    phases: Dict[str, float] = {}
+    return phases, _phases.set(phases)
+
+
+def end_phases(token: contextvars.Token) -> None:
+    _phases.reset(token)
+
+
+def record_phase(name: str, seconds: float) -> None:
+    """Add time to a phase of the current HTTP request (no-op outside one)"""
+    phases = _phases.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+def server_timing(phases: Dict[str, float], total: float) -> str:
+    """`Server-Timing` value; upstream phases are summed over concurrent fetches"""
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in phases.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+def upstream_outcome(request) -> str:
+    """Classify a finished pipeline request: ok, cache, coalesced, not_modified or an error class"""
+    error = request.error
+    if error is None:
+        if request.not_modified:
+            return "not_modified"
+        if request.attempts:
+            return "ok"
+        return "coalesced" if "coalesce" in request.timings else "cache"
+    if isinstance(error, asyncio.CancelledError):
+        return "cancelled"
+    if isinstance(error, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"{error.response.status_code // 100}xx"
+    if isinstance(error, httpx.TransportError):
+        return "connection"
+    if isinstance(error, UpstreamOverloaded):
+        return "overloaded"
+    return "error"
+
+
+class UpstreamMetrics:
+    """Pipeline hook: per-endpoint latency and outcomes, and Server-Timing phases"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.latency = Histogram(
+            "icd11_upstream_request_duration_seconds",
+            "Time on the wire to the WHO API per endpoint (all attempts of a request)",
+            ["endpoint"],
+        )
+        self.outcomes = Counter(
+            "icd11_upstream_requests_total",
+            "Upstream pipeline requests by endpoint and outcome",
+            ["endpoint", "outcome"],
+        )
+
+    def endpoint(self, url: str, language: str) -> str:
+        """`.../release/11/2025-01/mms/en/123` -> "mms" (ids, releases and languages dropped)"""
+        path = url[len(self.base_url):] if url.startswith(self.base_url) else url
+        path = "/".join(LANGUAGE_SEGMENT if part == language else part for part in path.split("/"))
+        return endpoint_scope(path)[1] or "other"
+
+    def __call__(self, request) -> None:
+        endpoint = self.endpoint(request.url, request.language)
+        self.outcomes.inc(endpoint, upstream_outcome(request))
+        if request.attempts:
+            self.latency.observe(request.timings.get("transport", 0.0), endpoint)
+        for stage, seconds in request.timings.items():
+            record_phase(STAGE_PHASES.get(stage, stage), seconds)
+
+    def metrics(self) -> List[Metric]:
+        return [self.latency, self.outcomes]
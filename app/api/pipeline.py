@@ -0,0 +1,278 @@
+"""
+Upstream request pipeline for the ICD-11 client
+Every API call flows through one chain of middleware-style stages:
+
+    cache -> coalesce -> decode -> auth -> retry -> rate limit -> transport
+
+Each stage is an async callable `(request, call_next)`; stages can be
+inserted or replaced by name, and per-stage (exclusive) timings are recorded
+on the request and passed to registered hooks.
+"""
+
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from .cache import TieredCache, Validators, make_key, ttl_for
+from .ratelimit import Governor, budget_for
+from .singleflight import SingleFlight
+from .token_manager import TokenManager
+from .transport import RetryPolicy
+
+API_VERSION = "v2"
+
+
+class UpstreamRequest:
+    """One logical upstream GET travelling through the pipeline"""
+
+    __slots__ = (
+        "url", "language", "params", "use_cache", "key", "budget", "headers", "timings", "attempts",
+        "stale", "validators", "not_modified", "error",
+    )
+
+    def __init__(self, url: str, language: str = "en", params: Optional[Dict[str, str]] = None, use_cache: bool = True):
+        self.url = url
+        self.language = language
+        self.params = params
+        self.use_cache = use_cache
+        self.key = make_key(url, language, params)
+        self.budget = budget_for(url)
+        self.headers: Dict[str, str] = {}
+        # Exclusive seconds spent in each stage
+        self.timings: Dict[str, float] = {}
+        self.attempts = 0
+        # Expired cached payload being revalidated, and the validators sent/received
+        self.stale: Any = None
+        self.validators: Optional[Validators] = None
+        self.not_modified = False
+        # Exception the pipeline raised, for hooks
+        self.error: Optional[BaseException] = None
+
+
+Next = Callable[[UpstreamRequest], Awaitable[Any]]
+Stage = Callable[[UpstreamRequest, Next], Awaitable[Any]]
+Hook = Callable[[UpstreamRequest], None]
+
+
+class Pipeline:
+    """Ordered, named stage chain with per-stage timing"""
+
+    def __init__(self, stages: List[tuple]):
+        self._stages: List[tuple] = list(stages)
+        self._hooks: List[Hook] = []
+
+    @property
+    def names(self) -> List[str]:
+        return [name for name, _ in self._stages]
+
+    def insert(self, name: str, stage: Stage, before: Optional[str] = None) -> None:
+        """Insert a stage before the named one (or at the end)"""
+        position = self.names.index(before) if before else len(self._stages)
+        self._stages.insert(position, (name, stage))
+
+    def replace(self, name: str, stage: Stage) -> None:
+        self._stages[self.names.index(name)] = (name, stage)
+
+    def remove(self, name: str) -> None:
+        del self._stages[self.names.index(name)]
+
+    def __getitem__(self, name: str) -> Stage:
+        return self._stages[self.names.index(name)][1]
+
+    def add_hook(self, hook: Hook) -> None:
+        """Register a callback invoked with each completed request"""
+        self._hooks.append(hook)
+
+    async def __call__(self, request: UpstreamRequest) -> Any:
+        try:
+            return await self._run(0, request)
+        except BaseException as e:
+            request.error = e
+            raise
+        finally:
+            for hook in self._hooks:
+                hook(request)
+
+    async def _run(self, index: int, request: UpstreamRequest) -> Any:
+        name, stage = self._stages[index]
+        downstream = 0.0
+
+        async def call_next(req: UpstreamRequest) -> Any:
+            nonlocal downstream
+            started = time.perf_counter()
+            try:
+                return await self._run(index + 1, req)
+            finally:
+                downstream += time.perf_counter() - started
+
+        started = time.perf_counter()
+        try:
+            return await stage(request, call_next)
+        finally:
+            elapsed = time.perf_counter() - started - downstream
+            request.timings[name] = request.timings.get(name, 0.0) + elapsed
+
+
+class StageTimings:
+    """Timing hook accumulating exclusive seconds per stage"""
+
+    def __init__(self):
+        self.requests = 0
+        self.seconds: Dict[str, float] = {}
+
+    def __call__(self, request: UpstreamRequest) -> None:
+        self.requests += 1
+        for name, elapsed in request.timings.items():
+            self.seconds[name] = self.seconds.get(name, 0.0) + elapsed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "avg_ms": {
+                name: round(total * 1000 / self.requests, 4) for name, total in self.seconds.items()
+            } if self.requests else {}
+        }
+
+
+def response_validators(response: httpx.Response) -> Optional[Validators]:
+    """ETag/Last-Modified of an upstream response, if it sent any"""
+    validators = {}
+    if response.headers.get("ETag"):
+        validators["etag"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        validators["last_modified"] = response.headers["Last-Modified"]
+    return validators or None
+
+
+def conditional_headers(validators: Optional[Validators]) -> Dict[str, str]:
+    """If-None-Match/If-Modified-Since headers revalidating a stale entry"""
+    headers = {}
+    if validators:
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last_modified" in validators:
+            headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+class CacheStage:
+    """Serve from the tiered cache; revalidate stale entries; store payloads on miss"""
+
+    def __init__(self, cache: Optional[TieredCache]):
+        self.cache = cache
+        self.revalidations = 0
+        self.not_modified = 0
+        # Revalidations that brought new content
+        self.changed = 0
+
+    async def __call__(self, request: UpstreamRequest, call_next: Next) -> Any:
+        if self.cache is None or not request.use_cache:
+            return await call_next(request)
+        cached = await self.cache.aget(request.key)
+        if cached is not None:
+            return cached
+        stale = await self.cache.aget_stale(request.key)
+        if stale is not None:
+            request.stale, request.validators = stale
+        data = await call_next(request)
+        # Coalesced followers share the leader's payload; only the request that went upstream stores it
+        if request.attempts:
+            if request.stale is not None:
+                self.revalidations += 1
+                self.not_modified += request.not_modified
+                self.changed += not request.not_modified
+            await self.cache.aset(request.key, data, ttl_for(request.url), request.validators)
+        return data
+
+    def stats(self) -> Dict[str, int]:
+        return {"revalidations": self.revalidations, "not_modified": self.not_modified}
+
+
+class CoalesceStage:
+    """Share one upstream execution between concurrent identical requests"""
+
+    def __init__(self, inflight: SingleFlight):
+        self.inflight = inflight
+
+    async def __call__(self, request: UpstreamRequest, call_next: Next) -> Any:
+        return await self.inflight.do(request.key, lambda: call_next(request))
+
+
+class DecodeStage:
+    """Raise for HTTP errors and decode the JSON body (or reuse a revalidated one)"""
+
+    async def __call__(self, request: UpstreamRequest, call_next: Next) -> Any:
+        response: httpx.Response = await call_next(request)
+        if response.status_code == 304 and request.stale is not None:
+            request.not_modified = True
+            request.validators = {**request.validators, **(response_validators(response) or {})}
+            return request.stale
+        response.raise_for_status()
+        request.validators = response_validators(response)
+        return response.json()
+
+
+class AuthStage:
+    """Attach the bearer token; refresh once and retry on 401"""
+
+    def __init__(self, tokens: TokenManager):
+        self.tokens = tokens
+        self._base_headers: Dict[str, Dict[str, str]] = {}
+
+    def headers(self, request: UpstreamRequest, token: str) -> Dict[str, str]:
+        headers = {**self.base_headers(request.language), "Authorization": f"Bearer {token}"}
+        if request.stale is not None:
+            headers.update(conditional_headers(request.validators))
+        return headers
+
+    def base_headers(self, language: str) -> Dict[str, str]:
+        """Static per-language headers, built once"""
+        headers = self._base_headers.get(language)
+        if headers is None:
+            headers = {"Accept": "application/json", "API-Version": API_VERSION, "Accept-Language": language}
+            self._base_headers[language] = headers
+        return headers
+
+    async def __call__(self, request: UpstreamRequest, call_next: Next) -> Any:
+        token = await self.tokens.get_token()
+        request.headers = self.headers(request, token)
+        response: httpx.Response = await call_next(request)
+        if response.status_code == 401:
+            # Token was revoked or expired early; refresh (single-flight) and retry once
+            token = await self.tokens.refresh(stale_token=token)
+            request.headers = self.headers(request, token)
+            response = await call_next(request)
+        return response
+
+
+class RetryStage:
+    """Retry transient upstream failures with jittered backoff"""
+
+    def __init__(self, policy: RetryPolicy):
+        self.policy = policy
+
+    async def __call__(self, request: UpstreamRequest, call_next: Next) -> Any:
+        return await self.policy.run(lambda: call_next(request))
+
+
+class RateLimitStage:
+    """Charge each attempt to its endpoint budget"""
+
+    def __init__(self, governors: Dict[str, Governor]):
+        self.governors = governors
+
+    async def __call__(self, request: UpstreamRequest, call_next: Next) -> Any:
+        async with self.governors[request.budget].slot():
+            return await call_next(request)
+
+
+class TransportStage:
+    """Terminal stage: send the GET over the pooled HTTP client"""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    async def __call__(self, request: UpstreamRequest, call_next: Next) -> Any:
+        request.attempts += 1
+        return await self.client.get(request.url, headers=request.headers, params=request.params)
@@ -0,0 +1,59 @@
+"""
+Field projection for API responses
+Trims every entity in a response to a requested set of fields before it is
+serialized, so clients that only need e.g. `id,theCode,title` are not sent
+full WHO documents.
+"""
+
+from typing import Any, FrozenSet, Optional
+
+# Search results and entity documents name the same things differently
+FIELD_ALIASES = {
+    "id": "@id",
+    "@id": "id",
+    "theCode": "code",
+    "code": "theCode",
+}
+
+
+def parse_fields(fields: Optional[str]) -> Optional[FrozenSet[str]]:
+    """Parse a comma-separated `fields=` value; None or empty means no projection"""
+    if not fields:
+        return None
+    names = frozenset(name.strip() for name in fields.split(",") if name.strip())
+    return names or None
+
+
+def is_entity(value: Any) -> bool:
+    """True for WHO entity documents and search result entries"""
+    return isinstance(value, dict) and ("@id" in value or ("id" in value and "title" in value))
+
+
+def project_entity(entity: dict, fields: FrozenSet[str]) -> dict:
+    """Keep only the requested fields (or their aliases) of one entity"""
+    projected = {}
+    for name in fields:
+        if name in entity:
+            projected[name] = entity[name]
+        else:
+            alias = FIELD_ALIASES.get(name)
+            if alias in entity:
+                projected[alias] = entity[alias]
+    return projected
+
+
+def project(payload: Any, fields: Optional[FrozenSet[str]]) -> Any:
+    """Return `payload` with every entity trimmed to `fields`
+
+    Wrapper dicts and lists are rebuilt rather than mutated, since they may
+    be shared with the response cache.
+    """
+    if not fields:
+        return payload
+    if is_entity(payload):
+        return project_entity(payload, fields)
+    if isinstance(payload, dict):
+        return {key: project(value, fields) for key, value in payload.items()}
+    if isinstance(payload, list):
+        return [project(item, fields) for item in payload]
+    return payload
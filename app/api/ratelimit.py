@@ -0,0 +1,126 @@
+"""
+Upstream rate limiting and concurrency governance
+Token-bucket rate limit plus a max-in-flight semaphore per endpoint budget,
+with a bounded wait queue that sheds load when full
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+
+class UpstreamOverloaded(RuntimeError):
+    """Raised when a budget's wait queue is full and the request is shed"""
+
+    def __init__(self, budget: str, retry_after: float = 1.0):
+        super().__init__(f"Upstream budget '{budget}' is saturated; retry later")
+        self.budget = budget
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Async token bucket; waiters are served in FIFO order"""
+
+    def __init__(self, rate: float, burst: float):
+        # rate <= 0 disables rate limiting
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+
+class Governor:
+    """Rate limit, in-flight cap and bounded queue for one upstream budget"""
+
+    def __init__(self, name: str, rate: float, burst: float, max_in_flight: int, max_queue: int):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+        self.waiting = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.max_waiting = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    @classmethod
+    def from_env(cls, name: str, default_rate: float) -> "Governor":
+        prefix = f"ICD11_{name.upper()}"
+        rate = float(os.getenv(f"{prefix}_RATE", str(default_rate)))
+        return cls(
+            name,
+            rate=rate,
+            burst=float(os.getenv(f"{prefix}_BURST", str(max(1.0, rate)))),
+            max_in_flight=int(os.getenv(f"{prefix}_MAX_IN_FLIGHT", "16")),
+            max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", "256")),
+        )
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Wait for an in-flight slot and a rate token, or shed if the queue is full"""
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise UpstreamOverloaded(self.name, retry_after=max(1.0, self.waiting / max(self.bucket.rate, 1.0)))
+
+        started = time.monotonic()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self._semaphore.acquire()
+            try:
+                await self.bucket.acquire()
+            except BaseException:
+                self._semaphore.release()
+                raise
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.bucket.rate,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_seconds_avg": round(self.wait_seconds_total / self.admitted, 6) if self.admitted else 0.0,
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
+
+
+def budget_for(url: str) -> str:
+    """Upstream budget an API URL is charged to"""
+    return "search" if "/search" in url else "entity"
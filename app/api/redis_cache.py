@@ -0,0 +1,212 @@
+"""
+Shared response cache on a Redis-protocol server
+Lets every worker process on a host (or a fleet) share one cache tier: an
+entry fetched by one worker is a hit for all of them. Speaks RESP directly
+over a socket, so it works against Redis, Valkey, KeyDB or a local stand-in
+without a client library. The calls block, so TieredCache runs them off
+the event loop.
+"""
+
+import json
+import logging
+import socket
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from .cache import FOREVER, CacheStats, Validators
+
+logger = logging.getLogger(__name__)
+
+
+class RedisError(Exception):
+    """Error reply from the server"""
+
+
+def encode_command(*args: Any) -> bytes:
+    """RESP array of bulk strings"""
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+def read_reply(reader) -> Any:
+    """Read one RESP reply from a buffered binary stream"""
+    line = reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Connection closed by the cache server")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        raise RedisError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        if len(data) != length + 2:
+            raise ConnectionError("Connection closed by the cache server")
+        return data[:-2]
+    if kind == b"*":
+        count = int(body)
+        return None if count < 0 else [read_reply(reader) for _ in range(count)]
+    raise RedisError(f"Unexpected reply type {kind!r}")
+
+
+class RedisCache:
+    """Shared cache tier with the DiskCache interface
+
+    Each entry is one key holding value, expiry and validators together, so
+    a write publishes atomically and readers never see half an entry. Entries
+    without validators also get a server-side TTL; revalidatable ones are kept
+    as stale copies and left to the server's eviction policy. Connection
+    failures degrade to cache misses, and the server is left alone for
+    `retry_after` seconds before the next attempt. Failures are logged as one
+    warning per `retry_after` window, with a count of those suppressed.
+    """
+
+    backend = "redis"
+    # Every call is a network round trip; TieredCache's async methods run it in a thread
+    remote = True
+
+    def __init__(self, url: str, prefix: str = "icd11:", timeout: float = 1.0, retry_after: float = 5.0):
+        parsed = urlparse(url)
+        self.url = url
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._down_until = 0.0
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+        self.errors = 0
+        self._warned_at: Optional[float] = None
+        self._suppressed = 0
+
+    def _connect(self):
+        if self._sock is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._sock, self._reader = sock, sock.makefile("rb")
+            try:
+                if self.password:
+                    self._send("AUTH", self.password)
+                if self.db:
+                    self._send("SELECT", self.db)
+            except Exception:
+                self._disconnect()
+                raise
+        return self._sock
+
+    def _send(self, *args: Any) -> Any:
+        self._sock.sendall(encode_command(*args))
+        return read_reply(self._reader)
+
+    def _disconnect(self) -> None:
+        if self._sock is not None:
+            try:
+                self._reader.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._reader = None
+
+    def command(self, *args: Any) -> Any:
+        """Run one command, reconnecting once if the connection has gone away"""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    self._connect()
+                    return self._send(*args)
+                except (OSError, ConnectionError):
+                    self._disconnect()
+                    if attempt:
+                        raise
+
+    def _safe(self, *args: Any) -> Any:
+        if time.monotonic() < self._down_until:
+            return None
+        try:
+            return self.command(*args)
+        except (OSError, ConnectionError) as e:
+            self.errors += 1
+            self._down_until = time.monotonic() + self.retry_after
+            self._warn(f"Shared cache unavailable at {self.host}:{self.port}: {e}")
+        except RedisError as e:
+            self.errors += 1
+            self._warn(f"Shared cache error: {e}")
+        return None
+
+    def _warn(self, message: str) -> None:
+        """Log at most one warning per `retry_after` seconds"""
+        now = time.monotonic()
+        if self._warned_at is not None and now - self._warned_at < self.retry_after:
+            self._suppressed += 1
+            return
+        if self._suppressed:
+            message += f" ({self._suppressed} similar errors suppressed)"
+        logger.warning(message)
+        self._warned_at, self._suppressed = now, 0
+
+    def _load(self, key: str) -> Optional[Tuple[Any, Optional[float], Optional[Validators]]]:
+        raw = self._safe("GET", self.prefix + key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return entry["value"], entry.get("expires_at"), entry.get("validators")
+
+    def get(self, key: str) -> Optional[Tuple[Any, Optional[float], Optional[Validators]]]:
+        """Return (value, expires_at, validators) or None"""
+        entry = self._load(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        if entry[1] is not None and entry[1] <= time.time():
+            if entry[2] is None:
+                self._safe("DEL", self.prefix + key)
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return entry
+
+    def get_stale(self, key: str) -> Optional[Tuple[Any, Validators]]:
+        """Return (value, validators) for a revalidatable entry, fresh or not"""
+        entry = self._load(key)
+        if entry is None or entry[2] is None:
+            return None
+        return entry[0], entry[2]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = FOREVER, validators: Optional[Validators] = None) -> None:
+        expires_at = time.time() + ttl if ttl is not None else None
+        payload = json.dumps(
+            {"value": value, "expires_at": expires_at, "validators": validators},
+            separators=(",", ":"), ensure_ascii=False,
+        ).encode()
+        args: List[Any] = ["SET", self.prefix + key, payload]
+        if ttl is not None and not validators:
+            args += ["PX", max(1, int(ttl * 1000))]
+        if self._safe(*args) is not None:
+            self.stats.sets += 1
+
+    def delete(self, key: str) -> None:
+        self._safe("DEL", self.prefix + key)
+
+    def purge_expired(self) -> int:
+        """The server expires entries itself"""
+        return 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._disconnect()
@@ -0,0 +1,52 @@
+"""
+Diff of two ingested MMS releases
+Compares entities by content hash (code, title, parents, definition) and
+classifies the differences into added, removed, recoded, renamed, moved and
+redefined sets, which double as a migration map for downstream systems.
+"""
+
+from typing import Any, Dict, List
+
+from .local_store import LocalStore
+
+CHANGE_KINDS = ("added", "removed", "recoded", "renamed", "moved", "redefined")
+
+
+def _order(entry: Dict[str, Any]) -> tuple:
+    return entry.get("code") or "", entry["id"]
+
+
+def classify(delta: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """Sort a store delta into change sets; one entity can land in several"""
+    changes: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in CHANGE_KINDS}
+    changes["added"] = [{"id": e["id"], "code": e["code"], "title": e["title"]} for e in delta["added"]]
+    changes["removed"] = [{"id": e["id"], "code": e["code"], "title": e["title"]} for e in delta["removed"]]
+    for before, after in delta["changed"]:
+        if before["code"] != after["code"]:
+            changes["recoded"].append({"id": after["id"], "title": after["title"], "from": before["code"], "to": after["code"]})
+        if before["title"] != after["title"]:
+            changes["renamed"].append({"id": after["id"], "code": after["code"], "from": before["title"], "to": after["title"]})
+        if sorted(before["parents"]) != sorted(after["parents"]):
+            changes["moved"].append({"id": after["id"], "code": after["code"], "from": before["parents"], "to": after["parents"]})
+        if before["definition"] != after["definition"]:
+            changes["redefined"].append({"id": after["id"], "code": after["code"]})
+    for entries in changes.values():
+        entries.sort(key=_order)
+    return changes
+
+
+def diff_releases(store: LocalStore, from_release: str, to_release: str, language: str = "en") -> Dict[str, Any]:
+    """Change sets between two releases ingested into the same store"""
+    delta = store.release_delta(from_release, to_release, language)
+    changes = classify(delta)
+    return {
+        "from": from_release,
+        "to": to_release,
+        "language": language,
+        "counts": {
+            **{kind: len(entries) for kind, entries in changes.items()},
+            "changed": len(delta["changed"]),
+            "unchanged": delta["unchanged"],
+        },
+        **changes,
+    }
@@ -0,0 +1,55 @@
+"""
+Request coalescing for identical in-flight upstream calls
+Concurrent callers with the same key share one upstream future
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Callers still awaiting each execution
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.executions = 0
+        self.shared = 0
+        self.abandoned = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn` once for all concurrent callers of `key` and share its outcome"""
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            # A detached task so one caller's cancellation does not fail the others
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.shared += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # The last caller to give up cancels the execution, so nobody pays for unwanted work
+            if self._waiters[task] == 1 and not task.done():
+                task.cancel()
+                self.abandoned += 1
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "executions": self.executions,
+            "shared": self.shared,
+            "abandoned": self.abandoned,
+            "in_flight": len(self._inflight),
+        }
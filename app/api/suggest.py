@@ -0,0 +1,119 @@
+"""
+Typeahead suggestions over a local ICD-11 release
+A sorted array of folded keys (codes, titles, synonyms, and every title or
+synonym suffix starting at a word) answers a prefix query with one binary
+search. Top-k lists for one- and two-character prefixes, whose key ranges
+span much of the release, are precomputed.
+"""
+
+import heapq
+import re
+from array import array
+from bisect import bisect_left
+from itertools import groupby
+from typing import Any, Dict, Iterable, List, Tuple
+
+from .entity_model import EntityTable
+from .search_index import TOKEN_PATTERN, fold
+
+# Ranking buckets; a lower rank wins, and shorter texts win within a bucket
+KINDS = ("code", "title", "synonym", "title", "synonym")
+CODE, TITLE, SYNONYM, TITLE_WORD, SYNONYM_WORD = range(5)
+
+# Keys are cut to this many characters; longer queries match on their start
+MAX_KEY_LENGTH = 32
+# Words shorter than this ("of", "or", "1") do not start a suffix key
+MIN_WORD_LENGTH = 3
+
+MARKUP_PATTERN = re.compile(r"<[^>]+>")
+
+
+def normalize(text: str) -> str:
+    """Folded, whitespace-collapsed form shared by keys and queries"""
+    return " ".join(fold(text).split())[:MAX_KEY_LENGTH]
+
+
+def strip_markup(text: str) -> str:
+    """Drop the `<em class='found'>` highlighting WHO search adds to titles"""
+    return MARKUP_PATTERN.sub("", text)
+
+
+class SuggestIndex:
+    """Prefix top-k completion over codes, titles and synonyms"""
+
+    def __init__(self, max_limit: int = 20, precomputed_length: int = 2):
+        self.max_limit = max_limit
+        self.precomputed_length = precomputed_length
+        self.table = EntityTable()
+        self._keys: List[str] = []
+        self._rows = array("i")
+        # kind << 10 | text length
+        self._ranks = array("i")
+        self._top: Dict[str, List[Tuple[int, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    @classmethod
+    def build(cls, entities: Iterable[Dict[str, Any]], **kwargs) -> "SuggestIndex":
+        """Build from dicts with id, code, title, synonyms and chapter"""
+        index = cls(**kwargs)
+        entries: Dict[Tuple[str, int], int] = {}
+
+        def add(key: str, row: int, kind: int, length: int) -> None:
+            if key:
+                rank = kind << 10 | min(length, 1023)
+                if rank < entries.get((key, row), 1 << 30):
+                    entries[(key, row)] = rank
+
+        for entity in entities:
+            row = index.table.add(entity["id"], entity.get("code"), entity.get("title"), entity.get("chapter"))
+            if entity.get("code"):
+                add(normalize(entity["code"]), row, CODE, len(entity["code"]))
+            texts = [(entity.get("title") or "", TITLE, TITLE_WORD)]
+            texts += [(synonym, SYNONYM, SYNONYM_WORD) for synonym in entity.get("synonyms") or []]
+            for text, whole, word in texts:
+                folded = " ".join(fold(text).split())
+                add(folded[:MAX_KEY_LENGTH], row, whole, len(folded))
+                for match in TOKEN_PATTERN.finditer(folded):
+                    if match.start() > 0 and len(match.group()) >= MIN_WORD_LENGTH:
+                        add(folded[match.start():match.start() + MAX_KEY_LENGTH], row, word, len(folded))
+
+        for (key, row), rank in sorted(entries.items()):
+            index._keys.append(key)
+            index._rows.append(row)
+            index._ranks.append(rank)
+        index._precompute()
+        return index
+
+    def _precompute(self) -> None:
+        """Top-k for every short prefix, so the widest ranges are never scanned per query"""
+        for length in range(1, self.precomputed_length + 1):
+            start = 0
+            for prefix, group in groupby(self._keys, key=lambda k: k[:length]):
+                end = start + sum(1 for _ in group)
+                if len(prefix) == length:
+                    self._top[prefix] = self._best(start, end, self.max_limit)
+                start = end
+
+    def _best(self, start: int, end: int, limit: int) -> List[Tuple[int, int]]:
+        """(rank, row) of the best-ranked distinct entities among keys[start:end]"""
+        best: Dict[int, int] = {}
+        for row, rank in zip(self._rows[start:end], self._ranks[start:end]):
+            if rank < best.get(row, 1 << 30):
+                best[row] = rank
+        return heapq.nsmallest(limit, ((rank, row) for row, rank in best.items()))
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Best completions of `query`, in the WHO `destinationEntities` entry shape plus `match`"""
+        key = normalize(query)
+        if not key:
+            return []
+        limit = min(limit, self.max_limit)
+        if len(key) <= self.precomputed_length:
+            top = self._top.get(key, [])[:limit]
+        else:
+            start = bisect_left(self._keys, key)
+            end = bisect_left(self._keys, key + "\U0010ffff", start)
+            top = self._best(start, end, limit)
+        return [{**self.table.record(row), "match": KINDS[rank >> 10]} for rank, row in top]
@@ -0,0 +1,129 @@
+"""
+OAuth2 token lifecycle management for the ICD-11 API
+Tracks token expiry, refreshes ahead of time and collapses concurrent acquisitions
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+import httpx
+
+from .transport import RetryPolicy
+
+
+class TokenManager:
+    """Manages the client-credentials access token for the ICD-11 API"""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        token_url: str,
+        client_id: Optional[str],
+        client_secret: Optional[str],
+        scope: str = "icdapi_access",
+        refresh_margin: float = 300.0,
+        retry: Optional[RetryPolicy] = None,
+    ):
+        self.client = client
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.scope = scope
+        # Seconds before expiry at which a background refresh is started
+        self.refresh_margin = refresh_margin
+        self.retry = retry or RetryPolicy(max_retries=0)
+
+        self._token: Optional[str] = None
+        self._expires_at: float = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        self.fetch_count = 0
+
+    @property
+    def token(self) -> Optional[str]:
+        """Current token, or None if no unexpired token is held"""
+        if self._token and time.monotonic() < self._expires_at:
+            return self._token
+        return None
+
+    @property
+    def expires_in(self) -> float:
+        """Seconds until the current token expires (0 if none)"""
+        return max(0.0, self._expires_at - time.monotonic()) if self._token else 0.0
+
+    async def get_token(self) -> str:
+        """Return a valid token, fetching one if needed"""
+        now = time.monotonic()
+        if self._token and now < self._expires_at:
+            if now >= self._expires_at - self.refresh_margin:
+                self._schedule_refresh()
+            return self._token
+        return await self._acquire()
+
+    async def refresh(self, stale_token: Optional[str] = None) -> str:
+        """Force a new token unless another caller already replaced `stale_token`"""
+        return await self._acquire(stale_token=stale_token, force=True)
+
+    def invalidate(self) -> None:
+        """Drop the current token so the next caller fetches a new one"""
+        self._token = None
+        self._expires_at = 0.0
+
+    async def close(self) -> None:
+        """Cancel any pending background refresh"""
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._refresh_task = None
+
+    async def _acquire(self, stale_token: Optional[str] = None, force: bool = False) -> str:
+        """Single-flight token acquisition behind the lock"""
+        async with self._lock:
+            # Another coroutine may have fetched while we were waiting
+            current = self.token
+            if current and (not force or current != stale_token):
+                return current
+            return await self._fetch()
+
+    async def _fetch(self) -> str:
+        """POST to the token endpoint and record the expiry"""
+        if not self.client_id or not self.client_secret:
+            raise ValueError("ICD11 client credentials not configured")
+
+        data = {
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "scope": self.scope,
+            "grant_type": "client_credentials"
+        }
+
+        requested_at = time.monotonic()
+        response = await self.retry.run(lambda: self.client.post(self.token_url, data=data))
+        response.raise_for_status()
+        self.fetch_count += 1
+
+        token_data = response.json()
+        expires_in = float(token_data.get("expires_in", 3600))
+        self._token = token_data["access_token"]
+        # Measure from the request start so network time never overstates validity
+        self._expires_at = requested_at + expires_in
+        return self._token
+
+    def _schedule_refresh(self) -> None:
+        """Start a background refresh if one is not already running"""
+        if self._refresh_task and not self._refresh_task.done():
+            return
+        stale = self._token
+        self._refresh_task = asyncio.create_task(self._background_refresh(stale))
+
+    async def _background_refresh(self, stale_token: Optional[str]) -> None:
+        try:
+            await self.refresh(stale_token)
+        except Exception as e:
+            # The current token is still valid; the next caller will retry
+            print(f"Background token refresh failed: {e}")
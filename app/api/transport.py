@@ -0,0 +1,104 @@
+"""
+HTTP transport for the ICD-11 API
+Pooled httpx client construction and jittered exponential retry with Retry-After support
+"""
+
+import asyncio
+import importlib.util
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+# Upstream statuses worth retrying: throttling and transient server/gateway errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Transport failures where the request most likely never reached WHO, or timed out
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.RemoteProtocolError, httpx.PoolTimeout)
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def build_http_client() -> httpx.AsyncClient:
+    """Create the shared AsyncClient from ICD11_HTTP_* settings"""
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("ICD11_HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("ICD11_HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=_env_float("ICD11_HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+    timeout = httpx.Timeout(
+        connect=_env_float("ICD11_HTTP_CONNECT_TIMEOUT", 5.0),
+        read=_env_float("ICD11_HTTP_READ_TIMEOUT", 15.0),
+        write=_env_float("ICD11_HTTP_WRITE_TIMEOUT", 15.0),
+        pool=_env_float("ICD11_HTTP_POOL_TIMEOUT", 5.0),
+    )
+    http2 = os.getenv("ICD11_HTTP2", "true").lower() == "true"
+    if http2 and importlib.util.find_spec("h2") is None:
+        # httpx needs the optional `h2` package for HTTP/2; fall back to HTTP/1.1
+        print("ICD11_HTTP2 is enabled but the 'h2' package is not installed; using HTTP/1.1")
+        http2 = False
+    return httpx.AsyncClient(http2=http2, limits=limits, timeout=timeout)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Jittered exponential backoff for idempotent upstream requests"""
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.2, max_delay: float = 10.0, max_retry_after: float = 30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Retry-After values above this are not waited for; the error is surfaced instead
+        self.max_retry_after = max_retry_after
+        self.retries = 0
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_retries=int(os.getenv("ICD11_RETRY_MAX", "3")),
+            base_delay=_env_float("ICD11_RETRY_BASE_DELAY", 0.2),
+            max_delay=_env_float("ICD11_RETRY_MAX_DELAY", 10.0),
+            max_retry_after=_env_float("ICD11_RETRY_MAX_RETRY_AFTER", 30.0),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential delay for the given retry attempt (0-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def run(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """Call `send` until it returns a non-retryable response or retries run out"""
+        attempt = 0
+        while True:
+            try:
+                response = await send()
+            except RETRY_EXCEPTIONS:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if retry_after is not None and retry_after > self.max_retry_after:
+                    return response
+                delay = retry_after if retry_after is not None else self.backoff(attempt)
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
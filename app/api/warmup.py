@@ -0,0 +1,281 @@
+"""
+Cache warmup and predictive prefetch
+Startup warmup of chapter roots and the most-viewed entities (from a
+persisted access log), plus low-priority speculative fetches of the parents
+and children of whatever entity was just viewed.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .local_store import mms_entity_id
+
+# (kind, entity id, release, language); kind is "mms" or "foundation", release is "" for foundation
+EntityKey = Tuple[str, str, str, str]
+
+
+async def fetch_entity(client, kind: str, entity_id: str, release: str, language: str) -> Dict[str, Any]:
+    """Fetch one entity through the client (and so into its cache)"""
+    if kind == "mms":
+        return await client.get_mms_entity(entity_id, release, language)
+    return await client.get_entity_details(entity_id, language)
+
+
+def neighbour_ids(kind: str, document: Dict[str, Any]) -> List[str]:
+    """Ids of an entity's parents and children"""
+    ids = []
+    for uri in (document.get("parent") or []) + (document.get("child") or []):
+        if kind == "mms":
+            # The linearization root (`.../mms`) is not an entity
+            if "/mms/" in uri:
+                ids.append(mms_entity_id(uri))
+        else:
+            last = uri.rstrip("/").split("/")[-1]
+            if last.isdigit():
+                ids.append(last)
+    return ids
+
+
+class AccessLog:
+    """Persisted per-entity view counts (SQLite, opened lazily, written in batches)"""
+
+    def __init__(self, path: str, flush_every: int = 100):
+        self.path = path
+        self.flush_every = flush_every
+        self._pending: Counter = Counter()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["AccessLog"]:
+        path = os.getenv("ICD11_ACCESS_LOG", ".cache/icd11/access.sqlite")
+        return cls(path) if path else None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS access ("
+                "kind TEXT NOT NULL, id TEXT NOT NULL, release TEXT NOT NULL, language TEXT NOT NULL, "
+                "hits INTEGER NOT NULL, PRIMARY KEY (kind, id, release, language)) WITHOUT ROWID"
+            )
+            self._conn = conn
+        return self._conn
+
+    def record(self, kind: str, entity_id: str, release: str, language: str) -> None:
+        self._pending[(kind, entity_id, release or "", language)] += 1
+        if sum(self._pending.values()) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, Counter()
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT INTO access (kind, id, release, language, hits) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (kind, id, release, language) DO UPDATE SET hits = hits + excluded.hits",
+                [(*key, hits) for key, hits in pending.items()],
+            )
+
+    def top(self, limit: int) -> List[EntityKey]:
+        """Most-viewed entities, most popular first"""
+        self.flush()
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT kind, id, release, language FROM access ORDER BY hits DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class Prefetcher:
+    """Speculative neighbour fetches that only run while the upstream budgets are idle"""
+
+    def __init__(self, client, max_queue: int = 256, workers: int = 2, remember: int = 4096, max_deferrals: int = 50):
+        self.client = client
+        self.max_queue = max_queue
+        self.workers = workers
+        # Jobs waiting this many times for an idle upstream are dropped
+        self.max_deferrals = max_deferrals
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Recently scheduled keys, so a hot entity's neighbours are queued once
+        self._seen: "OrderedDict[EntityKey, None]" = OrderedDict()
+        self._remember = remember
+
+        self.scheduled = 0
+        self.fetched = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls, client) -> Optional["Prefetcher"]:
+        if os.getenv("ICD11_PREFETCH_ENABLED", "true").lower() != "true":
+            return None
+        return cls(
+            client,
+            max_queue=int(os.getenv("ICD11_PREFETCH_QUEUE", "256")),
+            workers=int(os.getenv("ICD11_PREFETCH_WORKERS", "2")),
+        )
+
+    def schedule_neighbours(self, kind: str, document: Dict[str, Any], release: str, language: str) -> None:
+        for entity_id in neighbour_ids(kind, document):
+            self.schedule((kind, entity_id, release or "", language))
+
+    def schedule(self, key: EntityKey) -> None:
+        if key in self._seen:
+            return
+        self._seen[key] = None
+        if len(self._seen) > self._remember:
+            self._seen.popitem(last=False)
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.max_queue)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            self._queue.put_nowait(key)
+            self.scheduled += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _upstream_busy(self) -> bool:
+        return any(g.waiting or g.in_flight >= g.max_in_flight for g in self.client.governors.values())
+
+    async def _worker(self) -> None:
+        while True:
+            kind, entity_id, release, language = await self._queue.get()
+            try:
+                deferrals = 0
+                while self._upstream_busy() and deferrals < self.max_deferrals:
+                    deferrals += 1
+                    await asyncio.sleep(0.05)
+                if deferrals >= self.max_deferrals:
+                    self.dropped += 1
+                    continue
+                await fetch_entity(self.client, kind, entity_id, release, language)
+                self.fetched += 1
+            except Exception:
+                # Speculative work: failures are counted, never surfaced
+                self.failed += 1
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "scheduled": self.scheduled,
+            "fetched": self.fetched,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+
+class Warmup:
+    """Background preload of chapter roots and the hot set, reporting progress"""
+
+    def __init__(self, client, release: str = "2025-01", language: str = "en", top_n: int = 200, concurrency: int = 4):
+        self.client = client
+        self.release = release
+        self.language = language
+        self.top_n = top_n
+        self.concurrency = concurrency
+        self._task: Optional[asyncio.Task] = None
+
+        self.state = "pending"
+        self.total = 0
+        self.completed = 0
+        self.failed = 0
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    @classmethod
+    def from_env(cls, client) -> Optional["Warmup"]:
+        if os.getenv("ICD11_WARMUP_ENABLED", "true").lower() != "true":
+            return None
+        return cls(
+            client,
+            release=os.getenv("ICD11_WARMUP_RELEASE", "2025-01"),
+            language=os.getenv("ICD11_WARMUP_LANGUAGE", "en"),
+            top_n=int(os.getenv("ICD11_WARMUP_TOP_N", "200")),
+            concurrency=int(os.getenv("ICD11_WARMUP_CONCURRENCY", "4")),
+        )
+
+    def start(self) -> None:
+        """Run in the background; the app serves requests meanwhile"""
+        self._task = asyncio.create_task(self.run())
+
+    async def run(self) -> None:
+        self.state = "running"
+        self._started = time.monotonic()
+        self.total = 1
+        keys: List[EntityKey] = []
+        try:
+            root = await self.client.get_mms_entities(self.release, self.language)
+            self.completed += 1
+            keys.extend(("mms", entity_id, self.release, self.language) for entity_id in neighbour_ids("mms", root))
+        except Exception:
+            self.failed += 1
+
+        if self.client.access_log is not None:
+            for key in self.client.access_log.top(self.top_n):
+                if key not in keys:
+                    keys.append(key)
+        self.total += len(keys)
+
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+        async def warm(key: EntityKey) -> None:
+            async with semaphore:
+                try:
+                    await fetch_entity(self.client, *key)
+                    self.completed += 1
+                except Exception:
+                    self.failed += 1
+
+        await asyncio.gather(*(warm(key) for key in keys))
+        self.state = "done"
+        self._finished = time.monotonic()
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = None
+        if self._started is not None:
+            elapsed = round((self._finished or time.monotonic()) - self._started, 3)
+        return {
+            "state": self.state,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "progress": round((self.completed + self.failed) / self.total, 4) if self.total else 0.0,
+            "seconds": elapsed,
+        }
+
+    async def close(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Bulk-ingest an ICD-11 MMS release into the offline local store
+
+Usage:
+    python -m app.ingest --release 2025-01 --language en [--concurrency 8]
+
+The walk is breadth-first from `release/11/{release}/mms/{language}`. Every
+discovered entity is recorded before it is fetched, so an interrupted run can
+simply be started again and only fetches what is still missing. Entities are
+requested in exactly `language`, without falling back to another language,
+and bypass the response cache: the store is their only copy.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+from .api.icd11_client import ICD11Client
+from .api.local_store import ROOT_ID, LocalStore
+
+
+class LanguageMismatch(ValueError):
+    """An entity document came back in a language other than the one requested"""
+
+
+def checked_language(document: Dict[str, Any], language: str) -> Dict[str, Any]:
+    """Return `document`, or raise if its title is labelled with another language"""
+    title = document.get("title")
+    served = title.get("@language") if isinstance(title, dict) else None
+    if served is not None and served != language:
+        raise LanguageMismatch(f"Requested '{language}' but the entity is in '{served}'")
+    return document
+
+
+async def ingest_release(
+    client: ICD11Client,
+    store: LocalStore,
+    release: str = "2025-01",
+    language: str = "en",
+    concurrency: int = 8,
+    progress_every: int = 500,
+) -> Dict[str, Any]:
+    """Walk an MMS release breadth-first and store every entity"""
+    started = time.perf_counter()
+
+    if not store.is_fetched(release, language, ROOT_ID):
+        root = checked_language(await client.get_mms_entities(release, language, fallback=False, use_cache=False), language)
+        store.put_entity(release, language, ROOT_ID, root, 0, None)
+
+    queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+    for item in store.pending(release, language):
+        queue.put_nowait(item)
+
+    stats = {"fetched": 0, "errors": 0}
+    errors = []
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            try:
+                document = checked_language(
+                    await client.get_mms_entity(item["id"], release, language, fallback=False, use_cache=False), language
+                )
+                discovered = store.put_entity(
+                    release, language, item["id"], document, item["depth"], item["chapter"]
+                )
+                stats["fetched"] += 1
+                chapter = document.get("code") if item["depth"] == 1 else item["chapter"]
+                for child_id in discovered:
+                    queue.put_nowait({"id": child_id, "depth": item["depth"] + 1, "chapter": chapter})
+                if progress_every and stats["fetched"] % progress_every == 0:
+                    print(f"  {stats['fetched']} fetched, {queue.qsize()} queued")
+            except Exception as e:
+                # Leave the entity pending so the next run retries it
+                stats["errors"] += 1
+                errors.append({"id": item["id"], "error": str(e)})
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    try:
+        await queue.join()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    remaining = len(store.pending(release, language))
+    entity_count: Optional[int] = None
+    if remaining == 0:
+        entity_count = store.mark_complete(release, language)
+
+    return {
+        "release": release,
+        "language": language,
+        "fetched": stats["fetched"],
+        "errors": errors,
+        "remaining": remaining,
+        "complete": remaining == 0,
+        "entity_count": entity_count,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+async def main(args: argparse.Namespace) -> int:
+    store = LocalStore(args.store)
+    client = ICD11Client()
+    try:
+        print(f"Ingesting MMS {args.release}/{args.language} into {args.store}")
+        result = await ingest_release(client, store, args.release, args.language, args.concurrency)
+    finally:
+        await client.close()
+        store.close()
+
+    print(
+        f"Fetched {result['fetched']} entities in {result['seconds']}s, "
+        f"{len(result['errors'])} errors, {result['remaining']} remaining"
+    )
+    if result["complete"]:
+        print(f"Release complete: {result['entity_count']} entities")
+    return 0 if result["complete"] else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest an ICD-11 MMS release into the local store")
+    parser.add_argument("--release", default="2025-01", help="ICD-11 release version")
+    parser.add_argument("--language", default="en", help="Language code")
+    parser.add_argument("--concurrency", type=int, default=8, help="Max concurrent upstream fetches")
+    parser.add_argument(
+        "--store",
+        default=os.getenv("ICD11_LOCAL_STORE", ".cache/icd11/mms.sqlite"),
+        help="Path of the local SQLite store",
+    )
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -4,25 +4,46 @@ ICD-11 Hackathon Application
 Main entry point for the FastAPI application
 """
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 import uvicorn
 import os
 from dotenv import load_dotenv
 
-from .api.icd11_client import ICD11Client
+from .api.warmup import Warmup
+from .compression import CompressionMiddleware
+from .metrics import CONTENT_TYPE, MetricsMiddleware, render_metrics
 from .routes import api_routes, web_routes
 
 # Load environment variables
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the pooled ICD-11 client on startup and close it on shutdown"""
+    client = api_routes.open_client()
+    # Warm the cache in the background; requests are served meanwhile
+    app.state.warmup = Warmup.from_env(client)
+    if app.state.warmup is not None:
+        app.state.warmup.start()
+    try:
+        yield
+    finally:
+        if app.state.warmup is not None:
+            await app.state.warmup.close()
+        await api_routes.close_client()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="ICD-11 Medical Terminology API",
     description="Application for ICD-11 medical terminology lookup and classification",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware for local development and GitHub Pages
@@ -34,6 +55,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Brotli/gzip for large JSON and streamed NDJSON bodies
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+    gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+    brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+)
+
+# Outermost, so latency and Server-Timing cover everything below
+app.add_middleware(MetricsMiddleware)
+
 # Mount static files
 if os.path.exists("static"):
     app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -45,7 +77,18 @@ app.include_router(web_routes.router)
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "icd11-hackathon"}
+    warmup = getattr(app.state, "warmup", None)
+    return {
+        "status": "healthy",
+        "service": "icd11-hackathon",
+        "warmup": warmup.status() if warmup is not None else {"state": "disabled"}
+    }
+
+# Prometheus scrape endpoint
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Request, upstream, cache and rate-limit metrics in Prometheus text format"""
+    return PlainTextResponse(render_metrics(api_routes.icd11_client), media_type=CONTENT_TYPE)
 
 # Root endpoint
 @app.get("/", response_class=HTMLResponse)
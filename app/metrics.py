@@ -0,0 +1,128 @@
+"""
+Request metrics middleware and the /metrics exposition
+Records per-route latency histograms, status classes and in-flight counts,
+and adds a `Server-Timing` header splitting each response into the cache,
+auth, queue, upstream and serialize phases of the work behind it.
+"""
+
+import time
+from typing import Any, List, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .api.metrics import Counter, Gauge, Histogram, Metric, end_phases, render, server_timing, start_phases
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class HTTPMetrics:
+    """Per-route request metrics for this process"""
+
+    def __init__(self):
+        self.latency = Histogram(
+            "icd11_http_request_duration_seconds",
+            "Time to serve an API request, per route template",
+            ["method", "route"],
+        )
+        self.responses = Counter(
+            "icd11_http_responses_total",
+            "Responses per route and status code",
+            ["method", "route", "status"],
+        )
+        self.in_flight = Gauge("icd11_http_requests_in_flight", "Requests being served")
+        self.in_flight.set(value=0)
+
+    def metrics(self) -> List[Metric]:
+        return [self.latency, self.responses, self.in_flight]
+
+
+http_metrics = HTTPMetrics()
+
+
+def route_label(scope: Scope) -> str:
+    """Route template (`/api/mms/entity/{entity_id}`), so ids do not explode label cardinality"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Time each HTTP request and report its phases in `Server-Timing`"""
+
+    def __init__(self, app: ASGIApp, metrics: HTTPMetrics = http_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        phases, token = start_phases()
+        status = 500
+        in_flight = self.metrics.in_flight
+        in_flight.inc()
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(phases, time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            in_flight.inc(amount=-1)
+            end_phases(token)
+            route = route_label(scope)
+            self.metrics.latency.observe(time.perf_counter() - started, scope["method"], route)
+            self.metrics.responses.inc(scope["method"], route, str(status))
+
+
+def client_metrics(client: Optional[Any]) -> List[Metric]:
+    """Cache, token, retry, budget and pipeline state of the ICD-11 client, read at scrape time"""
+    if client is None:
+        return []
+    upstream = client.upstream_stats()
+    cache = client.cache_stats()
+
+    cache_lookups = Counter("icd11_cache_lookups_total", "Response cache lookups per tier and result", ["tier", "result"])
+    hit_ratio = Gauge("icd11_cache_hit_ratio", "Response cache hit ratio per tier", ["tier"])
+    for tier in ("memory", "disk"):
+        stats = cache.get(tier)
+        if stats:
+            cache_lookups.set(tier, "hit", value=stats["hits"])
+            cache_lookups.set(tier, "miss", value=stats["misses"])
+            hit_ratio.set(tier, value=stats["hit_ratio"])
+
+    coalescing = cache["coalescing"]
+    coalesced = Counter("icd11_coalesced_requests_total", "Upstream calls shared with an identical in-flight call")
+    coalesced.set(value=coalescing["shared"])
+
+    tokens = Counter("icd11_token_fetches_total", "Access tokens fetched from the WHO token endpoint")
+    tokens.set(value=upstream["token_fetches"])
+    retries = Counter("icd11_upstream_retries_total", "Upstream attempts retried after 429/5xx/connect errors")
+    retries.set(value=upstream["retries"])
+
+    in_flight = Gauge("icd11_upstream_in_flight", "Upstream requests in flight per budget", ["budget"])
+    queued = Gauge("icd11_upstream_queue_depth", "Requests waiting for upstream budget", ["budget"])
+    rejected = Counter("icd11_upstream_rejected_total", "Requests shed because the budget queue was full", ["budget"])
+    for budget, stats in upstream["budgets"].items():
+        in_flight.set(budget, value=stats["in_flight"])
+        queued.set(budget, value=stats["queue_depth"])
+        rejected.set(budget, value=stats["rejected"])
+
+    stages = Counter("icd11_upstream_stage_seconds_total", "Exclusive seconds spent per pipeline stage", ["stage"])
+    for stage, seconds in client.stage_timings.seconds.items():
+        stages.set(stage, value=seconds)
+
+    return [
+        *client.upstream_metrics.metrics(),
+        cache_lookups, hit_ratio, coalesced, tokens, retries, in_flight, queued, rejected, stages,
+    ]
+
+
+def render_metrics(client: Optional[Any]) -> str:
+    return render(http_metrics.metrics() + client_metrics(client))
@@ -1,42 +1,107 @@
 """API route handlers for ICD-11 operations"""
 
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Any, Awaitable, List, Optional
+import asyncio
+import httpx
+import json
+import os
+from ..api import export
+from ..api.hierarchy_graph import UnknownEntity
 from ..api.icd11_client import ICD11Client
+from ..api.language_fallback import record_languages, served_language
+from ..api.local_store import LocalReleaseUnavailable
+from ..api.ratelimit import UpstreamOverloaded
+from .responses import FastJSONResponse, cached_not_modified, dumps, respond, respond_immutable, respond_in_language
 
-router = APIRouter()
-icd11_client = ICD11Client()
+router = APIRouter(default_response_class=FastJSONResponse)
+# Created and closed by the application lifespan (see app.main)
+icd11_client: Optional[ICD11Client] = None
+
+BATCH_MAX_ITEMS = int(os.getenv("ICD11_BATCH_MAX_ITEMS", "10000"))
+# Delay before a typeahead query goes upstream, so a newer keystroke can cancel it for free
+SUGGEST_DEBOUNCE = float(os.getenv("ICD11_SUGGEST_DEBOUNCE_MS", "100")) / 1000
+
+
+def http_error(e: Exception) -> HTTPException:
+    """Map a client-side failure to the HTTP error returned by the API"""
+    if isinstance(e, (LocalReleaseUnavailable, UnknownEntity)):
+        return HTTPException(status_code=404, detail=str(e))
+    if isinstance(e, UpstreamOverloaded):
+        return HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after + 0.5))}
+        )
+    # Upstream failures are told apart from our own errors
+    if isinstance(e, httpx.HTTPStatusError):
+        if e.response.status_code == 404:
+            return HTTPException(status_code=404, detail="Not found in the ICD-11 API")
+        return HTTPException(status_code=502, detail=f"ICD-11 API returned {e.response.status_code}")
+    if isinstance(e, httpx.TimeoutException):
+        return HTTPException(status_code=504, detail="ICD-11 API timed out")
+    if isinstance(e, httpx.TransportError):
+        return HTTPException(status_code=502, detail=f"ICD-11 API unreachable ({type(e).__name__})")
+    return HTTPException(status_code=500, detail=str(e))
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[Any]) -> Any:
+    """Await `work`, cancelling it (and its upstream fetches) if the client goes away first"""
+    task = asyncio.ensure_future(work)
+
+    async def watch() -> None:
+        # Once the (empty) GET body is read, the next message is the disconnect
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+        task.cancel()
+
+    watcher = asyncio.create_task(watch())
+    try:
+        return await task
+    finally:
+        watcher.cancel()
+
+
+class BatchLookupRequest(BaseModel):
+    """Body of a batch code/entity lookup"""
+    items: List[str] = Field(..., description="MMS codes, entity IDs or entity URIs")
+    release: str = Field("2025-01", description="ICD-11 release version")
+    language: str = Field("en", description="Language code")
+    concurrency: Optional[int] = Field(None, ge=1, le=64, description="Max concurrent upstream lookups")
 
 
 @router.get("/search")
 async def search_icd11_entities(
     q: str = Query(..., description="Search query for ICD-11 entities"),
     flexisearch: bool = Query(True, description="Use flexible search"),
-    language: str = Query("en", description="Language code (en, no, nb, nn, etc.)")
+    language: str = Query("en", description="Language code (en, no, nb, nn, etc.)"),
+    fields: Optional[str] = Query(None, description="Comma-separated entity fields to return, e.g. id,theCode,title")
 ):
     """Search for ICD-11 entities with multi-language support"""
     try:
         if language in ["no", "nb", "nn"]:
             # Use fallback for Norwegian
             result = await icd11_client.search_with_fallback(q, language, flexisearch)
-            return {
+            return respond({
                 "query": q, 
                 "language_requested": language,
                 "language_used": result["language_used"],
                 "fallback_used": result.get("fallback_used", False),
                 "results": result["results"]
-            }
+            }, fields)
         else:
             results = await icd11_client.search_entities(q, flexisearch, language)
-            return {
+            return respond({
                 "query": q, 
                 "language_requested": language,
                 "language_used": language,
                 "fallback_used": False,
                 "results": results
-            }
+            }, fields)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 
 @router.get("/search/enhanced")
@@ -45,20 +110,26 @@ async def enhanced_search(
     search_type: str = Query("mms", description="Search type: 'mms' or 'foundation'"),
     release: str = Query("2025-01", description="ICD-11 release version"),
     language: str = Query("en", description="Language code"),
-    flexisearch: bool = Query(True, description="Use flexible search for text queries")
+    flexisearch: bool = Query(True, description="Use flexible search for text queries"),
+    engine: str = Query("auto", pattern="^(auto|remote|local)$", description="Search engine: 'auto', 'remote' (WHO API) or 'local' (in-process index)"),
+    fields: Optional[str] = Query(None, description="Comma-separated entity fields to return, e.g. id,theCode,title")
 ):
     """Enhanced search that automatically detects codes and searches appropriately"""
     try:
-        result = await icd11_client.enhanced_search(
-            q, search_type, release, language, flexisearch
-        )
+        with record_languages() as served:
+            result = await icd11_client.enhanced_search(
+                q, search_type, release, language, flexisearch, engine
+            )
+        language_used = served_language(language, served)
         
         # Post-process results to prioritize exact code matches
         is_code_query = result.get("query_type") == "code"
         has_entities = result.get("results", {}).get("destinationEntities")
         
         if is_code_query and has_entities:
-            entities = result["results"]["destinationEntities"]
+            # Results may be shared with the client cache; work on copies
+            entities = list(result["results"]["destinationEntities"])
+            result["results"] = {**result["results"], "destinationEntities": entities}
             query_code = q.strip().upper()
             
             # Find exact code matches and partial matches
@@ -78,94 +149,78 @@ async def enhanced_search(
                     exact_matches + partial_matches
                 )
                 result["exact_matches_found"] = len(exact_matches)
-            else:
-                # If no exact matches found, try fallback text searches
-                fallback_searches = [
-                    f"diabetes {q}",  # Try with diabetes context
-                    f"endocrine {q}",  # Try with endocrine context
-                ]
-                
-                for search_term in fallback_searches:
-                    try:
-                        text_result = await icd11_client.search_mms(
-                            search_term, release, language, True
-                        )
-                        if text_result.get("destinationEntities"):
-                            # Find entities with matching codes
-                            for entity in text_result["destinationEntities"]:
-                                if entity.get("theCode") == query_code:
-                                    # Prepend exact match from text search
-                                    result["results"]["destinationEntities"].insert(
-                                        0, entity
-                                    )
-                                    result["exact_matches_found"] = 1
-                                    result["fallback_search_used"] = True
-                                    result["fallback_search_term"] = search_term
-                                    # Found a match, break out
-                                    break
-                        if result.get("fallback_search_used"):
-                            break
-                    except Exception as e:
-                        # Log and continue to next fallback search
-                        print(f"Fallback search error for '{search_term}': {e}")
-                        continue
         
-        return {
+        return respond({
             "query": q,
             "search_type": search_type,
             "release": release,
             "language": language,
+            "language_used": language_used,
             **result
-        }
+        }, fields, language_used)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 
 @router.get("/entity/{entity_id}")
-async def get_entity(entity_id: str):
+async def get_entity(
+    entity_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated entity fields to return, e.g. id,theCode,title")
+):
     """Get specific ICD-11 entity by ID"""
     try:
         entity = await icd11_client.get_entity(entity_id)
-        return {"entity_id": entity_id, "data": entity}
+        icd11_client.entity_viewed("foundation", entity_id, entity)
+        return respond({"entity_id": entity_id, "data": entity}, fields)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 
 @router.get("/entity/{entity_id}/details")
 async def get_entity_details(
     entity_id: str,
     language: str = Query("en", description="Language code"),
-    include_children: bool = Query(False, description="Include child entities")
+    include_children: bool = Query(False, description="Include child entities"),
+    fields: Optional[str] = Query(None, description="Comma-separated entity fields to return, e.g. id,theCode,title")
 ):
     """Get comprehensive details for a specific ICD-11 entity"""
     try:
-        entity = await icd11_client.get_entity_details(
-            entity_id, language, include_children
-        )
-        return {
+        with record_languages() as served:
+            entity = await icd11_client.get_entity_details(
+                entity_id, language, include_children
+            )
+        icd11_client.entity_viewed("foundation", entity_id, entity, language=language)
+        language_used = served_language(language, served)
+        return respond({
             "entity_id": entity_id,
             "language": language,
+            "language_used": language_used,
             "data": entity
-        }
+        }, fields, language_used)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 
 @router.get("/entity/{entity_id}/hierarchy")
 async def get_entity_hierarchy(
     entity_id: str,
-    language: str = Query("en", description="Language code")
+    language: str = Query("en", description="Language code"),
+    fields: Optional[str] = Query(None, description="Comma-separated entity fields to return, e.g. id,theCode,title")
 ):
     """Get hierarchy (parents/children) for a specific ICD-11 entity"""
     try:
-        hierarchy = await icd11_client.get_entity_hierarchy(entity_id, language)
-        return {
+        # Parents and children are fetched separately and may fall back to different languages
+        with record_languages() as served:
+            hierarchy = await icd11_client.get_entity_hierarchy(entity_id, language)
+        language_used = served_language(language, served)
+        return respond({
             "entity_id": entity_id,
             "language": language,
+            "language_used": language_used,
             "hierarchy": hierarchy
-        }
+        }, fields, language_used)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 
 @router.get("/languages")
@@ -175,72 +230,349 @@ async def get_supported_languages():
         languages = await icd11_client.get_supported_languages()
         return languages
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 
 @router.get("/foundation")
-async def get_foundation_entities(language: str = Query("en", description="Language code")):
+async def get_foundation_entities(
+    release: str = Query("2025-01", description="Release version"),
+    language: str = Query("en", description="Language code")
+):
     """Get foundation entities"""
     try:
-        entities = await icd11_client.get_foundation_entities(language)
-        return {"language": language, "entities": entities}
+        entities = await icd11_client.get_foundation_entities(release, language)
+        return {"release": release, "language": language, "entities": entities}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 
 @router.get("/mms")
 async def get_mms_entities(
+    request: Request,
     release: str = Query("2025-01", description="Release version"),
-    language: str = Query("en", description="Language code")
+    language: str = Query("en", description="Language code"),
+    fields: Optional[str] = Query(None, description="Comma-separated entity fields to return, e.g. id,theCode,title")
 ):
     """Get MMS (Mortality and Morbidity Statistics) linearization entities"""
+    generation = icd11_client.content_generation()
+    cached = cached_not_modified(request, generation)
+    if cached is not None:
+        return cached
     try:
-        entities = await icd11_client.get_mms_entities(release, language)
-        return {"release": release, "language": language, "entities": entities}
+        entities, language_used = await icd11_client.get_mms_entities_with_language(release, language)
+        return respond_in_language(request, {
+            "release": release,
+            "language": language,
+            "language_used": language_used,
+            "entities": entities
+        }, fields, language, language_used, generation)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 
 @router.get("/mms/search")
 async def search_mms(
+    request: Request,
     q: str = Query(..., description="Search query for MMS entities"),
     release: str = Query("2025-01", description="Release version"),
     language: str = Query("en", description="Language code"),
-    flexisearch: bool = Query(True, description="Use flexible search")
+    flexisearch: bool = Query(True, description="Use flexible search"),
+    engine: str = Query("auto", pattern="^(auto|remote|local)$", description="Search engine: 'auto', 'remote' (WHO API) or 'local' (in-process index)"),
+    fields: Optional[str] = Query(None, description="Comma-separated entity fields to return, e.g. id,theCode,title")
 ):
     """Search MMS linearization for official medical codes"""
     try:
-        results = await icd11_client.search_mms(q, release, language, flexisearch)
-        return {
+        results, language_used = await icd11_client.search_mms_with_language(q, release, language, flexisearch, engine)
+        return respond_in_language(request, {
             "query": q,
             "release": release,
             "language": language,
+            "language_used": language_used,
             "results": results
-        }
+        }, fields, language, language_used, immutable=False)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
+
+
+@router.get("/mms/export")
+async def export_mms(
+    release: str = Query("2025-01", description="Release version"),
+    language: str = Query("en", description="Language code"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$", description="Output format: 'ndjson', 'csv' or 'parquet'"),
+    cursor: Optional[str] = Query(None, pattern=r"^\d+(\.\d+)*$", description="Resume after the row with this cursor"),
+    concurrency: Optional[int] = Query(None, ge=1, le=64, description="Max concurrent upstream fetches")
+):
+    """Stream every entity of an MMS release, depth-first, as NDJSON, CSV or Parquet
+
+    Failures before the first byte map to the usual HTTP errors. A failure
+    mid-walk ends an NDJSON export with an error record and a CSV export with
+    a `#` comment line, both carrying the cursor to resume after; a Parquet
+    export is cut off before its footer, so it cannot be read as complete.
+    """
+    if format == "parquet" and not export.PARQUET_AVAILABLE:
+        raise HTTPException(status_code=501, detail="Parquet export needs the 'pyarrow' package")
+    
+    try:
+        root = await export.fetch_root(icd11_client, release, language)
+    except Exception as e:
+        raise http_error(e)
+    
+    progress = {"cursor": cursor}
+    rows = export.track(
+        export.walk_release(icd11_client, release, language, concurrency or icd11_client.fanout_limit, cursor, root),
+        progress,
+    )
+    filename = f"icd11-mms-{release}-{language}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    
+    def failure_record(e: Exception) -> dict:
+        failure = http_error(e)
+        return {"error": failure.status_code, "detail": failure.detail, "resume_cursor": progress["cursor"]}
+    
+    if format == "csv":
+        async def csv_stream():
+            try:
+                async for chunk in export.csv_chunks(rows):
+                    yield chunk
+            except Exception as e:
+                yield b"# export failed: " + dumps(failure_record(e)) + b"\n"
+        return StreamingResponse(csv_stream(), media_type="text/csv; charset=utf-8", headers=headers)
+    if format == "parquet":
+        return StreamingResponse(export.parquet_chunks(rows), media_type="application/vnd.apache.parquet", headers=headers)
+    
+    async def stream():
+        try:
+            async for batch in export.batched(rows):
+                yield b"".join(dumps(row) + b"\n" for row in batch)
+        except Exception as e:
+            yield dumps(failure_record(e)) + b"\n"
+    return StreamingResponse(stream(), media_type="application/x-ndjson", headers=headers)
 
 
 @router.get("/mms/entity/{entity_id}")
 async def get_mms_entity(
+    request: Request,
     entity_id: str,
     release: str = Query("2025-01", description="Release version"),
-    language: str = Query("en", description="Language code")
+    language: str = Query("en", description="Language code"),
+    fields: Optional[str] = Query(None, description="Comma-separated entity fields to return, e.g. id,theCode,title")
 ):
     """Get specific entity from MMS linearization"""
+    generation = icd11_client.content_generation()
+    cached = cached_not_modified(request, generation)
+    if cached is not None:
+        return cached
     try:
-        entity = await icd11_client.get_mms_entity(entity_id, release, language)
-        return {
+        entity, language_used = await icd11_client.get_mms_entity_with_language(entity_id, release, language)
+        icd11_client.entity_viewed("mms", entity_id, entity, release, language)
+        return respond_in_language(request, {
             "entity_id": entity_id,
             "release": release,
             "language": language,
+            "language_used": language_used,
             "data": entity
-        }
+        }, fields, language, language_used, generation)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
+
+
+@router.get("/mms/entity/{entity_id}/ancestors")
+async def get_mms_ancestors(
+    request: Request,
+    entity_id: str,
+    release: str = Query("2025-01", description="Release version"),
+    language: str = Query("en", description="Language code")
+):
+    """All ancestors of an MMS entity, nearest first (needs an ingested release)"""
+    generation = icd11_client.content_generation()
+    cached = cached_not_modified(request, generation)
+    if cached is not None:
+        return cached
+    try:
+        ancestors = await icd11_client.get_ancestors(entity_id, release, language)
+        return respond_immutable(request, {
+            "entity_id": entity_id,
+            "release": release,
+            "language": language,
+            "ancestors": ancestors
+        }, generation=generation)
+    except Exception as e:
+        raise http_error(e)
+
+
+@router.get("/mms/entity/{entity_id}/descendants")
+async def get_mms_descendants(
+    request: Request,
+    entity_id: str,
+    release: str = Query("2025-01", description="Release version"),
+    language: str = Query("en", description="Language code"),
+    offset: int = Query(0, ge=0, description="Index of the first descendant to return"),
+    limit: Optional[int] = Query(None, ge=1, description="Max descendants to return")
+):
+    """Every entity below an MMS entity in pre-order (needs an ingested release)"""
+    generation = icd11_client.content_generation()
+    cached = cached_not_modified(request, generation)
+    if cached is not None:
+        return cached
+    try:
+        result = await icd11_client.get_descendants(entity_id, release, language, offset, limit)
+        return respond_immutable(request, {
+            "entity_id": entity_id,
+            "release": release,
+            "language": language,
+            "offset": offset,
+            **result
+        }, generation=generation)
+    except Exception as e:
+        raise http_error(e)
+
+
+@router.get("/mms/entity/{entity_id}/lca")
+async def get_mms_lca(
+    request: Request,
+    entity_id: str,
+    other: str = Query(..., description="Entity ID to find the common ancestor with"),
+    release: str = Query("2025-01", description="Release version"),
+    language: str = Query("en", description="Language code")
+):
+    """Lowest common ancestor(s) of two MMS entities (needs an ingested release)"""
+    generation = icd11_client.content_generation()
+    cached = cached_not_modified(request, generation)
+    if cached is not None:
+        return cached
+    try:
+        lca = await icd11_client.get_lca(entity_id, other, release, language)
+        return respond_immutable(request, {
+            "entity_id": entity_id,
+            "other": other,
+            "release": release,
+            "language": language,
+            "lca": lca
+        }, generation=generation)
+    except Exception as e:
+        raise http_error(e)
+
+
+@router.get("/releases/diff")
+async def get_release_diff(
+    request: Request,
+    from_release: str = Query(..., alias="from", description="Release to compare from (e.g. 2024-01)"),
+    to_release: str = Query(..., alias="to", description="Release to compare to (e.g. 2025-01)"),
+    language: str = Query("en", description="Language code")
+):
+    """Entities added, removed, recoded, renamed, moved or redefined between two ingested releases"""
+    generation = icd11_client.content_generation()
+    cached = cached_not_modified(request, generation)
+    if cached is not None:
+        return cached
+    try:
+        diff = await icd11_client.diff_releases(from_release, to_release, language)
+        return respond_immutable(request, diff, generation=generation)
+    except Exception as e:
+        raise http_error(e)
+
+
+@router.get("/suggest")
+async def suggest(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100, description="Partial code, title or synonym being typed"),
+    release: str = Query("2025-01", description="ICD-11 release version"),
+    language: str = Query("en", description="Language code"),
+    limit: int = Query(10, ge=1, le=20, description="Max suggestions")
+):
+    """Typeahead suggestions; an aborted request cancels its upstream search"""
+    try:
+        suggestions = await cancel_on_disconnect(request, icd11_client.suggest(q, release, language, limit))
+        return respond({"query": q, "release": release, "language": language, "suggestions": suggestions})
+    except Exception as e:
+        raise http_error(e)
+
+
+@router.websocket("/suggest/ws")
+async def suggest_socket(websocket: WebSocket, release: str = "2025-01", language: str = "en", limit: int = 10):
+    """Typeahead channel: each `{"q": ..., "id": ...}` message supersedes the one in flight"""
+    await websocket.accept()
+    limit = max(1, min(limit, 20))
+    pending: Optional[asyncio.Task] = None
+
+    async def answer(message: dict) -> None:
+        query = str(message.get("q") or "")[:100]
+        reply = {"id": message.get("id"), "query": query}
+        try:
+            reply["suggestions"] = await icd11_client.suggest(query, release, language, limit, debounce=SUGGEST_DEBOUNCE)
+        except Exception as e:
+            reply["error"] = str(e)
+        await websocket.send_text(dumps(reply).decode("utf-8"))
+
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+            except ValueError:
+                message = {"q": text}
+            if pending is not None and not pending.done():
+                pending.cancel()
+            pending = asyncio.create_task(answer(message if isinstance(message, dict) else {"q": text}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+@router.post("/batch/lookup")
+async def batch_lookup(
+    body: BatchLookupRequest,
+    request: Request,
+    format: str = Query("json", pattern="^(json|ndjson)$", description="Response format: 'json' or 'ndjson' (streamed)")
+):
+    """Resolve many codes or entity IDs in one request"""
+    if len(body.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+    
+    if format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", ""):
+        async def stream():
+            # One line per distinct input, in completion order
+            async for result in icd11_client.iter_many(body.items, body.release, body.language, body.concurrency):
+                yield dumps(result) + b"\n"
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+    
+    try:
+        results = await icd11_client.get_many(body.items, body.release, body.language, body.concurrency)
+        return respond({
+            "release": body.release,
+            "language": body.language,
+            "count": len(results),
+            "found": sum(1 for r in results if r.get("found")),
+            "results": results
+        })
+    except Exception as e:
+        raise http_error(e)
+
+
+@router.get("/upstream/stats")
+async def get_upstream_stats():
+    """Get upstream rate-limit budgets, queue depth and wait-time metrics"""
+    return icd11_client.upstream_stats()
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Get response cache hit/miss/eviction counters"""
+    return icd11_client.cache_stats()
+
+
+def open_client() -> ICD11Client:
+    """Create the shared ICD-11 client inside the running event loop"""
+    global icd11_client
+    icd11_client = ICD11Client()
+    return icd11_client
 
 
-@router.on_event("shutdown")
-async def shutdown_event():
-    """Clean up resources on shutdown"""
-    await icd11_client.close()
\ No newline at end of file
+async def close_client():
+    """Close the shared ICD-11 client and release its connections"""
+    global icd11_client
+    if icd11_client is not None:
+        await icd11_client.close()
+        icd11_client = None
@@ -0,0 +1,136 @@
+"""Fast JSON responses for the API routes"""
+
+import hashlib
+import importlib.util
+import json
+import time
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+
+from ..api.cache import LRUCache
+from ..api.metrics import record_phase
+from ..api.projection import parse_fields, project
+
+# Release-pinned content never changes, so caches may keep it for a year without revalidating
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Cache-Control for responses that may change: caches must revalidate (cheap with the ETag)
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# (ETag, content generation) already served per request URL, so repeat conditional GETs skip the upstream
+served_etags = LRUCache(max_entries=4096)
+
+if importlib.util.find_spec("orjson") is not None:
+    import orjson
+
+    # orjson serializes dicts/lists natively and is several times faster than json
+    FastJSONResponse = ORJSONResponse
+
+    def dumps(content: Any) -> bytes:
+        return orjson.dumps(content)
+else:
+    print("The 'orjson' package is not installed; using the standard JSON encoder")
+    FastJSONResponse = JSONResponse
+
+    def dumps(content: Any) -> bytes:
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def respond(content: Any, fields: Optional[str] = None, content_language: Optional[str] = None) -> Response:
+    """Project entities to `fields` and serialize, bypassing jsonable_encoder
+
+    Route payloads are plain JSON types already, so returning a rendered
+    response skips FastAPI's recursive encoding pass.
+    """
+    started = time.perf_counter()
+    response = FastJSONResponse(project(content, parse_fields(fields)))
+    record_phase("serialize", time.perf_counter() - started)
+    if content_language is not None:
+        response.headers["Content-Language"] = content_language
+    return response
+
+
+def etag_for(body: bytes) -> str:
+    """Strong ETag from a hash of the response body"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison as required for If-None-Match (RFC 9110 13.1.2)"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified(etag: str, cache_control: str = IMMUTABLE_CACHE_CONTROL) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def cached_not_modified(request: Request, generation: Any = None) -> Optional[Response]:
+    """304 for a conditional GET whose ETag was already served for this URL
+
+    Only while the content generation it was served under is current: after a
+    re-ingest or a cache refresh the response is rendered again.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    served = served_etags.get(str(request.url))
+    if served is not None and served[1] == generation and etag_matches(if_none_match, served[0]):
+        return not_modified(served[0])
+    return None
+
+
+def respond_validated(request: Request, content: Any, fields: Optional[str] = None, cache_control: str = REVALIDATE_CACHE_CONTROL) -> Response:
+    """`respond` with a strong ETag of the body, answering 304 when it matches If-None-Match"""
+    response = respond(content, fields)
+    etag = etag_for(response.body)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_control)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def respond_immutable(request: Request, content: Any, fields: Optional[str] = None, generation: Any = None) -> Response:
+    """`respond` for release-pinned resources: strong ETag, immutable caching, 304s
+
+    The ETag is remembered under `generation` for `cached_not_modified`.
+    """
+    response = respond_validated(request, content, fields, IMMUTABLE_CACHE_CONTROL)
+    served_etags.set(str(request.url), (response.headers["ETag"], generation))
+    return response
+
+
+def respond_in_language(
+    request: Request,
+    content: Any,
+    fields: Optional[str],
+    language: str,
+    language_used: str,
+    generation: Any = None,
+    immutable: bool = True,
+) -> Response:
+    """`respond_immutable` (or `respond_validated`) for content in the requested language, with `Content-Language`
+
+    Content served by a fallback language is not pinned, since the requested
+    translation may still be published for the release.
+    """
+    if language_used != language:
+        return respond(content, fields, language_used)
+    if immutable:
+        response = respond_immutable(request, content, fields, generation)
+    else:
+        response = respond_validated(request, content, fields)
+    response.headers["Content-Language"] = language_used
+    return response
@@ -1,7 +1,7 @@
 """Web route handlers for serving static content and pages"""
 
 from fastapi import APIRouter
-from fastapi.responses import HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse
 
 router = APIRouter()
 
@@ -51,4 +51,11 @@ async def documentation():
     </body>
     </html>
     """
-    return html_content
\ No newline at end of file
+    return html_content
+
+
+@router.get("/sw.js", include_in_schema=False)
+async def service_worker():
+    """Serve the frontend service worker from the root, so its scope covers the whole app"""
+    # Revalidated on every load so a new version is picked up promptly
+    return FileResponse("static/sw.js", media_type="application/javascript", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the WHO ICD-11 API
+
+Usage:
+    python -m benchmarks.fake_who [--port 8100] [--entities 2000] [--latency 0.05]
+
+Serves the token endpoint plus the MMS root/entity/search/codeinfo and
+Foundation entity/search endpoints the client uses, over a generated MMS
+tree (chapters, blocks, coded categories and subcategories with synonyms).
+Latency, jitter, 5xx errors and 429 throttling are injected per request.
+Point the API at it with:
+
+    ICD11_API_URL=http://localhost:8100/icd ICD11_TOKEN_URL=http://localhost:8100/connect/token
+"""
+
+import argparse
+import asyncio
+import random
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+ROOT_ID = "root"
+
+# Title vocabulary; combinations read like (and tokenize like) ICD titles
+QUALIFIERS = ["Acute", "Chronic", "Congenital", "Recurrent", "Primary", "Secondary", "Drug-induced", "Hereditary", "Infectious", "Idiopathic"]
+CONDITIONS = ["inflammation", "insufficiency", "neoplasm", "infection", "deficiency", "disorder", "stenosis", "haemorrhage", "ulcer", "fibrosis"]
+SITES = ["liver", "kidney", "heart", "lung", "pancreas", "thyroid", "skin", "bone", "retina", "colon", "stomach", "brain"]
+CHAPTER_NAMES = ["Certain infectious diseases", "Neoplasms", "Diseases of the blood", "Diseases of the immune system",
+                 "Endocrine, nutritional or metabolic diseases", "Mental or behavioural disorders", "Sleep-wake disorders",
+                 "Diseases of the nervous system", "Diseases of the visual system", "Diseases of the ear"]
+CODE_LETTERS = "ABCDEFGHJKLMNPQRSTUVWXYZ"
+# First character of the codes in chapters 1-26: 1A00 ... 9A00, then AA00 (chapter 10), BA00, CA00 ...
+CHAPTER_PREFIXES = "123456789ABCDEFGHJKLMNPQRS"
+
+
+class FakeNode:
+    __slots__ = ("id", "code", "class_kind", "title", "synonyms", "definition", "parent", "children")
+
+    def __init__(self, entity_id: str, code: Optional[str], class_kind: str, title: str, parent: Optional[str]):
+        self.id = entity_id
+        self.code = code
+        self.class_kind = class_kind
+        self.title = title
+        self.synonyms: List[str] = []
+        self.definition: Optional[str] = None
+        self.parent = parent
+        self.children: List[str] = []
+
+
+def build_tree(entities: int = 2000, chapters: int = 26, blocks: int = 4, seed: int = 11) -> Dict[str, FakeNode]:
+    """Deterministic MMS-shaped tree of roughly `entities` nodes
+
+    Codes follow the real MMS layout: chapter prefix, then a block letter
+    (chapter 11 holds BA00, BB00 ...). Up to 26 chapters of 24 blocks.
+    """
+    rng = random.Random(seed)
+    nodes: Dict[str, FakeNode] = {ROOT_ID: FakeNode(ROOT_ID, None, "chapter", "ICD-11 for Mortality and Morbidity Statistics", None)}
+    next_id = iter(range(1000000000, 2000000000, 7919))
+
+    def add(code: Optional[str], class_kind: str, title: str, parent: str) -> FakeNode:
+        node = FakeNode(str(next(next_id)), code, class_kind, title, parent)
+        nodes[node.id] = node
+        nodes[parent].children.append(node.id)
+        return node
+
+    # Each category carries ~1.5 subcategories on average
+    per_block = max(1, round((entities - chapters * (blocks + 1)) / (chapters * blocks * 2.5)))
+    for c in range(chapters):
+        chapter = add(f"{c + 1:02d}", "chapter", CHAPTER_NAMES[c % len(CHAPTER_NAMES)] + ("" if c < len(CHAPTER_NAMES) else f" {c + 1}"), ROOT_ID)
+        for b in range(blocks):
+            stem = f"{CHAPTER_PREFIXES[c]}{CODE_LETTERS[b]}"
+            site = SITES[(c + b) % len(SITES)]
+            block = add(None, "block", f"Diseases of the {site}, group {b + 1}", chapter.id)
+            for n in range(min(per_block, 100)):
+                title = f"{rng.choice(QUALIFIERS)} {rng.choice(CONDITIONS)} of {rng.choice(SITES)}"
+                category = add(f"{stem}{n:02d}", "category", title, block.id)
+                category.synonyms = [f"{rng.choice(CONDITIONS).capitalize()} of the {site}" for _ in range(rng.randint(0, 2))]
+                category.definition = f"{title}, characterised by {rng.choice(CONDITIONS)} affecting the {site}."
+                for k in range(rng.randint(0, 3)):
+                    add(f"{stem}{n:02d}.{k}", "category", f"{title}, {['mild', 'moderate', 'severe'][k]}", category.id)
+    return nodes
+
+
+def highlight(title: str, words: List[str]) -> str:
+    """Wrap matched words the way WHO search does"""
+    return " ".join(f"<em class='found'>{w}</em>" if w.lower().strip(",") in words else w for w in title.split())
+
+
+class FakeWHO:
+    """The fake API, its fault injection settings and per-endpoint call counts"""
+
+    def __init__(
+        self,
+        entities: int = 2000,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: int = 0,
+        languages: tuple = ("en",),
+        seed: int = 11,
+    ):
+        self.nodes = build_tree(entities, seed=seed)
+        self.by_code = {node.code: node for node in self.nodes.values() if node.code and node.class_kind != "chapter"}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.languages = set(languages)
+        self.rng = random.Random(seed)
+        self.calls: Counter = Counter()
+        self.app = Starlette(routes=[
+            Route("/connect/token", self.token, methods=["POST"]),
+            Route("/icd/release/11/{release}/mms/search", self.mms_search),
+            Route("/icd/release/11/{release}/mms/codeinfo/{code}", self.codeinfo),
+            Route("/icd/release/11/{release}/mms/{language}", self.mms_root),
+            Route("/icd/release/11/{release}/mms/{language}/{entity_id}", self.mms_entity),
+            Route("/icd/entity/search", self.foundation_search),
+            Route("/icd/entity/{entity_id}", self.foundation_entity),
+        ])
+
+    @property
+    def total_calls(self) -> int:
+        return sum(count for name, count in self.calls.items() if name != "token")
+
+    def sample_ids(self) -> List[str]:
+        return [node_id for node_id in self.nodes if node_id != ROOT_ID]
+
+    def sample_codes(self) -> List[str]:
+        return list(self.by_code)
+
+    async def _inject(self, endpoint: str, request: Request) -> Optional[Response]:
+        """Count the call, wait the simulated latency and maybe fail it"""
+        self.calls[endpoint] += 1
+        delay = self.latency + (self.rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        roll = self.rng.random()
+        if roll < self.throttle_rate:
+            return Response(status_code=429, headers={"Retry-After": str(self.retry_after)})
+        if roll < self.throttle_rate + self.error_rate:
+            return Response(status_code=503)
+        language = request.headers.get("Accept-Language", "en")
+        if endpoint != "token" and language not in self.languages:
+            return Response(status_code=404)
+        return None
+
+    def _mms_document(self, node: FakeNode, release: str, language: str) -> Dict[str, Any]:
+        base = f"http://id.who.int/icd/release/11/{release}/mms"
+        uri = lambda node_id: base if node_id == ROOT_ID else f"{base}/{node_id}"
+        document = {
+            "@context": "http://id.who.int/icd/contexts/contextForLinearizationEntity.json",
+            "@id": uri(node.id),
+            "title": {"@language": language, "@value": node.title},
+            "classKind": node.class_kind,
+            "parent": [uri(node.parent)] if node.parent else [],
+            "child": [uri(child) for child in node.children],
+            "browserUrl": f"https://icd.who.int/browse/{release}/mms/{language}#{node.id}",
+        }
+        if node.code:
+            document["code"] = node.code
+        if node.synonyms:
+            document["synonym"] = [{"label": {"@language": language, "@value": s}} for s in node.synonyms]
+        if node.definition:
+            document["definition"] = {"@language": language, "@value": node.definition}
+        return document
+
+    def _search(self, query: str, uri_base: str) -> Dict[str, Any]:
+        """Naive AND match over titles, synonyms and codes"""
+        words = [w.lower() for w in query.split()]
+        results = []
+        for node in self.nodes.values():
+            if node.id == ROOT_ID:
+                continue
+            text = " ".join([node.title] + node.synonyms).lower()
+            code_hit = node.code is not None and node.code.lower() == query.lower().strip()
+            if code_hit or (words and all(w in text for w in words)):
+                results.append({
+                    "id": f"{uri_base}/{node.id}",
+                    "title": highlight(node.title, words),
+                    "theCode": node.code,
+                    "chapter": self._chapter(node),
+                    "score": 1.0 if code_hit else round(1.0 / (1 + len(node.title)), 4),
+                })
+                if len(results) >= 50:
+                    break
+        return {"destinationEntities": results, "error": False, "resultChopped": len(results) >= 50}
+
+    def _chapter(self, node: FakeNode) -> Optional[str]:
+        while node.parent and node.parent != ROOT_ID:
+            node = self.nodes[node.parent]
+        return node.code
+
+    async def token(self, request: Request) -> Response:
+        failure = await self._inject("token", request)
+        return failure or JSONResponse({"access_token": "fake-token", "expires_in": 3600, "token_type": "Bearer"})
+
+    async def mms_root(self, request: Request) -> Response:
+        return await self._entity_response("mms", request, ROOT_ID)
+
+    async def mms_entity(self, request: Request) -> Response:
+        return await self._entity_response("mms", request, request.path_params["entity_id"])
+
+    async def _entity_response(self, endpoint: str, request: Request, entity_id: str) -> Response:
+        failure = await self._inject(endpoint, request)
+        if failure:
+            return failure
+        node = self.nodes.get(entity_id)
+        if node is None:
+            return Response(status_code=404)
+        release = request.path_params.get("release", "2025-01")
+        return JSONResponse(self._mms_document(node, release, request.path_params.get("language", "en")))
+
+    async def mms_search(self, request: Request) -> Response:
+        failure = await self._inject("mms/search", request)
+        release = request.path_params["release"]
+        return failure or JSONResponse(self._search(request.query_params.get("q", ""), f"http://id.who.int/icd/release/11/{release}/mms"))
+
+    async def codeinfo(self, request: Request) -> Response:
+        failure = await self._inject("mms/codeinfo", request)
+        if failure:
+            return failure
+        node = self.by_code.get(request.path_params["code"])
+        if node is None:
+            return Response(status_code=404)
+        release = request.path_params["release"]
+        return JSONResponse({"code": node.code, "stemId": f"http://id.who.int/icd/release/11/{release}/mms/{node.id}"})
+
+    async def foundation_search(self, request: Request) -> Response:
+        failure = await self._inject("entity/search", request)
+        return failure or JSONResponse(self._search(request.query_params.get("q", ""), "http://id.who.int/icd/entity"))
+
+    async def foundation_entity(self, request: Request) -> Response:
+        failure = await self._inject("entity", request)
+        if failure:
+            return failure
+        node = self.nodes.get(request.path_params["entity_id"])
+        if node is None or node.id == ROOT_ID:
+            return Response(status_code=404)
+        document = self._mms_document(node, "2025-01", request.headers.get("Accept-Language", "en"))
+        document["@id"] = f"http://id.who.int/icd/entity/{node.id}"
+        # Chapters hang off the Foundation root, which is not an entity
+        document["parent"] = [f"http://id.who.int/icd/entity/{node.parent}"] if node.parent != ROOT_ID else []
+        document["child"] = [f"http://id.who.int/icd/entity/{child}" for child in node.children]
+        document.pop("code", None)
+        return JSONResponse(document)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve a local fake of the WHO ICD-11 API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--entities", type=int, default=2000, help="Approximate size of the generated MMS tree")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean seconds added to each response")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Uniform +/- seconds around the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of 429 responses")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+    fake = FakeWHO(args.entities, args.latency, args.jitter, args.error_rate, args.throttle_rate, args.retry_after)
+    print(f"Fake WHO API with {len(fake.nodes)} entities on http://{args.host}:{args.port}")
+    uvicorn.run(fake.app, host=args.host, port=args.port, log_level="warning")
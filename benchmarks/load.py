@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Load test of the /api routes against the local WHO stand-in
+
+Usage:
+    python -m benchmarks.load [--requests 500] [--concurrency 16] [--latency 0.02]
+                              [--output results.json] [--baseline previous.json]
+
+Runs the FastAPI app and the fake WHO API (benchmarks.fake_who) in-process,
+so results depend only on this code and the chosen fault settings. Each
+scenario gets a fresh client and cache, then drives one route at fixed
+concurrency and reports throughput, p50/p95/p99 latency, upstream calls per
+request and process RSS as JSON. With --baseline, throughput and p95 are
+compared against an earlier result file.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_who import FakeWHO
+
+FAKE_BASE = "http://fake-who"
+
+# Scenario -> request path for the i-th request; built from the fake tree
+Scenario = Callable[[int], str]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def rss_bytes() -> Dict[str, Optional[int]]:
+    """Current and peak resident set size of this process"""
+    current = None
+    try:
+        with open("/proc/self/statm") as statm:
+            current = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return {"current": current, "peak": peak if sys.platform == "darwin" else peak * 1024}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def scenarios(fake: FakeWHO, release: str, seed: int) -> Dict[str, Scenario]:
+    """The three routes under test, each cycling through a fixed, shuffled query pool"""
+    rng = random.Random(seed)
+    words = sorted({word.lower() for node in fake.nodes.values() for word in node.title.split() if len(word) > 3})
+    codes = fake.sample_codes()
+    text_queries = [" ".join(rng.sample(words, 2)) if rng.random() < 0.3 else rng.choice(words) for _ in range(200)]
+    # One in five enhanced searches is a code lookup
+    enhanced = [rng.choice(codes) if i % 5 == 0 else text_queries[i] for i in range(200)]
+    entity_ids = rng.sample(fake.sample_ids(), min(200, len(fake.nodes) - 1))
+    return {
+        "search_enhanced": lambda i: f"/api/search/enhanced?q={enhanced[i % len(enhanced)]}&search_type=mms&release={release}",
+        "entity_hierarchy": lambda i: f"/api/entity/{entity_ids[i % len(entity_ids)]}/hierarchy",
+        "mms_search": lambda i: f"/api/mms/search?q={text_queries[i % len(text_queries)]}&release={release}",
+    }
+
+
+def configure_environment(upstream_rate: float) -> None:
+    """Point the client at the fake API and keep every run self-contained"""
+    os.environ.update({
+        "ICD11_API_URL": f"{FAKE_BASE}/icd",
+        "ICD11_TOKEN_URL": f"{FAKE_BASE}/connect/token",
+        "ICD11_CLIENT_ID": "benchmark",
+        "ICD11_CLIENT_SECRET": "benchmark",
+        "ICD11_CACHE_PATH": "",
+        "ICD11_LOCAL_STORE": "",
+        "ICD11_ACCESS_LOG": "",
+        "ICD11_PREFETCH_ENABLED": "false",
+        "ICD11_WARMUP_ENABLED": "false",
+        "ICD11_SEARCH_RATE": str(upstream_rate),
+        "ICD11_SEARCH_BURST": str(upstream_rate),
+        "ICD11_ENTITY_RATE": str(upstream_rate),
+        "ICD11_ENTITY_BURST": str(upstream_rate),
+    })
+
+
+async def run_scenario(name: str, path_for: Scenario, fake: FakeWHO, requests: int, concurrency: int) -> Dict[str, Any]:
+    """Drive one route with `concurrency` workers until `requests` have completed"""
+    from app.api.icd11_client import ICD11Client
+    from app.main import app
+    from app.routes import api_routes
+
+    upstream = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app), base_url=FAKE_BASE)
+    api_routes.icd11_client = ICD11Client(http_client=upstream)
+    fake.calls.clear()
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = iter(range(requests))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api", timeout=60) as api:
+        async def worker() -> None:
+            for i in counter:
+                started = time.perf_counter()
+                response = await api.get(path_for(i))
+                latencies.append(time.perf_counter() - started)
+                statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    stats = api_routes.icd11_client.upstream_stats()
+    await api_routes.close_client()
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 0.50)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "max": ms(latencies[-1]) if latencies else 0.0,
+        },
+        "statuses": statuses,
+        "upstream_calls": dict(fake.calls),
+        "upstream_calls_per_request": round(fake.total_calls / requests, 3) if requests else 0.0,
+        "retries": stats["retries"],
+        "rss_bytes": rss_bytes(),
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Percentage change of throughput and p95 per scenario versus a baseline run"""
+    changes = {}
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        change = lambda new, old: round((new - old) * 100 / old, 1) if old else None
+        changes[name] = {
+            "throughput_change_pct": change(current["throughput_rps"], previous["throughput_rps"]),
+            "p95_change_pct": change(current["latency_ms"]["p95"], previous["latency_ms"]["p95"]),
+        }
+    return {"baseline_commit": baseline.get("commit"), "scenarios": changes}
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    configure_environment(args.upstream_rate)
+    fake = FakeWHO(
+        entities=args.entities,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    selected = scenarios(fake, args.release, args.seed)
+    names = args.scenario or list(selected)
+    results = {}
+    for name in names:
+        results[name] = await run_scenario(name, selected[name], fake, args.requests, args.concurrency)
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "config": {
+            key: getattr(args, key)
+            for key in ("requests", "concurrency", "entities", "latency", "jitter", "error_rate", "throttle_rate", "retry_after", "upstream_rate", "seed")
+        },
+        "scenarios": results,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load-test the API routes against a local fake WHO API")
+    parser.add_argument("--scenario", action="append", choices=["search_enhanced", "entity_hierarchy", "mms_search"],
+                        help="Scenario to run (repeatable; default all)")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent client workers")
+    parser.add_argument("--entities", type=int, default=2000, help="Approximate size of the fake MMS tree")
+    parser.add_argument("--latency", type=float, default=0.02, help="Mean upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.005, help="Uniform +/- upstream latency jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of upstream 503s")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of upstream 429s")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with upstream 429s")
+    parser.add_argument("--upstream-rate", type=float, default=1000.0, help="Client-side upstream budget (requests/second)")
+    parser.add_argument("--release", default="2025-01")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    output = asyncio.run(run(args))
+    if args.baseline:
+        with open(args.baseline) as f:
+            output["comparison"] = compare(output, json.load(f))
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Per-entity memory cost of the in-process caches and indexes
+
+Usage:
+    python -m benchmarks.memory [--entities 20000]
+
+Compares the plain dict representation against the compact one for the
+per-release index rows (code and search indexes) and for WHO documents
+held in the memory cache tier. Prints bytes per entity as JSON.
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from app.api.entity_model import EntityTable, PackedDocument
+
+BASE = "http://id.who.int/icd/release/11/2025-01/mms"
+
+
+def source_entities(count: int) -> List[Dict[str, Any]]:
+    """Fresh strings each call, as separate reads from the local store produce"""
+    return [
+        {
+            "id": f"{BASE}/{1000000000 + i}",
+            "code": f"{i % 26 + 1}A{i % 100:02d}.{i % 10}",
+            "title": f"Disorder number {i} of the metabolic system, unspecified",
+            "chapter": f"{i % 26 + 1:02d}",
+        }
+        for i in range(count)
+    ]
+
+
+def prose(seed: int, words: int) -> str:
+    """Deterministic, non-repetitive filler text"""
+    return " ".join(f"w{(seed * 7919 + k * 104729) % 99991:x}" for k in range(words))
+
+
+def who_document(i: int) -> Dict[str, Any]:
+    """A WHO MMS entity document of typical size"""
+    return {
+        "@context": "http://id.who.int/icd/contexts/contextForLinearizationEntity.json",
+        "@id": f"{BASE}/{1000000000 + i}",
+        "parent": [f"{BASE}/{900000000 + i // 10}"],
+        "child": [f"{BASE}/{1100000000 + i * 4 + k}" for k in range(4)],
+        "browserUrl": f"https://icd.who.int/browse/2025-01/mms/en#{1000000000 + i}",
+        "code": f"5A{i % 100:02d}",
+        "classKind": "category",
+        "title": {"@language": "en", "@value": f"Disorder number {i} of the metabolic system"},
+        "definition": {"@language": "en", "@value": prose(i, 45)},
+        "synonym": [{"label": {"@language": "en", "@value": f"Synonym {k} for disorder {i}"}} for k in range(3)],
+        "indexTerm": [{"label": {"@language": "en", "@value": f"Index term {k} for disorder {i}"}} for k in range(3)],
+    }
+
+
+def measure(build: Callable[[], Any]) -> int:
+    """Bytes still allocated by what `build` returns"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def index_rows_dicts(count: int):
+    # Code index and search index each kept their own row dicts
+    return [
+        [{"id": e["id"], "title": e["title"], "theCode": e["code"], "chapter": e["chapter"]} for e in source_entities(count)]
+        for _ in range(2)
+    ]
+
+
+def index_rows_compact(count: int):
+    tables = []
+    for _ in range(2):
+        table = EntityTable()
+        for e in source_entities(count):
+            table.add(e["id"], e["code"], e["title"], e["chapter"])
+        tables.append(table)
+    return tables
+
+
+def run(count: int) -> Dict[str, Any]:
+    results = {}
+    dict_rows = measure(lambda: index_rows_dicts(count))
+    compact_rows = measure(lambda: index_rows_compact(count))
+    results["index_rows"] = {
+        "dict_bytes_per_entity": round(dict_rows / count, 1),
+        "compact_bytes_per_entity": round(compact_rows / count, 1),
+        "ratio": round(dict_rows / compact_rows, 2),
+    }
+    dict_docs = measure(lambda: [who_document(i) for i in range(count)])
+    packed_docs = measure(lambda: [PackedDocument.pack(who_document(i)) for i in range(count)])
+    results["cached_documents"] = {
+        "dict_bytes_per_entity": round(dict_docs / count, 1),
+        "packed_bytes_per_entity": round(packed_docs / count, 1),
+        "ratio": round(dict_docs / packed_docs, 2),
+    }
+    return {"entities": count, **results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure per-entity memory of cache and index representations")
+    parser.add_argument("--entities", type=int, default=20000, help="Number of synthetic entities")
+    print(json.dumps(run(parser.parse_args().entities), indent=2))
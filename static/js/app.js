@@ -3,6 +3,61 @@
  * Frontend logic for medical terminology search
  */
 
+/**
+ * IndexedDB copy of viewed entities and recent searches, keyed by release and language.
+ * Answers when the network is unavailable; every method is a no-op without IndexedDB.
+ */
+class OfflineStore {
+    constructor(name = 'icd11') {
+        // Records kept per object store; the oldest are dropped first
+        this.limits = { entities: 500, searches: 50 };
+        this.db = typeof indexedDB === 'undefined' ? Promise.resolve(null) : this.open(name);
+    }
+
+    open(name) {
+        return new Promise((resolve) => {
+            const request = indexedDB.open(name, 1);
+            request.onupgradeneeded = () => {
+                for (const store of Object.keys(this.limits)) {
+                    request.result.createObjectStore(store, { keyPath: 'key' }).createIndex('storedAt', 'storedAt');
+                }
+            };
+            request.onsuccess = () => resolve(request.result);
+            // e.g. storage disabled in a private window
+            request.onerror = () => resolve(null);
+        });
+    }
+
+    async get(store, key) {
+        const db = await this.db;
+        if (!db) return null;
+        return new Promise((resolve) => {
+            const request = db.transaction(store).objectStore(store).get(key);
+            request.onsuccess = () => resolve(request.result ? request.result.value : null);
+            request.onerror = () => resolve(null);
+        });
+    }
+
+    async put(store, key, value) {
+        const db = await this.db;
+        if (!db) return;
+        const objects = db.transaction(store, 'readwrite').objectStore(store);
+        objects.put({ key, value, storedAt: Date.now() });
+        const count = objects.count();
+        count.onsuccess = () => {
+            let excess = count.result - this.limits[store];
+            if (excess <= 0) return;
+            objects.index('storedAt').openCursor().onsuccess = (event) => {
+                const cursor = event.target.result;
+                if (cursor && excess-- > 0) {
+                    cursor.delete();
+                    cursor.continue();
+                }
+            };
+        };
+    }
+}
+
 class ICD11App {
     constructor() {
         // Use the backend server URL for API calls
@@ -10,6 +65,14 @@ class ICD11App {
         this.selectedLanguage = 'en';
         this.currentSearchType = 'mms'; // Default to MMS (Official Medical Codes)
         this.searchHistory = [];
+        // In-flight typeahead request; aborted when a newer keystroke supersedes it
+        this.suggestController = null;
+        this.suggestTimer = null;
+        // API responses already fetched this session (oldest dropped first) and requests in flight
+        this.responseCache = new Map();
+        this.responseCacheSize = 200;
+        this.inflight = new Map();
+        this.offlineStore = new OfflineStore();
         this.init();
     }
 
@@ -23,9 +86,64 @@ class ICD11App {
         }, 100);
         
         this.loadSupportedLanguages();
+        this.registerServiceWorker();
         console.log('ICD-11 Application initialized');
     }
 
+    registerServiceWorker() {
+        // Served from the site root so its scope covers the page and its API calls
+        if (typeof navigator === 'undefined' || !('serviceWorker' in navigator) || location.protocol === 'file:') return;
+        navigator.serviceWorker.register('/sw.js').catch((error) => {
+            console.warn('Service worker registration failed:', error);
+        });
+    }
+
+    /**
+     * GET a JSON API response at most once per session: repeats are answered from
+     * memory, concurrent calls share one request, and when the network is down the
+     * copy saved in IndexedDB under `store`/`key` answers instead.
+     */
+    async fetchJSON(url, store, key) {
+        if (this.responseCache.has(url)) {
+            return this.responseCache.get(url);
+        }
+        if (this.inflight.has(url)) {
+            return this.inflight.get(url);
+        }
+
+        const request = (async () => {
+            let response;
+            try {
+                response = await fetch(url);
+            } catch (error) {
+                const saved = await this.offlineStore.get(store, key);
+                if (saved) return saved;
+                throw error;
+            }
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+            }
+            const data = await response.json();
+            this.rememberResponse(url, data);
+            this.offlineStore.put(store, key, data);
+            return data;
+        })();
+        this.inflight.set(url, request);
+        try {
+            return await request;
+        } finally {
+            this.inflight.delete(url);
+        }
+    }
+
+    rememberResponse(url, data) {
+        this.responseCache.delete(url);
+        this.responseCache.set(url, data);
+        if (this.responseCache.size > this.responseCacheSize) {
+            this.responseCache.delete(this.responseCache.keys().next().value);
+        }
+    }
+
     async loadSupportedLanguages() {
         try {
             const response = await fetch(`${this.apiBaseUrl}/languages`);
@@ -73,8 +191,11 @@ class ICD11App {
                             class="search-input" 
                             id="searchInput" 
                             placeholder="Search official ICD-11 codes (e.g. 5A13.4) or medical conditions..."
+                            list="searchSuggestions"
+                            autocomplete="off"
                             required
                         />
+                        <datalist id="searchSuggestions"></datalist>
                         <button type="submit" class="search-button" id="searchButton">
                             Search
                         </button>
@@ -147,6 +268,11 @@ class ICD11App {
                 console.error('Search form not found!');
             }
             
+            const searchInput = document.getElementById('searchInput');
+            if (searchInput) {
+                searchInput.addEventListener('input', (e) => this.scheduleSuggestions(e.target.value));
+            }
+            
             const languageSelect = document.getElementById('languageSelect');
             if (languageSelect) {
                 console.log('Language select found, adding change listener');
@@ -275,13 +401,8 @@ class ICD11App {
         console.log(`Using enhanced search: ${useMMS ? 'MMS' : 'Foundation'} mode`);
         console.log('Query:', query, 'Release:', release);
         
-        const response = await fetch(`${this.apiBaseUrl}/${endpoint}?${params}`);
-        
-        if (!response.ok) {
-            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-        }
-        
-        const result = await response.json();
+        const key = [useMMS ? release : 'foundation', language, flexiSearch, query.toLowerCase()].join('|');
+        const result = await this.fetchJSON(`${this.apiBaseUrl}/${endpoint}?${params}`, 'searches', key);
         console.log('Enhanced search result:', result);
         
         // Check if this was a code search
@@ -292,6 +413,50 @@ class ICD11App {
         return result;
     }
 
+    scheduleSuggestions(query, delay = 150) {
+        clearTimeout(this.suggestTimer);
+        this.suggestTimer = setTimeout(() => this.updateSuggestions(query.trim()), delay);
+    }
+
+    async updateSuggestions(query) {
+        // Aborting closes the connection, which cancels the server-side lookup
+        if (this.suggestController) {
+            this.suggestController.abort();
+        }
+        const datalist = document.getElementById('searchSuggestions');
+        if (!datalist || query.length < 2) {
+            this.suggestController = null;
+            return;
+        }
+
+        const controller = new AbortController();
+        this.suggestController = controller;
+        const params = new URLSearchParams({
+            q: query,
+            release: document.getElementById('releaseSelect')?.value || '2025-01',
+            language: this.selectedLanguage,
+            limit: '8'
+        });
+
+        try {
+            const response = await fetch(`${this.apiBaseUrl}/suggest?${params}`, { signal: controller.signal });
+            if (!response.ok) return;
+            const data = await response.json();
+            if (controller !== this.suggestController) return;
+            datalist.innerHTML = '';
+            for (const suggestion of data.suggestions) {
+                const option = document.createElement('option');
+                option.value = suggestion.match === 'code' ? suggestion.theCode : this.cleanHtmlTags(suggestion.title || '');
+                option.label = suggestion.theCode ? `${suggestion.theCode} – ${this.cleanHtmlTags(suggestion.title || '')}` : '';
+                datalist.appendChild(option);
+            }
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                console.error('Suggestions failed:', error);
+            }
+        }
+    }
+
     async getEntityDetails(entityId, language = 'en') {
         const params = new URLSearchParams({
             language: language,
@@ -300,13 +465,8 @@ class ICD11App {
         
         // Don't double-encode the entity ID
         const cleanEntityId = decodeURIComponent(entityId);
-        const response = await fetch(`${this.apiBaseUrl}/entity/${encodeURIComponent(cleanEntityId)}/details?${params}`);
-        
-        if (!response.ok) {
-            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-        }
-        
-        return await response.json();
+        const url = `${this.apiBaseUrl}/entity/${encodeURIComponent(cleanEntityId)}/details?${params}`;
+        return this.fetchJSON(url, 'entities', ['foundation', language, 'details', cleanEntityId].join('|'));
     }
 
     async getEntityHierarchy(entityId, language = 'en') {
@@ -316,24 +476,13 @@ class ICD11App {
         
         // Don't double-encode the entity ID
         const cleanEntityId = decodeURIComponent(entityId);
-        const response = await fetch(`${this.apiBaseUrl}/entity/${encodeURIComponent(cleanEntityId)}/hierarchy?${params}`);
-        
-        if (!response.ok) {
-            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-        }
-        
-        return await response.json();
+        const url = `${this.apiBaseUrl}/entity/${encodeURIComponent(cleanEntityId)}/hierarchy?${params}`;
+        return this.fetchJSON(url, 'entities', ['foundation', language, 'hierarchy', cleanEntityId].join('|'));
     }
 
     async getEntity(entityId) {
         const url = `${this.apiBaseUrl}/entity/${encodeURIComponent(entityId)}`;
-        
-        const response = await fetch(url);
-        if (!response.ok) {
-            throw new Error(`Failed to get entity: ${response.status} ${response.statusText}`);
-        }
-        
-        return response.json();
+        return this.fetchJSON(url, 'entities', ['foundation', 'en', 'entity', entityId].join('|'));
     }
 
     displayResults(data) {
@@ -687,8 +836,8 @@ class ICD11App {
             // Scroll to top
             window.scrollTo({ top: 0, behavior: 'smooth' });
             
-            // Perform the search
-            await this.search(searchTerm);
+            // Perform the search (a repeat of an earlier one is answered from memory)
+            await this.handleSearch({ preventDefault() {} });
         } catch (error) {
             console.error('Error performing new search:', error);
             const resultsDiv = document.getElementById('results');
@@ -715,4 +864,8 @@ class ICD11App {
 const app = new ICD11App();
 
 // Make app globally available for event handlers
-window.app = app;
\ No newline at end of file
+window.app = app;
+
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = { ICD11App, OfflineStore, app };
+}
\ No newline at end of file
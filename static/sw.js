@@ -0,0 +1,88 @@
+/**
+ * ICD-11 Hackathon service worker
+ * Precaches the app shell and answers API GETs stale-while-revalidate, so
+ * repeat navigation renders from cache and the app keeps working offline.
+ */
+
+const VERSION = 'v1';
+const SHELL_CACHE = `icd11-shell-${VERSION}`;
+const API_CACHE = `icd11-api-${VERSION}`;
+const API_CACHE_ENTRIES = 500;
+// Per-keystroke, live or bulk endpoints that always go to the network
+const UNCACHED_API = ['/api/suggest', '/api/upstream/stats', '/api/cache/stats', '/api/mms/export', '/api/batch/'];
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(precacheShell().then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil((async () => {
+        for (const name of await caches.keys()) {
+            if (name.startsWith('icd11-') && name !== SHELL_CACHE && name !== API_CACHE) {
+                await caches.delete(name);
+            }
+        }
+        await self.clients.claim();
+    })());
+});
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+
+    const url = new URL(request.url);
+    if (url.pathname.includes('/api/')) {
+        if (!UNCACHED_API.some((path) => url.pathname.includes(path))) {
+            event.respondWith(staleWhileRevalidate(event, request, API_CACHE));
+        }
+        return;
+    }
+    const isShell = request.mode === 'navigate' || /\.(?:js|css)$/.test(url.pathname);
+    if (isShell && url.origin === self.location.origin) {
+        event.respondWith(staleWhileRevalidate(event, request, SHELL_CACHE));
+    }
+});
+
+async function precacheShell() {
+    // The page at the scope root, plus the scripts and stylesheets it links
+    const page = self.registration.scope;
+    const response = await fetch(page, { cache: 'no-cache' });
+    if (!response.ok) return;
+    const html = await response.clone().text();
+    const assets = [...html.matchAll(/(?:src|href)="([^"]+\.(?:js|css))"/g)].map((match) => new URL(match[1], page).href);
+    const cache = await caches.open(SHELL_CACHE);
+    await cache.put(page, response);
+    await Promise.all(assets.map((asset) => cache.add(asset).catch(() => undefined)));
+}
+
+async function staleWhileRevalidate(event, request, cacheName) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request);
+    // Release-pinned API responses never change, so there is nothing to revalidate
+    if (cached && (cached.headers.get('Cache-Control') || '').includes('immutable')) {
+        return cached;
+    }
+
+    const refresh = fetch(request).then(async (response) => {
+        if (response.ok) {
+            await cache.put(request, response.clone());
+            if (cacheName === API_CACHE) {
+                await trim(cache, API_CACHE_ENTRIES);
+            }
+        }
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(refresh.catch(() => undefined));
+        return cached;
+    }
+    return refresh;
+}
+
+async function trim(cache, maxEntries) {
+    // Keys come back in insertion order and a put re-inserts, so the oldest writes go first
+    const keys = await cache.keys();
+    for (const key of keys.slice(0, Math.max(0, keys.length - maxEntries))) {
+        await cache.delete(key);
+    }
+}
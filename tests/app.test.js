@@ -40,4 +40,33 @@ describe('ICD11App', () => {
         const result = mockApp.escapeHtml(123);
         expect(result).toBe('');
     });
-});
\ No newline at end of file
+});
+describe('ICD11App.fetchJSON', () => {
+    const { ICD11App } = require('../static/js/app');
+    let instance;
+
+    beforeEach(() => {
+        fetch.mockReset();
+        instance = Object.create(ICD11App.prototype);
+        instance.responseCache = new Map();
+        instance.responseCacheSize = 2;
+        instance.inflight = new Map();
+        instance.offlineStore = { get: jest.fn(async () => ({ saved: true })), put: jest.fn() };
+    });
+
+    test('concurrent and repeated requests share one fetch', async () => {
+        fetch.mockResolvedValue({ ok: true, json: async () => ({ n: 1 }) });
+        const [a, b] = await Promise.all([instance.fetchJSON('/api/x', 'entities', 'k'), instance.fetchJSON('/api/x', 'entities', 'k')]);
+        const c = await instance.fetchJSON('/api/x', 'entities', 'k');
+        expect(fetch).toHaveBeenCalledTimes(1);
+        expect(a).toBe(b);
+        expect(c).toBe(a);
+        expect(instance.offlineStore.put).toHaveBeenCalledWith('entities', 'k', { n: 1 });
+    });
+
+    test('falls back to the offline copy when the network fails', async () => {
+        fetch.mockRejectedValue(new TypeError('Failed to fetch'));
+        await expect(instance.fetchJSON('/api/y', 'searches', 'k')).resolves.toEqual({ saved: true });
+        expect(instance.offlineStore.get).toHaveBeenCalledWith('searches', 'k');
+    });
+});
@@ -4,17 +4,103 @@ Test configuration and utilities
 
 import pytest
 import asyncio
+import httpx
 from fastapi.testclient import TestClient
 from app.main import app
+from app.api.icd11_client import ICD11Client
 
 @pytest.fixture
-def client():
-    """Create test client"""
-    return TestClient(app)
+def client(monkeypatch):
+    """Create test client (runs the app lifespan, without warmup or access logging)"""
+    monkeypatch.setenv("ICD11_WARMUP_ENABLED", "false")
+    monkeypatch.setenv("ICD11_ACCESS_LOG", "")
+    monkeypatch.setenv("ICD11_PREFETCH_ENABLED", "false")
+    with TestClient(app) as test_client:
+        yield test_client
 
 @pytest.fixture
 def event_loop():
     """Create event loop for async tests"""
     loop = asyncio.new_event_loop()
     yield loop
-    loop.close()
\ No newline at end of file
+    loop.close()
+
+@pytest.fixture
+def make_client(monkeypatch):
+    """Factory for an ICD11Client whose HTTP traffic goes to a handler function"""
+    monkeypatch.setenv("ICD11_CLIENT_ID", "test-id")
+    monkeypatch.setenv("ICD11_CLIENT_SECRET", "test-secret")
+    monkeypatch.setenv("ICD11_CACHE_PATH", "")
+    monkeypatch.setenv("ICD11_LOCAL_STORE", "")
+    monkeypatch.setenv("ICD11_ACCESS_LOG", "")
+    monkeypatch.setenv("ICD11_PREFETCH_ENABLED", "false")
+
+    def factory(handler, **kwargs):
+        http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return ICD11Client(http_client=http_client, **kwargs)
+
+    return factory
+
+
+MMS_TREE = {
+    "root": {"title": "ICD-11 for Mortality and Morbidity Statistics", "child": ["1001", "1002"]},
+    "1001": {"code": "05", "classKind": "chapter", "title": "Endocrine, nutritional or metabolic diseases", "child": ["2001"]},
+    "2001": {"codeRange": "5A10-5A14", "classKind": "block", "title": "Diabetes mellitus", "child": ["3001", "3002", "3003"]},
+    "3001": {"code": "5A10", "title": "Type 1 diabetes mellitus", "synonym": ["Juvenile diabetes", "Insulin-dependent diabetes"],
+             "definition": "Diabetes mellitus type 1 is a metabolic disorder characterised by hyperglycaemia."},
+    "3002": {"code": "5A11", "title": "Type 2 diabetes mellitus", "synonym": ["Adult-onset diabetes"]},
+    "3003": {"code": "5A13", "title": "Diabetes mellitus, other specified type", "child": ["4001"]},
+    "4001": {"code": "5A13.4", "title": "Diabetes mellitus due to drug or chemical"},
+    "1002": {"code": "06", "classKind": "chapter", "title": "Mental, behavioural or neurodevelopmental disorders", "child": ["3101", "3102"]},
+    "3101": {"code": "6A05", "title": "Attention deficit hyperactivity disorder", "synonym": ["ADHD"]},
+    "3102": {"code": "6A00", "title": "Disorders of intellectual development"},
+}
+
+
+def mms_document(entity_id, release="2025-01", language="en", tree=MMS_TREE):
+    """Render a fixture node the way the WHO API returns an MMS entity"""
+    node = tree[entity_id]
+    base = f"http://id.who.int/icd/release/11/{release}/mms"
+    parents = [pid for pid, other in tree.items() if entity_id in other.get("child", [])]
+    document = {
+        "@id": base if entity_id == "root" else f"{base}/{entity_id}",
+        "title": {"@language": language, "@value": node["title"]},
+        "classKind": node.get("classKind", "category"),
+        "parent": [base if pid == "root" else f"{base}/{pid}" for pid in parents],
+        "child": [f"{base}/{cid}" for cid in node.get("child", [])],
+    }
+    for field in ("code", "codeRange"):
+        if field in node:
+            document[field] = node[field]
+    if "synonym" in node:
+        document["synonym"] = [{"label": {"@language": language, "@value": s}} for s in node["synonym"]]
+    if "definition" in node:
+        document["definition"] = {"@language": language, "@value": node["definition"]}
+    return document
+
+
+@pytest.fixture
+def mms_handler():
+    """Mock WHO handler serving MMS_TREE; `handler.calls` counts entity fetches
+
+    `handler.trees` maps a release to a different tree to serve for it.
+    """
+    def handler(request):
+        path = request.url.path
+        if path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        handler.calls += 1
+        parts = path.split("/mms/")
+        release = path.split("/release/11/")[1].split("/")[0]
+        rest = parts[1].split("/") if len(parts) > 1 else []
+        language = rest[0] if rest else "en"
+        entity_id = rest[1] if len(rest) > 1 else "root"
+        tree = handler.trees.get(release, MMS_TREE)
+        if entity_id not in tree or entity_id in handler.fail:
+            return httpx.Response(404)
+        return httpx.Response(200, json=mms_document(entity_id, release, language, tree))
+
+    handler.calls = 0
+    handler.fail = set()
+    handler.trees = {}
+    return handler
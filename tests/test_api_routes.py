@@ -0,0 +1,295 @@
+"""
+Test cases for API route handlers
+"""
+
+import json
+
+import httpx
+
+
+def test_batch_lookup_streams_ndjson(client):
+    """Batch lookup streams one NDJSON line per distinct input"""
+    response = client.post(
+        "/api/batch/lookup?format=ndjson",
+        json={"items": ["not a code", "NOT A CODE", "also bad"]},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(len(line["positions"]) for line in lines) == [1, 2]
+    assert all(line["error"] == "ValueError" for line in lines)
+
+
+def test_batch_lookup_resolves_letter_chapter_codes(client, make_client, monkeypatch):
+    """Codes from chapter 10 onward and residual codes are looked up, not rejected"""
+    import httpx
+
+    from app.routes import api_routes
+
+    entities = {
+        "BA00": {"id": "http://id.who.int/icd/release/11/2025-01/mms/1", "theCode": "BA00", "title": "Essential hypertension"},
+        "6A0Z": {"id": "http://id.who.int/icd/release/11/2025-01/mms/2", "theCode": "6A0Z", "title": "Neurodevelopmental disorders, unspecified"},
+    }
+
+    def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        entity = entities.get(request.url.params.get("q", "").upper())
+        return httpx.Response(200, json={"destinationEntities": [entity] if entity else []})
+
+    monkeypatch.setattr(api_routes, "icd11_client", make_client(handler))
+    response = client.post("/api/batch/lookup", json={"items": ["BA00", "ba00", "6A0Z"]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["code"] for r in results] == ["BA00", "BA00", "6A0Z"]
+    assert all(r["found"] and "error" not in r for r in results)
+
+
+def test_fields_projection_and_compression(client, make_client, mms_handler, monkeypatch):
+    """fields= trims hierarchy entities; large bodies are compressed"""
+    from app.routes import api_routes
+
+    monkeypatch.setattr(api_routes, "icd11_client", make_client(mms_handler))
+
+    full = client.get("/api/mms/entity/2001", headers={"Accept-Encoding": "identity"})
+    assert "child" in full.json()["data"]
+
+    slim = client.get("/api/mms/entity/2001?fields=id,theCode,title", headers={"Accept-Encoding": "identity"})
+    data = slim.json()["data"]
+    assert set(data) == {"@id", "title"}
+    assert len(slim.content) < len(full.content)
+
+    batch = client.post(
+        "/api/batch/lookup",
+        json={"items": [f"bad item {i}" for i in range(200)]},
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert batch.headers["content-encoding"] == "gzip"
+    assert batch.json()["count"] == 200
+
+
+def test_project_keeps_wrappers_and_aliases():
+    """Projection trims entities only and maps id/@id and theCode/code"""
+    from app.api.projection import parse_fields, project
+
+    payload = {
+        "query": "x",
+        "results": {"destinationEntities": [{"id": "a", "theCode": "5A10", "title": "T", "matchingPVs": [1, 2]}]},
+        "current": {"@id": "b", "code": "5A11", "title": "U", "child": ["c"]},
+    }
+    projected = project(payload, parse_fields("id, theCode ,title"))
+    assert projected["query"] == "x"
+    assert projected["results"]["destinationEntities"] == [{"id": "a", "theCode": "5A10", "title": "T"}]
+    assert projected["current"] == {"@id": "b", "code": "5A11", "title": "U"}
+    assert project(payload, parse_fields("")) is payload
+
+
+def test_release_pinned_routes_answer_conditional_gets(client, make_client, mms_handler, monkeypatch):
+    """Release-pinned MMS routes send ETags and answer 304 without upstream calls"""
+    from app.routes import api_routes
+
+    monkeypatch.setattr(api_routes, "icd11_client", make_client(mms_handler))
+
+    first = client.get("/api/mms/entity/3001?release=2025-01")
+    etag = first.headers["etag"]
+    assert "immutable" in first.headers["cache-control"]
+    calls = mms_handler.calls
+
+    repeat = client.get("/api/mms/entity/3001?release=2025-01", headers={"If-None-Match": etag})
+    assert repeat.status_code == 304
+    assert repeat.headers["etag"] == etag
+    assert mms_handler.calls == calls
+
+    changed = client.get("/api/mms/entity/3001?release=2025-01", headers={"If-None-Match": '"other"'})
+    assert changed.status_code == 200
+
+
+def test_conditional_gets_revalidate_after_a_reingest(client, make_client, mms_handler, monkeypatch, tmp_path):
+    """A remembered ETag stops short-circuiting once another process writes the local store"""
+    import asyncio
+    import copy
+
+    from conftest import MMS_TREE
+
+    from app.api.local_store import LocalStore
+    from app.ingest import ingest_release
+    from app.routes import api_routes
+
+    path = str(tmp_path / "mms.sqlite")
+    monkeypatch.setattr(api_routes, "icd11_client", make_client(mms_handler, local_store=LocalStore(path)))
+    url = "/api/mms/entity/3001?release=2025-01"
+    first = client.get(url)
+    etag = first.headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    # `python -m app.ingest` in another process, with a corrected title
+    tree = copy.deepcopy(MMS_TREE)
+    tree["3001"]["title"] = "Type 1 diabetes mellitus (revised)"
+    mms_handler.trees["2025-01"] = tree
+    ingester = make_client(mms_handler, local_store=LocalStore(path))
+    asyncio.run(ingest_release(ingester, ingester.local_store, progress_every=0))
+
+    refreshed = client.get(url, headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.json()["data"]["title"]["@value"] == "Type 1 diabetes mellitus (revised)"
+    assert refreshed.headers["etag"] != etag
+
+
+def test_mms_search_is_revalidated_rather_than_pinned(client, make_client, mms_handler, monkeypatch):
+    from app.routes import api_routes
+
+    monkeypatch.setattr(api_routes, "icd11_client", make_client(mms_handler))
+    first = client.get("/api/mms/search?q=diabetes")
+    assert first.headers["cache-control"] == "no-cache"
+    calls = mms_handler.calls
+    repeat = client.get("/api/mms/search?q=diabetes", headers={"If-None-Match": first.headers["etag"]})
+    assert repeat.status_code == 304
+    # The body is rendered again (from the client cache here) before the ETag is compared
+    assert repeat.headers["etag"] == first.headers["etag"]
+    assert mms_handler.calls == calls
+
+
+def test_fallback_content_reports_the_language_served(client, make_client, mms_handler, monkeypatch):
+    """English served for a Norwegian request is labelled as English and not cached as immutable"""
+    from app.routes import api_routes
+
+    def handler(request):
+        if "/mms/nb/" in request.url.path or "/mms/no/" in request.url.path:
+            return httpx.Response(404)
+        return mms_handler(request)
+
+    monkeypatch.setattr(api_routes, "icd11_client", make_client(handler))
+
+    fallback = client.get("/api/mms/entity/3001?release=2025-01&language=nb")
+    assert fallback.status_code == 200
+    assert fallback.json()["language"] == "nb"
+    assert fallback.json()["language_used"] == "en"
+    assert fallback.headers["content-language"] == "en"
+    assert "immutable" not in fallback.headers.get("cache-control", "")
+    assert "etag" not in fallback.headers
+
+    english = client.get("/api/mms/entity/3001?release=2025-01&language=en")
+    assert english.json()["language_used"] == "en"
+    assert english.headers["content-language"] == "en"
+    assert "immutable" in english.headers["cache-control"]
+
+
+def test_hierarchy_reports_mixed_languages(client, make_client, monkeypatch):
+    """Children that fell back to English are visible in language_used and Content-Language"""
+    from app.routes import api_routes
+
+    def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        entity_id = request.url.path.rsplit("/", 1)[-1]
+        language = request.headers["Accept-Language"]
+        if entity_id == "3" and language != "en":
+            return httpx.Response(404)
+        children = ["http://id.who.int/icd/entity/2", "http://id.who.int/icd/entity/3"] if entity_id == "1" else []
+        return httpx.Response(200, json={"title": {"@language": language, "@value": f"Entity {entity_id}"}, "child": children})
+
+    monkeypatch.setattr(api_routes, "icd11_client", make_client(handler))
+    details = client.get("/api/entity/1/details?language=nb")
+    assert details.json()["language_used"] == "nb"
+    assert details.headers["content-language"] == "nb"
+
+    response = client.get("/api/entity/1/hierarchy?language=nb")
+    assert response.status_code == 200
+    assert response.json()["language_used"] == "en, nb"
+    assert response.headers["content-language"] == "en, nb"
+
+
+def test_batch_lookup_does_not_fall_back_to_another_language(client, make_client, mms_handler, monkeypatch):
+    """Batch results are labelled with the requested language, so a missing translation is not found"""
+    from app.routes import api_routes
+
+    def handler(request):
+        if "/mms/nb/" in request.url.path or "/mms/no/" in request.url.path:
+            return httpx.Response(404)
+        return mms_handler(request)
+
+    monkeypatch.setattr(api_routes, "icd11_client", make_client(handler))
+    item = "http://id.who.int/icd/release/11/2025-01/mms/3001"
+    norwegian = client.post("/api/batch/lookup", json={"items": [item], "language": "nb"}).json()
+    assert norwegian["found"] == 0
+    english = client.post("/api/batch/lookup", json={"items": [item], "language": "en"}).json()
+    assert english["found"] == 1
+
+
+def test_export_streams_depth_first_and_resumes(client, make_client, mms_handler, monkeypatch):
+    """Export walks the release depth-first and resumes after a cursor"""
+    import io
+    import pandas as pd
+    from app.routes import api_routes
+
+    monkeypatch.setattr(api_routes, "icd11_client", make_client(mms_handler))
+
+    rows = [json.loads(line) for line in client.get("/api/mms/export?concurrency=2").text.splitlines()]
+    assert [row["id"] for row in rows] == ["1001", "2001", "3001", "3002", "3003", "4001", "1002", "3101", "3102"]
+    diabetes = next(row for row in rows if row["code"] == "5A13.4")
+    assert diabetes["parent_code"] == "5A13"
+    assert diabetes["chapter"] == "05" and diabetes["depth"] == 4 and diabetes["leaf"]
+    assert rows[1]["parent_code"] == "05" and not rows[1]["leaf"]
+
+    cursor = rows[4]["cursor"]
+    resumed = [json.loads(line) for line in client.get(f"/api/mms/export?cursor={cursor}").text.splitlines()]
+    assert [row["id"] for row in resumed] == ["4001", "1002", "3101", "3102"]
+
+    csv_text = client.get("/api/mms/export?format=csv").text
+    assert csv_text.splitlines()[0].startswith("cursor,id,code")
+    assert len(csv_text.splitlines()) == 10
+
+    parquet = client.get("/api/mms/export?format=parquet")
+    frame = pd.read_parquet(io.BytesIO(parquet.content))
+    assert list(frame["id"]) == [row["id"] for row in rows]
+
+
+def test_export_failures_are_mapped_or_reported_with_a_resume_cursor(client, make_client, mms_handler, monkeypatch):
+    """A failing root is an HTTP error; a failure mid-walk ends the stream with an error record"""
+    from app.routes import api_routes
+
+    monkeypatch.setattr(api_routes, "icd11_client", make_client(mms_handler))
+
+    mms_handler.fail = {"root"}
+    assert client.get("/api/mms/export").status_code == 404
+
+    mms_handler.fail = {"3003"}
+    lines = [json.loads(line) for line in client.get("/api/mms/export?concurrency=1").text.splitlines()]
+    assert [row["id"] for row in lines[:-1]] == ["1001", "2001", "3001", "3002"]
+    assert lines[-1] == {"error": 404, "detail": "Not found in the ICD-11 API", "resume_cursor": lines[-2]["cursor"]}
+
+    csv_lines = client.get("/api/mms/export?format=csv&concurrency=1").text.splitlines()
+    assert len(csv_lines) == 6
+    assert csv_lines[-1].startswith("# export failed: ")
+    assert json.loads(csv_lines[-1][len("# export failed: "):])["resume_cursor"] == lines[-2]["cursor"]
+
+    mms_handler.fail = set()
+    resumed = [json.loads(line) for line in client.get(f"/api/mms/export?cursor={lines[-1]['resume_cursor']}").text.splitlines()]
+    assert [row["id"] for row in resumed] == ["3003", "4001", "1002", "3101", "3102"]
+
+
+def test_metrics_and_server_timing(client, make_client, mms_handler, monkeypatch):
+    """Responses carry Server-Timing phases; /metrics exposes route, upstream and cache series"""
+    from app.metrics import http_metrics
+    from app.routes import api_routes
+
+    monkeypatch.setattr(api_routes, "icd11_client", make_client(mms_handler))
+    route = "/api/mms/entity/{entity_id}"
+    served = http_metrics.latency.count("GET", route)
+
+    response = client.get("/api/mms/entity/3002?release=2025-01")
+    timing = response.headers["server-timing"]
+    for phase in ("cache;dur=", "auth;dur=", "upstream;dur=", "serialize;dur=", "total;dur="):
+        assert phase in timing
+    assert client.get("/api/mms/entity/9999?release=2025-01").status_code == 404
+
+    metrics = client.get("/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = metrics.text
+    assert http_metrics.latency.count("GET", route) == served + 2
+    assert f'icd11_http_responses_total{{method="GET",route="{route}",status="404"}}' in body
+    assert 'icd11_upstream_requests_total{endpoint="mms",outcome="ok"} 1' in body
+    assert 'icd11_upstream_requests_total{endpoint="mms",outcome="4xx"} 1' in body
+    assert 'icd11_upstream_request_duration_seconds_bucket{endpoint="mms",le="+Inf"} 2' in body
+    assert 'icd11_token_fetches_total 1' in body
+    assert 'icd11_cache_hit_ratio{tier="memory"}' in body
@@ -0,0 +1,60 @@
+"""
+Test cases for the fake WHO API and the load-test harness
+"""
+
+import os
+
+import pytest
+
+from app.api.code_index import MMS_CODE_PATTERN
+from benchmarks import load
+from benchmarks.fake_who import FakeWHO
+
+
+def test_fake_tree_is_mms_shaped():
+    fake = FakeWHO(entities=2000)
+    assert 1800 <= len(fake.nodes) <= 2200
+    code, node = next(iter(fake.by_code.items()))
+    assert fake.nodes[node.parent].class_kind == "block"
+    assert code[0].isdigit() and code[1].isalpha()
+    # Chapters from 10 on use letter prefixes, as in the real MMS (BA00 is in chapter 11)
+    assert all(MMS_CODE_PATTERN.match(code) for code in fake.by_code)
+    assert {fake._chapter(node) for code, node in fake.by_code.items() if code.startswith("BA")} == {"11"}
+
+
+@pytest.mark.asyncio
+async def test_load_harness_reports_every_scenario(monkeypatch):
+    """A tiny run drives all routes through the fake API and reports latency and upstream calls"""
+    from app.routes import api_routes
+
+    # The harness repoints the environment and the shared client; restore both afterwards
+    monkeypatch.setattr(os, "environ", dict(os.environ))
+    monkeypatch.setattr(api_routes, "icd11_client", None)
+
+    results = await load.run(load.parse_args(["--requests", "20", "--concurrency", "4", "--latency", "0", "--jitter", "0", "--entities", "300"]))
+    assert set(results["scenarios"]) == {"search_enhanced", "entity_hierarchy", "mms_search"}
+    for scenario in results["scenarios"].values():
+        assert scenario["statuses"] == {"200": 20}
+        assert scenario["latency_ms"]["p50"] <= scenario["latency_ms"]["p99"]
+        assert scenario["upstream_calls_per_request"] > 0
+    assert results["scenarios"]["entity_hierarchy"]["upstream_calls"]["entity"] > 20
+
+
+@pytest.mark.asyncio
+async def test_throttle_scenario_passes_retry_after_to_the_fake(monkeypatch):
+    """Retry-After above the client's limit is surfaced at once; a zero Retry-After is retried"""
+    from app.routes import api_routes
+
+    monkeypatch.setattr(os, "environ", dict(os.environ))
+    monkeypatch.setattr(api_routes, "icd11_client", None)
+
+    calls = {}
+    for retry_after in ("60", "0"):
+        results = await load.run(load.parse_args([
+            "--requests", "4", "--concurrency", "2", "--latency", "0", "--jitter", "0", "--entities", "300",
+            "--throttle-rate", "1", "--retry-after", retry_after, "--scenario", "mms_search",
+        ]))
+        assert results["config"]["retry_after"] == int(retry_after)
+        calls[retry_after] = sum(results["scenarios"]["mms_search"]["upstream_calls"].values())
+    assert calls["60"] == 4
+    assert calls["0"] > calls["60"]
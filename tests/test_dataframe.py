@@ -0,0 +1,99 @@
+"""
+Test cases for the pandas `.icd11` accessor
+"""
+
+import httpx
+import pandas as pd
+import pytest
+
+import app.api.dataframe  # noqa: F401 (registers the accessor)
+from app.api.local_store import LocalStore
+from app.ingest import ingest_release
+
+CODES = pd.Series(
+    [" 5a10", "5A13.4", None, "http://id.who.int/icd/release/11/2025-01/mms/3101", "9Z99", "not a code", "5a10"],
+    index=list("abcdefg"),
+    name="code",
+)
+
+
+def test_normalize_classify_and_validate_without_lookups():
+    assert CODES.icd11.normalize().tolist()[:2] == ["5A10", "5A13.4"]
+    assert CODES.icd11.kind().fillna("-").tolist() == ["mms", "mms", "-", "uri", "mms", "-", "mms"]
+    assert CODES.icd11.validate().tolist() == [True, True, False, True, True, False, True]
+    assert CODES.icd11.chapter().tolist()[:2] == ["05", "05"]
+    letters = pd.Series(["BA00", "ca23.0", "6A0Z", "SA00", "VA00", "junk", ""])
+    assert letters.icd11.chapter().fillna("-").tolist() == ["11", "12", "06", "26", "V", "-", "-"]
+    assert list(CODES.icd11.validate().index) == list("abcdefg")
+
+
+@pytest.mark.asyncio
+async def test_lookup_joins_the_local_code_table(make_client, mms_handler, tmp_path):
+    """An ingested release answers every row without upstream calls"""
+    store = LocalStore(str(tmp_path / "mms.sqlite"))
+    client = make_client(mms_handler, local_store=store)
+    await ingest_release(client, store, progress_every=0)
+    mms_handler.calls = 0
+
+    result = await CODES.icd11.alookup(client=client)
+    assert result.loc[["a", "b", "d", "g"], "code"].tolist() == ["5A10", "5A13.4", "6A05", "5A10"]
+    assert result.loc[["a", "d"], "chapter"].tolist() == ["05", "06"]
+    assert result["found"].fillna(False).tolist() == [True, True, False, True, False, False, True]
+    assert mms_handler.calls == 0
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_lookup_fetches_each_distinct_code_once(make_client, mms_handler):
+    """Without an ingested release, duplicates share one upstream lookup"""
+    seen = []
+
+    async def search_by_code(code, release="2025-01", language="en", search_type="mms", fallback=True):
+        seen.append(code)
+        entity = {"5A10": ("3001", "Type 1 diabetes mellitus")}.get(code)
+        entities = [{"id": f"http://id.who.int/icd/release/11/2025-01/mms/{entity[0]}", "theCode": code, "title": entity[1]}] if entity else []
+        return {"destinationEntities": entities}
+
+    client = make_client(mms_handler)
+    client.search_by_code = search_by_code
+    series = pd.Series(["5a10", "5A10 ", "9Z99", "5A10", "junk"] * 100)
+    result = await series.icd11.alookup(client=client)
+    assert sorted(seen) == ["5A10", "9Z99"]
+    assert result["found"].sum() == 300
+    assert result.loc[0, "title"] == "Type 1 diabetes mellitus"
+    assert result.loc[0, "chapter"] == "05"
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_lookup_with_nothing_found(make_client, mms_handler):
+    """Rows that resolve to nothing get found=False and no chapter"""
+    async def search_by_code(code, release="2025-01", language="en", search_type="mms", fallback=True):
+        return {"destinationEntities": []}
+
+    client = make_client(mms_handler)
+    client.search_by_code = search_by_code
+    result = await pd.Series(["9Z99", None, "junk"]).icd11.alookup(client=client)
+    assert result["found"].dtype == bool
+    assert result["found"].tolist() == [False, False, False]
+    assert result["chapter"].isna().all()
+    await client.close()
+
+
+def test_sync_lookup_can_be_called_repeatedly(make_client, mms_handler, monkeypatch):
+    """Each sync call runs on a new event loop, with a client of its own that is closed with it"""
+    http_clients = []
+
+    def build_http_client():
+        http_clients.append(httpx.AsyncClient(transport=httpx.MockTransport(mms_handler)))
+        return http_clients[-1]
+
+    monkeypatch.setattr("app.api.icd11_client.build_http_client", build_http_client)
+    series = pd.Series(["http://id.who.int/icd/release/11/2025-01/mms/3001"])
+    for _ in range(2):
+        result = series.icd11.lookup()
+        assert result["found"].tolist() == [True]
+        assert result.loc[0, "title"] == "Type 1 diabetes mellitus"
+    # Pooled connections are bound to the loop they were opened on, so none may be reused
+    assert len(http_clients) == 2
+    assert all(http_client.is_closed for http_client in http_clients)
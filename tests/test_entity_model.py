@@ -0,0 +1,31 @@
+"""
+Test cases for the compact entity representation
+"""
+
+from app.api.entity_model import EntityTable, PackedDocument, split_uri
+
+
+def test_entity_table_round_trips_uris():
+    """Integer ids, residual suffixes and opaque URIs all rebuild exactly"""
+    table = EntityTable()
+    uris = [
+        "http://id.who.int/icd/release/11/2025-01/mms/1697306310",
+        "http://id.who.int/icd/release/11/2025-01/mms/1697306310/other",
+        "http://id.who.int/icd/release/11/2025-01/mms",
+    ]
+    rows = [table.add(uri, "5A10", "Type 1 diabetes mellitus", "05") for uri in uris]
+    assert [table.uri(row) for row in rows] == uris
+    assert split_uri(uris[1])[1:] == (1697306310, "other")
+    assert table.record(rows[0]) == {"id": uris[0], "title": "Type 1 diabetes mellitus", "theCode": "5A10", "chapter": "05"}
+    # Identical text is stored once
+    assert table.titles[0] is table.titles[1]
+
+
+def test_packed_documents_decode_private_copies():
+    """Packed documents compress large bodies and decode a fresh copy per read"""
+    document = {"@id": "x", "definition": {"@language": "en", "@value": "word " * 200}}
+    packed = PackedDocument.pack(document)
+    assert packed.compressed and len(packed.data) < 200
+    first = packed.unpack()
+    first["definition"] = None
+    assert packed.unpack() == document
@@ -0,0 +1,81 @@
+"""
+Test cases for the in-memory hierarchy graph
+"""
+
+import pytest
+
+from app.api.hierarchy_graph import HierarchyGraph, UnknownEntity
+from app.api.local_store import LocalStore
+from app.ingest import ingest_release
+
+
+def test_polyhierarchy_intervals():
+    """Nodes with several parents are found under each of them"""
+    graph = HierarchyGraph.build([
+        ("root", None, "Root", ["a", "b"]),
+        ("a", "A", "A", ["shared", "a1"]),
+        ("b", "B", "B", ["shared"]),
+        ("shared", "S", "Shared", ["leaf"]),
+        ("a1", "A1", "A1", []),
+        ("leaf", "L", "Leaf", []),
+    ])
+    node = graph.node
+    assert graph.is_descendant(node("leaf"), node("a"))
+    assert graph.is_descendant(node("leaf"), node("b"))
+    assert not graph.is_descendant(node("a1"), node("b"))
+    assert [graph.ids[n] for n in graph.descendants(node("root"))] == ["a", "shared", "leaf", "a1", "b"]
+    assert {graph.ids[n] for n in graph.ancestors(node("leaf"))} == {"shared", "a", "b", "root"}
+    assert [graph.ids[n] for n in graph.lca(node("leaf"), node("a1"))] == ["a"]
+    assert [graph.ids[n] for n in graph.lca(node("shared"), node("leaf"))] == ["shared"]
+    with pytest.raises(UnknownEntity):
+        node("missing")
+
+
+def test_shared_subtrees_are_placed_once():
+    """A ladder of diamonds has 2^40 root-to-leaf paths but is numbered in linear space"""
+    layers = 40
+    nodes = [("root", None, "Root", ["0a", "0b"])]
+    for layer in range(layers):
+        below = [f"{layer + 1}a", f"{layer + 1}b"] if layer + 1 < layers else []
+        nodes += [(f"{layer}a", None, None, below), (f"{layer}b", None, None, below)]
+    graph = HierarchyGraph.build(nodes)
+    node = graph.node
+    assert len(graph._order) == len(graph) == 2 * layers + 1
+    assert graph.is_descendant(node(f"{layers - 1}b"), node("0a"))
+    assert graph.is_descendant(node(f"{layers - 1}a"), node("0b"))
+    assert not graph.is_descendant(node("0b"), node("1a"))
+    assert graph.descendant_count(node("0b")) == 2 * (layers - 1)
+    assert graph.descendant_count(node("root")) == 2 * layers
+
+
+def test_cycles_are_walked_once():
+    graph = HierarchyGraph.build([
+        ("x", None, "X", ["y"]),
+        ("y", None, "Y", ["z"]),
+        ("z", None, "Z", ["x"]),
+    ])
+    node = graph.node
+    assert graph.roots == []
+    assert {graph.ids[n] for n in graph.descendants(node("y"))} == {"z", "x"}
+    assert graph.is_descendant(node("y"), node("z"))
+
+
+@pytest.mark.asyncio
+async def test_release_graph_queries(make_client, mms_handler, tmp_path):
+    """Ancestor, descendant and LCA queries are answered from the ingested release"""
+    store = LocalStore(str(tmp_path / "mms.sqlite"))
+    client = make_client(mms_handler, local_store=store)
+    await ingest_release(client, store, concurrency=4, progress_every=0)
+    mms_handler.calls = 0
+
+    ancestors = await client.get_ancestors("4001")
+    assert [a["code"] for a in ancestors] == ["5A13", "5A10-5A14", "05"]
+
+    chapter = await client.get_descendants("1001", limit=2)
+    assert chapter["total"] == 5
+    assert [d["code"] for d in chapter["descendants"]] == ["5A10-5A14", "5A10"]
+
+    lca = await client.get_lca("4001", "3002")
+    assert [e["id"] for e in lca] == ["2001"]
+    assert mms_handler.calls == 0
+    await client.close()
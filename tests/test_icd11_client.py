@@ -0,0 +1,337 @@
+"""
+Test cases for the ICD-11 API client
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.api.cache import DiskCache, LRUCache, TieredCache, make_key
+from app.api.ratelimit import UpstreamOverloaded
+
+
+@pytest.mark.asyncio
+async def test_concurrent_cold_start_fetches_one_token(make_client):
+    """Concurrent first requests share a single token acquisition"""
+    calls = {"token": 0}
+
+    async def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            calls["token"] += 1
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"access_token": "t1", "expires_in": 3600})
+        return httpx.Response(200, json={"destinationEntities": []})
+
+    client = make_client(handler)
+    await asyncio.gather(*(client.search_mms("diabetes") for _ in range(10)))
+    assert calls["token"] == 1
+    assert client.tokens.expires_in > 3500
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_retries_once_on_401(make_client):
+    """A 401 triggers one token refresh and a retry"""
+    tokens = iter(["stale", "fresh"])
+
+    def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": next(tokens), "expires_in": 3600})
+        if request.headers["Authorization"] == "Bearer stale":
+            return httpx.Response(401)
+        return httpx.Response(200, json={"theCode": "5A10"})
+
+    client = make_client(handler)
+    result = await client.get_mms_entity("1697306310")
+    assert result["theCode"] == "5A10"
+    assert client.access_token == "fresh"
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_release_lookups_are_cached(make_client):
+    """Repeated release-pinned lookups are served from the cache"""
+    calls = {"entity": 0}
+
+    def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        calls["entity"] += 1
+        return httpx.Response(200, json={"theCode": "5A10"})
+
+    client = make_client(handler)
+    for _ in range(5):
+        assert (await client.get_mms_entity("1697306310"))["theCode"] == "5A10"
+    assert calls["entity"] == 1
+    stats = client.cache_stats()["memory"]
+    assert stats["hits"] == 4 and stats["misses"] == 1
+    await client.close()
+
+
+def test_lru_eviction_and_disk_promotion(tmp_path):
+    """LRU evicts the oldest entry and the disk tier refills memory"""
+    cache = TieredCache(LRUCache(max_entries=2), DiskCache(str(tmp_path / "cache.sqlite")))
+    for key in ("a", "b", "c"):
+        cache.set(key, {"key": key})
+    assert cache.memory.stats.evictions == 1
+    assert cache.get("a") == {"key": "a"}
+    assert cache.disk.stats.hits == 1
+    cache.set("expired", {"x": 1}, ttl=-1)
+    assert cache.get("expired") is None
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_hierarchy_fans_out_and_reports_errors(make_client, monkeypatch):
+    """Children are fetched concurrently in the requested language; failures are reported"""
+    in_flight = {"now": 0, "peak": 0}
+    languages = set()
+    monkeypatch.setenv("ICD11_FANOUT_LIMIT", "4")
+
+    async def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        entity_id = request.url.path.split("/")[-1]
+        if entity_id == "root":
+            children = [f"http://id.who.int/icd/entity/{i}" for i in range(10)]
+            return httpx.Response(200, json={"@id": "root", "parent": [], "child": children})
+        languages.add(request.headers["Accept-Language"])
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        if entity_id == "3":
+            return httpx.Response(404)
+        return httpx.Response(200, json={"@id": entity_id})
+
+    client = make_client(handler)
+    hierarchy = await client.get_entity_hierarchy("root", language="fr")
+    assert [c["@id"] for c in hierarchy["children"]] == [str(i) for i in range(10) if i != 3]
+    assert hierarchy["errors"][0]["id"].endswith("/3")
+    assert in_flight["peak"] == 4
+    assert languages == {"fr"}
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_code_search_resolves_through_codeinfo(make_client):
+    """A code missing from the exact search is resolved via codeinfo, not text guesses"""
+    requested = []
+
+    def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        requested.append(request.url.path)
+        if request.url.path.endswith("/mms/search"):
+            return httpx.Response(200, json={"destinationEntities": [{"theCode": "6A05.0"}]})
+        if "/codeinfo/" in request.url.path:
+            return httpx.Response(200, json={"code": "6A05", "stemId": "http://id.who.int/icd/release/11/2025-01/mms/821852937"})
+        return httpx.Response(200, json={"code": "6A05", "title": {"@language": "en", "@value": "Attention deficit hyperactivity disorder"}})
+
+    client = make_client(handler)
+    result = await client.search_by_code("6A05")
+    assert [e["theCode"] for e in result["destinationEntities"]] == ["6A05", "6A05.0"]
+    assert len(requested) == 3
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_requests_are_coalesced(make_client):
+    """A burst of identical lookups costs one upstream call, even uncached"""
+    calls = {"search": 0}
+
+    async def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        calls["search"] += 1
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"destinationEntities": [{"theCode": "5A10"}]})
+
+    client = make_client(handler)
+    client.cache = None
+    results = await asyncio.gather(*(client.search_mms("5A10", language="en") for _ in range(20)))
+    assert calls["search"] == 1
+    assert all(r["destinationEntities"][0]["theCode"] == "5A10" for r in results)
+    await client.search_mms("5A10", language="fr")
+    assert calls["search"] == 2
+    assert client.inflight.stats()["shared"] == 19
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_retries_throttling_and_honors_retry_after(make_client, monkeypatch):
+    """429/503 responses are retried, waiting for Retry-After when given"""
+    responses = iter([
+        httpx.Response(429, headers={"Retry-After": "0"}),
+        httpx.Response(503),
+        httpx.Response(200, json={"theCode": "5A10"}),
+    ])
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        return next(responses)
+
+    monkeypatch.setattr("app.api.transport.asyncio.sleep", fake_sleep)
+    client = make_client(handler)
+    assert (await client.get_mms_entity("1697306310"))["theCode"] == "5A10"
+    assert sleeps[0] == 0.0 and len(sleeps) == 2
+    assert client.retry.retries == 2
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_holds_throughput_without_429(make_client, monkeypatch):
+    """Client-side budgets keep a rate-limited stand-in from ever throttling"""
+    monkeypatch.setenv("ICD11_ENTITY_RATE", "100")
+    monkeypatch.setenv("ICD11_ENTITY_BURST", "5")
+    server = {"tokens": 5.0, "at": None, "throttled": 0, "served": 0}
+    loop = asyncio.get_running_loop()
+
+    def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        # Stand-in WHO limiter with the same budget (10% timing tolerance)
+        now = loop.time()
+        if server["at"] is not None:
+            server["tokens"] = min(5.0, server["tokens"] + (now - server["at"]) * 110)
+        server["at"] = now
+        if server["tokens"] < 1:
+            server["throttled"] += 1
+            return httpx.Response(429)
+        server["tokens"] -= 1
+        server["served"] += 1
+        return httpx.Response(200, json={"code": request.url.path.split("/")[-1]})
+
+    client = make_client(handler)
+    started = loop.time()
+    await asyncio.gather(*(client.get_mms_entity(str(i)) for i in range(40)))
+    elapsed = loop.time() - started
+    assert server["throttled"] == 0 and server["served"] == 40
+    assert elapsed >= (40 - 5) / 100 * 0.9
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_sheds_load(make_client, monkeypatch):
+    """Requests beyond the wait queue are rejected instead of piling up"""
+    monkeypatch.setenv("ICD11_ENTITY_MAX_IN_FLIGHT", "1")
+    monkeypatch.setenv("ICD11_ENTITY_MAX_QUEUE", "2")
+
+    async def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={})
+
+    client = make_client(handler)
+    await client.get_access_token()
+    outcomes = await asyncio.gather(
+        *(client.get_mms_entity(str(i)) for i in range(6)), return_exceptions=True
+    )
+    shed = [o for o in outcomes if isinstance(o, UpstreamOverloaded)]
+    assert len(shed) == 3
+    assert client.upstream_stats()["budgets"]["entity"]["rejected"] == 3
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_pipeline_stages_are_pluggable_and_timed(make_client):
+    """Custom stages slot in by name and every stage reports its timing"""
+    seen = []
+
+    def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        return httpx.Response(200, json={"theCode": "5A10", "lang": request.headers["Accept-Language"]})
+
+    async def tag(request, call_next):
+        seen.append(request.url)
+        return await call_next(request)
+
+    client = make_client(handler)
+    client.pipeline.insert("tag", tag, before="transport")
+    finished = []
+    client.pipeline.add_hook(lambda request: finished.append(dict(request.timings)))
+
+    result = await client.get_mms_entity("1697306310", language="es")
+    assert result["lang"] == "es"
+    assert len(seen) == 1
+    assert set(finished[0]) == set(client.pipeline.names)
+    assert client.upstream_stats()["pipeline"]["requests"] == 1
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_revalidated_with_validators(make_client):
+    """Stale cache entries are revalidated with If-None-Match and reused on 304"""
+    seen = []
+
+    def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        seen.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, json={"title": "Cholera"}, headers={"ETag": '"v1"'})
+
+    client = make_client(handler, cache=TieredCache(LRUCache()))
+    first = await client.get_entity_details("257068234")
+    # Age the entry past its TTL while keeping the stale copy
+    key = make_key(f"{client.base_url}/entity/257068234", "en")
+    client.cache.set(key, first, ttl=-1, validators={"etag": '"v1"'})
+    second = await client.get_entity_details("257068234")
+
+    assert second == first
+    assert seen == [None, '"v1"']
+    assert client.cache_stats()["revalidation"] == {"revalidations": 1, "not_modified": 1}
+    await client.close()
+
+
+@pytest.mark.parametrize("query", ["BA00", "6A0Z", "CA23.0", "5A13.4", "1A00.0", "5A1", "http://id.who.int/icd/entity/1435254666", "1697306310"])
+def test_code_detection_covers_all_chapters(make_client, query):
+    """Letter-led chapters (10 onward) and residual codes are detected as codes"""
+    assert make_client(lambda request: httpx.Response(404))._is_icd_code(query)
+
+
+@pytest.mark.parametrize("query", ["diabetes", "BA", "B100", "5A10.", "1234"])
+def test_text_is_not_mistaken_for_a_code(make_client, query):
+    assert not make_client(lambda request: httpx.Response(404))._is_icd_code(query)
+
+
+@pytest.mark.asyncio
+async def test_letter_chapter_code_takes_the_code_search_path(make_client):
+    """`BA00` goes through the code search, not text search"""
+    def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        return httpx.Response(200, json={"destinationEntities": [{"theCode": "BA00", "title": "Essential hypertension"}]})
+
+    client = make_client(handler)
+    result = await client.enhanced_search("BA00")
+    assert result["query_type"] == "code"
+    assert [e["theCode"] for e in result["results"]["destinationEntities"]] == ["BA00"]
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_foundation_entities_honour_release_and_language(make_client):
+    seen = {}
+
+    def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        seen["path"] = request.url.path
+        seen["release"] = request.url.params.get("releaseId")
+        seen["language"] = request.headers.get("Accept-Language")
+        return httpx.Response(200, json={"child": []})
+
+    client = make_client(handler)
+    await client.get_foundation_entities(release="2024-01", language="fr")
+    assert seen == {"path": "/icd/entity", "release": "2024-01", "language": "fr"}
+    await client.close()
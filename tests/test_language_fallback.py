@@ -0,0 +1,107 @@
+"""
+Test cases for hedged multilingual fallback
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.api.language_fallback import LanguageFallback, endpoint_scope, record_languages, served_language
+
+
+def test_fallback_chains_and_scopes():
+    fallback = LanguageFallback()
+    assert fallback.chain("nb") == ["nb", "no", "en"]
+    assert fallback.chain("en") == ["en"]
+    assert endpoint_scope("release/11/2025-01/mms/{language}/123") == ("2025-01", "mms")
+    assert endpoint_scope("release/11/2025-01/mms/search") == ("2025-01", "mms/search")
+    assert endpoint_scope("entity/123") == ("foundation", "entity")
+
+
+@pytest.mark.asyncio
+async def test_norwegian_search_falls_back_and_remembers(make_client):
+    """English is only requested once Norwegian fails; a missing language is skipped afterwards"""
+    state = {"active": 0, "peak": 0, "languages": []}
+
+    async def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        language = request.headers["Accept-Language"]
+        state["languages"].append(language)
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.02)
+        state["active"] -= 1
+        if language == "no":
+            return httpx.Response(404)
+        return httpx.Response(200, json={"destinationEntities": [{"title": "Diabetes"}]})
+
+    client = make_client(handler)
+    first = await client.search_with_fallback("diabetes", "no")
+    assert first["language_used"] == "en" and first["fallback_used"] is True
+    assert state["languages"] == ["no", "en"]
+    assert state["peak"] == 1
+
+    state["languages"].clear()
+    second = await client.search_with_fallback("insulin", "no")
+    assert second["language_used"] == "en"
+    assert state["languages"] == ["en"]
+    assert client.language_fallback.stats()["skipped_unavailable"] == 1
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_preferred_language_wins_for_mms_entities(make_client, mms_handler):
+    """A successful preferred language is used, and the language in the URL path is filled per attempt"""
+    client = make_client(mms_handler)
+    document = await client.get_mms_entity("3001", "2025-01", "no")
+    assert document["title"]["@language"] == "no"
+    assert client.language_fallback.stats()["unavailable"] == 0
+
+    # English only needs one request
+    english = await client.get_mms_entity("3002", "2025-01", "en")
+    assert english["title"]["@language"] == "en"
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_a_slow_language_is_hedged_after_the_delay(make_client, monkeypatch):
+    """The fallback starts when the preferred language has not answered within the hedge delay"""
+    monkeypatch.setenv("ICD11_LANGUAGE_HEDGE_DELAY", "0.05")
+    state = {"active": 0, "peak": 0}
+
+    async def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        language = request.headers["Accept-Language"]
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.2 if language == "no" else 0.01)
+        state["active"] -= 1
+        if language == "no":
+            return httpx.Response(404)
+        return httpx.Response(200, json={"destinationEntities": []})
+
+    client = make_client(handler)
+    result = await client.search_with_fallback("diabetes", "no")
+    assert result["language_used"] == "en"
+    assert state["peak"] == 2
+    assert client.language_fallback.stats()["hedged"] == 1
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_record_languages_collects_fallbacks_of_concurrent_fetches(make_client, mms_handler):
+    def handler(request):
+        if "/mms/no/3002" in request.url.path:
+            return httpx.Response(404)
+        return mms_handler(request)
+
+    client = make_client(handler)
+    with record_languages() as served:
+        await asyncio.gather(client.get_mms_entity("3001", language="no"), client.get_mms_entity("3002", language="no"))
+    assert served == {"no", "en"}
+    assert served_language("no", served) == "en, no"
+    assert served_language("no", set()) == "no"
+    await client.close()
@@ -0,0 +1,154 @@
+"""
+Test cases for the offline MMS store and release ingest
+"""
+
+import asyncio
+import copy
+
+import httpx
+import pytest
+from conftest import MMS_TREE
+
+from app.api.cache import DiskCache, LRUCache, TieredCache
+from app.api.local_store import LocalReleaseUnavailable, LocalStore
+from app.ingest import LanguageMismatch, ingest_release
+
+
+@pytest.mark.asyncio
+async def test_ingest_is_resumable_and_serves_offline(make_client, mms_handler, tmp_path):
+    """An interrupted ingest resumes, then lookups are answered from the store"""
+    store = LocalStore(str(tmp_path / "mms.sqlite"))
+    client = make_client(mms_handler, local_store=store)
+
+    mms_handler.fail = {"3003"}
+    first = await ingest_release(client, store, concurrency=4, progress_every=0)
+    assert not first["complete"]
+    assert first["remaining"] == 1
+
+    mms_handler.fail = set()
+    mms_handler.calls = 0
+    second = await ingest_release(client, store, concurrency=4, progress_every=0)
+    assert second["complete"]
+    # Only the failed entity and its child still had to be fetched
+    assert mms_handler.calls == 2
+    assert second["entity_count"] == 10
+
+    mms_handler.calls = 0
+    entity = await client.get_mms_entity("3001")
+    assert entity["code"] == "5A10"
+    by_code = await client.search_by_code("5A13.4")
+    assert [e["theCode"] for e in by_code["destinationEntities"]] == ["5A13.4"]
+    assert by_code["destinationEntities"][0]["chapter"] == "05"
+    by_prefix = await client.search_by_code("5A1")
+    assert [e["theCode"] for e in by_prefix["destinationEntities"]] == ["5A10", "5A10-5A14", "5A11", "5A13", "5A13.4"]
+    search = await client.search_mms("juvenile diabetes")
+    assert [e["theCode"] for e in search["destinationEntities"]] == ["5A10"]
+    assert mms_handler.calls == 0
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_ingest_never_stores_fallback_language_content(make_client, mms_handler, tmp_path):
+    """A missing translation leaves the release incomplete instead of storing English as Norwegian"""
+    def handler(request):
+        if "/mms/nb/" in request.url.path:
+            return httpx.Response(404)
+        return mms_handler(request)
+
+    store = LocalStore(str(tmp_path / "mms.sqlite"))
+    client = make_client(handler, local_store=store)
+    result = await ingest_release(client, store, language="nb", concurrency=4, progress_every=0)
+    assert not result["complete"]
+    assert result["fetched"] == 0
+    assert not store.is_complete("2025-01", "nb")
+
+    # English content under the requested language's URL is rejected too
+    def mislabelled(request):
+        return mms_handler(httpx.Request(request.method, str(request.url).replace("/mms/nb", "/mms/en")))
+
+    client = make_client(mislabelled, local_store=LocalStore(str(tmp_path / "other.sqlite")))
+    with pytest.raises(LanguageMismatch):
+        await ingest_release(client, client.local_store, language="nb", progress_every=0)
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_ingest_bypasses_the_response_cache(make_client, mms_handler, tmp_path):
+    """Ingested entities live in the store only, leaving the cache's working set alone"""
+    store = LocalStore(str(tmp_path / "mms.sqlite"))
+    cache = TieredCache(LRUCache(), DiskCache(str(tmp_path / "responses.sqlite")))
+    client = make_client(mms_handler, local_store=store, cache=cache)
+    result = await ingest_release(client, store, concurrency=4, progress_every=0)
+    assert result["complete"]
+    assert len(cache.memory) == 0
+    assert cache.stats()["disk"]["sets"] == 0
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_local_engine_requires_ingested_release(make_client, mms_handler):
+    """engine=local fails fast instead of silently calling upstream"""
+    client = make_client(mms_handler)
+    with pytest.raises(LocalReleaseUnavailable):
+        await client.search_mms("diabetes", engine="local")
+    assert mms_handler.calls == 0
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_get_many_dedupes_and_reports_per_item(make_client, mms_handler, tmp_path):
+    """Batch lookups dedupe inputs and answer each position"""
+    store = LocalStore(str(tmp_path / "mms.sqlite"))
+    client = make_client(mms_handler, local_store=store)
+    await ingest_release(client, store, progress_every=0)
+
+    mms_handler.calls = 0
+    items = ["5A10", "5a10", "3101", "9Z99", "not a code", "http://id.who.int/icd/release/11/2025-01/mms/4001"]
+    results = await client.get_many(items, concurrency=2)
+    assert [r["input"] for r in results] == items
+    assert [r.get("code") for r in results] == ["5A10", "5A10", "6A05", None, None, "5A13.4"]
+    assert results[3]["found"] is False and "error" not in results[3]
+    assert results[4]["error"] == "ValueError"
+    assert mms_handler.calls == 0
+    await client.close()
+
+
+def next_release_tree():
+    """MMS_TREE with one entity of each change kind"""
+    tree = copy.deepcopy(MMS_TREE)
+    tree["3001"]["definition"] = "Type 1 diabetes mellitus is an autoimmune disorder."
+    tree["3002"]["title"] = "Type 2 diabetes mellitus, unspecified"
+    tree["4001"]["code"] = "5A13.5"
+    del tree["3101"]
+    tree["3103"] = {"code": "6A06", "title": "Tic disorders"}
+    # 3102 moves from chapter 06 to chapter 05
+    tree["1001"]["child"].append("3102")
+    tree["1002"]["child"] = ["3103"]
+    return tree
+
+
+def test_release_diff_classifies_changes(client, make_client, mms_handler, monkeypatch, tmp_path):
+    """Two ingested releases diff into change sets, computed once and served as immutable"""
+    from app.routes import api_routes
+
+    mms_handler.trees = {"2026-01": next_release_tree()}
+    store = LocalStore(str(tmp_path / "mms.sqlite"))
+    icd11 = make_client(mms_handler, local_store=store)
+    for release in ("2025-01", "2026-01"):
+        asyncio.run(ingest_release(icd11, store, release=release, progress_every=0))
+    monkeypatch.setattr(api_routes, "icd11_client", icd11)
+
+    response = client.get("/api/releases/diff?from=2025-01&to=2026-01")
+    assert response.status_code == 200
+    diff = response.json()
+    assert [e["code"] for e in diff["added"]] == ["6A06"]
+    assert [e["code"] for e in diff["removed"]] == ["6A05"]
+    assert diff["recoded"] == [{"id": "4001", "title": "Diabetes mellitus due to drug or chemical", "from": "5A13.4", "to": "5A13.5"}]
+    assert [(e["id"], e["to"]) for e in diff["renamed"]] == [("3002", "Type 2 diabetes mellitus, unspecified")]
+    assert diff["moved"] == [{"id": "3102", "code": "6A00", "from": ["1002"], "to": ["1001"]}]
+    assert [e["id"] for e in diff["redefined"]] == ["3001"]
+    assert diff["counts"]["changed"] == 4 and diff["counts"]["unchanged"] == 4
+
+    etag = response.headers["ETag"]
+    assert client.get("/api/releases/diff?from=2025-01&to=2026-01", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/releases/diff?from=2025-01&to=2024-01").status_code == 404
@@ -24,4 +24,11 @@ def test_docs_endpoint(client):
     response = client.get("/docs")
     assert response.status_code == 200
     assert "text/html" in response.headers["content-type"]
-    assert "API Documentation" in response.text
\ No newline at end of file
+    assert "API Documentation" in response.text
+
+def test_service_worker_served_from_root(client):
+    """The service worker is served at /sw.js so its scope covers the app"""
+    response = client.get("/sw.js")
+    assert response.status_code == 200
+    assert "javascript" in response.headers["content-type"]
+    assert response.headers["cache-control"] == "no-cache"
@@ -0,0 +1,26 @@
+"""
+Test cases for the in-process search index
+"""
+
+from app.api.search_index import SearchIndex, edit_distance, fold
+
+ENTITIES = [
+    {"id": "e1", "code": "5A10", "title": "Type 1 diabetes mellitus", "synonyms": ["Juvenile diabetes"], "chapter": "05"},
+    {"id": "e2", "code": "5A11", "title": "Type 2 diabetes mellitus", "synonyms": [], "chapter": "05"},
+    {"id": "e3", "code": "AB31.0", "title": "Ménière disease", "synonyms": [], "chapter": "10"},
+    {"id": "e4", "code": "6A05", "title": "Attention deficit hyperactivity disorder", "synonyms": ["ADHD"], "chapter": "06"},
+]
+
+
+def test_ranked_prefix_fuzzy_and_code_matching():
+    """Prefix, fuzzy, folded and exact-code queries all resolve"""
+    index = SearchIndex.build(ENTITIES)
+    assert fold("Ménière") == "meniere"
+    assert edit_distance("diabetse", "diabetes", 1) == 1
+
+    assert [r["id"] for r in index.search("type 1 diab")][0] == "e1"
+    assert [r["id"] for r in index.search("juvenile")] == ["e1"]
+    assert [r["id"] for r in index.search("meniere")] == ["e3"]
+    assert [r["id"] for r in index.search("hyperactivty")] == ["e4"]
+    assert index.search("5A11")[0]["theCode"] == "5A11"
+    assert index.search("") == []
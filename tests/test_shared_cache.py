@@ -0,0 +1,163 @@
+"""
+Test cases for the cache tiers shared between worker processes
+"""
+
+import asyncio
+import io
+import logging
+import socketserver
+import threading
+import time
+
+import httpx
+import pytest
+
+from app.api.cache import DiskCache, LRUCache, TieredCache
+from app.api.redis_cache import RedisCache, encode_command, read_reply
+
+
+class LocalRedis(socketserver.ThreadingTCPServer):
+    """Stand-in Redis server: GET, SET [PX], DEL and PING over RESP"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        self.data = {}
+        self.delay = 0.0
+        super().__init__(("127.0.0.1", 0), RespHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.server_address[1]}/0"
+
+    def execute(self, args):
+        time.sleep(self.delay)
+        name = args[0].decode().upper()
+        if name == "PING":
+            return b"+PONG\r\n"
+        key = args[1]
+        if name == "GET":
+            value, expires_at = self.data.get(key, (None, None))
+            if value is None or (expires_at is not None and expires_at <= time.monotonic()):
+                return b"$-1\r\n"
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        if name == "SET":
+            px = int(args[4]) if len(args) > 4 and args[3].upper() == b"PX" else None
+            self.data[key] = (args[2], time.monotonic() + px / 1000 if px is not None else None)
+            return b"+OK\r\n"
+        if name == "DEL":
+            return b":%d\r\n" % (self.data.pop(key, None) is not None)
+        return b"-ERR unknown command\r\n"
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                args = read_reply(self.rfile)
+            except ConnectionError:
+                return
+            self.wfile.write(self.server.execute(args))
+
+
+@pytest.fixture
+def local_redis():
+    server = LocalRedis()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def entity_handler(calls):
+    def handler(request):
+        if request.url.path.endswith("/connect/token"):
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"theCode": "5A10"})
+    return handler
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+async def test_a_fetch_by_one_worker_warms_the_others(make_client, local_redis, tmp_path, backend):
+    """Workers with their own memory tiers share one upstream fetch through the shared tier"""
+    def shared_tier():
+        if backend == "redis":
+            return RedisCache(local_redis.url)
+        return DiskCache(str(tmp_path / "responses.sqlite"))
+
+    calls = []
+    workers = [make_client(entity_handler(calls), cache=TieredCache(LRUCache(), shared_tier())) for _ in range(3)]
+    for worker in workers:
+        assert (await worker.get_mms_entity("1697306310"))["theCode"] == "5A10"
+    assert len(calls) == 1
+    assert workers[2].cache_stats()["disk"]["hits"] == 1
+    assert workers[2].cache_stats()["disk"]["backend"] == backend
+    for worker in workers:
+        await worker.close()
+
+
+def test_redis_tier_expiry_validators_and_outage(local_redis):
+    cache = RedisCache(local_redis.url, prefix="t:")
+    cache.set("fresh", {"a": 1}, ttl=60)
+    value, expires_at, validators = cache.get("fresh")
+    assert value == {"a": 1} and expires_at > time.time() and validators is None
+
+    # Revalidatable entries outlive their TTL as stale copies
+    cache.set("stale", {"b": 2}, ttl=-1, validators={"etag": '"v1"'})
+    assert cache.get("stale") is None
+    assert cache.get_stale("stale") == ({"b": 2}, {"etag": '"v1"'})
+    cache.set("gone", {"c": 3}, ttl=0.001)
+    time.sleep(0.01)
+    assert cache.get("gone") is None and cache.get_stale("gone") is None
+    assert cache.stats.expirations == 1
+
+    # A lost server degrades to misses instead of failing lookups
+    local_redis.shutdown()
+    local_redis.server_close()
+    cache.close()
+    assert cache.get("fresh") is None
+    cache.set("fresh", {"a": 2})
+    assert cache.errors == 1
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_a_slow_shared_tier_does_not_block_the_event_loop(local_redis):
+    """Redis round trips run off the loop, so other coroutines keep running meanwhile"""
+    cache = TieredCache(LRUCache(), RedisCache(local_redis.url))
+    local_redis.delay = 0.2
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    await asyncio.gather(cache.aset("k", {"a": 1}), ticker())
+    assert ticks == 10
+    cache.memory.delete("k")
+    ticks = 0
+    value, _ = await asyncio.gather(cache.aget("k"), ticker())
+    assert value == {"a": 1} and ticks == 10
+    cache.close()
+
+
+def test_redis_errors_are_logged_once_per_window(local_redis, caplog):
+    cache = RedisCache(local_redis.url, retry_after=60)
+    with caplog.at_level(logging.WARNING, logger="app.api.redis_cache"):
+        for _ in range(5):
+            cache._safe("NOSUCHCOMMAND", "k")
+    assert cache.errors == 5
+    assert len(caplog.records) == 1
+    assert "unknown command" in caplog.records[0].getMessage()
+    cache.close()
+
+
+def test_resp_encoding_round_trip():
+    assert encode_command("SET", "k", b"v") == b"*3\r\n$3\r\nSET\r\n$1\r\nk\r\n$1\r\nv\r\n"
+    assert read_reply(io.BytesIO(b"*2\r\n$1\r\nk\r\n:5\r\n")) == [b"k", 5]
+    assert read_reply(io.BytesIO(b"$-1\r\n")) is None
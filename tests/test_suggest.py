@@ -0,0 +1,83 @@
+"""
+Test cases for typeahead suggestions
+"""
+
+import asyncio
+
+import pytest
+
+from app.api.local_store import LocalStore
+from app.api.singleflight import SingleFlight
+from app.api.suggest import SuggestIndex
+from app.ingest import ingest_release
+
+ENTITIES = [
+    {"id": "http://id.who.int/icd/release/11/2025-01/mms/1", "code": "5A10", "title": "Type 1 diabetes mellitus",
+     "synonyms": ["Juvenile diabetes"], "chapter": "05"},
+    {"id": "http://id.who.int/icd/release/11/2025-01/mms/2", "code": "5A11", "title": "Type 2 diabetes mellitus",
+     "synonyms": [], "chapter": "05"},
+    {"id": "http://id.who.int/icd/release/11/2025-01/mms/3", "code": "6A05", "title": "Attention deficit hyperactivity disorder",
+     "synonyms": ["ADHD"], "chapter": "06"},
+    {"id": "http://id.who.int/icd/release/11/2025-01/mms/4", "code": "5A13.4", "title": "Diabetes mellitus due to drug or chemical",
+     "synonyms": [], "chapter": "05"},
+]
+
+
+def test_prefix_suggestions_rank_codes_titles_and_synonyms():
+    index = SuggestIndex.build(ENTITIES)
+    # A title starting with the prefix outranks titles containing it later on
+    assert [s["theCode"] for s in index.suggest("diab")] == ["5A13.4", "5A10", "5A11"]
+    assert index.suggest("diab")[0]["match"] == "title"
+    assert [s["theCode"] for s in index.suggest("5a1")] == ["5A10", "5A11", "5A13.4"]
+    assert [(s["theCode"], s["match"]) for s in index.suggest("adh")] == [("6A05", "synonym")]
+    assert [s["theCode"] for s in index.suggest("juvenile d")] == ["5A10"]
+    # One- and two-character prefixes come from the precomputed lists
+    assert [s["theCode"] for s in index.suggest("Ty", limit=1)] == ["5A10"]
+    assert index.suggest("  ") == [] and index.suggest("zzz") == []
+
+
+@pytest.mark.asyncio
+async def test_abandoned_calls_cancel_the_shared_execution():
+    """When every caller of a coalesced call is cancelled, the execution is cancelled too"""
+    inflight = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def upstream():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    callers = [asyncio.create_task(inflight.do("k", upstream)) for _ in range(2)]
+    await started.wait()
+    callers[0].cancel()
+    await asyncio.sleep(0)
+    assert not cancelled.is_set()
+    callers[1].cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert inflight.stats()["abandoned"] == 1
+
+
+def test_suggest_routes_answer_from_the_local_index(client, make_client, mms_handler, monkeypatch, tmp_path):
+    """GET and websocket typeahead answer from the ingested release"""
+    from app.routes import api_routes
+
+    store = LocalStore(str(tmp_path / "mms.sqlite"))
+    icd11 = make_client(mms_handler, local_store=store)
+    asyncio.run(ingest_release(icd11, store, progress_every=0))
+    monkeypatch.setattr(api_routes, "icd11_client", icd11)
+    mms_handler.calls = 0
+
+    response = client.get("/api/suggest?q=type&limit=2")
+    assert response.status_code == 200
+    assert [s["theCode"] for s in response.json()["suggestions"]] == ["5A10", "5A11"]
+
+    with client.websocket_connect("/api/suggest/ws") as socket:
+        socket.send_json({"q": "attention", "id": 1})
+        reply = socket.receive_json()
+        assert reply["id"] == 1
+        assert [s["theCode"] for s in reply["suggestions"]] == ["6A05"]
+    assert mms_handler.calls == 0
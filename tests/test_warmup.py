@@ -0,0 +1,50 @@
+"""
+Test cases for cache warmup and neighbour prefetch
+"""
+
+import pytest
+
+from app.api.warmup import AccessLog, Prefetcher, Warmup
+
+
+@pytest.mark.asyncio
+async def test_warmup_loads_chapters_and_most_viewed(make_client, mms_handler, tmp_path):
+    """Warmup fetches the chapter roots plus the hot set from the access log"""
+    client = make_client(mms_handler)
+    client.access_log = AccessLog(str(tmp_path / "access.sqlite"))
+    for _ in range(3):
+        client.access_log.record("mms", "3001", "2025-01", "en")
+    client.access_log.record("mms", "4001", "2025-01", "en")
+    assert client.access_log.top(1) == [("mms", "3001", "2025-01", "en")]
+
+    warmup = Warmup(client, release="2025-01")
+    await warmup.run()
+    status = warmup.status()
+    assert status["state"] == "done"
+    assert (status["total"], status["completed"], status["failed"]) == (5, 5, 0)
+    assert status["progress"] == 1.0
+
+    # Everything warmed is now served from cache
+    calls = mms_handler.calls
+    await client.get_mms_entity("1002", "2025-01")
+    await client.get_mms_entity("4001", "2025-01")
+    assert mms_handler.calls == calls
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_viewed_entity_prefetches_neighbours(make_client, mms_handler):
+    """Viewing an entity queues its parents and children, once"""
+    client = make_client(mms_handler)
+    client.prefetcher = Prefetcher(client)
+    document = await client.get_mms_entity("2001", "2025-01")
+    client.entity_viewed("mms", "2001", document, "2025-01", "en")
+    client.entity_viewed("mms", "2001", document, "2025-01", "en")
+    await client.prefetcher._queue.join()
+
+    assert client.prefetcher.stats()["fetched"] == 4
+    calls = mms_handler.calls
+    for entity_id in ("1001", "3001", "3002", "3003"):
+        await client.get_mms_entity(entity_id, "2025-01")
+    assert mms_handler.calls == calls
+    await client.close()